@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Batch generation of seeded mazes in parallel processes. Every maze is generated from its own
+seed by a random generator of its own, so the result for a seed is always the same no matter how
+many processes are used or which process generates it. Mazes are passed back from the processes
+encoded in the saved game layout with one byte per cell, which is much smaller and faster to
+transfer than Maze objects."""
+
+from concurrent.futures import ProcessPoolExecutor
+from coordinate import Coordinate
+from maze import Maze
+from generators import get_generator, DEFAULT_GENERATOR
+from solvers import get_solver
+
+#Number of mazes sent to a worker process at a time
+MAZES_PER_TASK = 16
+
+def generate_maze(size, seed, algorithm=DEFAULT_GENERATOR, solver=None):
+    """Generates a maze from seed and solves it from the entrance if the name of a solver is
+    given. Returns the seed, the packed cells and the solution from the entrance to the goal with
+    one direction per byte, which is empty if the maze was not solved."""
+    field = Maze(size, seed)
+    start = Coordinate(0, 0, 0)
+    get_generator(algorithm)(field, start)
+
+    path = bytearray()
+    if solver is not None and get_solver(solver)(field, start, field.get_goal()):
+        offsets = field.get_offsets()
+        index = field.index(start)
+        direction = field.get_cell_solution(index)
+        while direction is not None:
+            path.append(direction)
+            index += offsets[direction]
+            direction = field.get_cell_solution(index)
+
+    return seed, bytes(field.get_cells()), bytes(path)
+
+def _generate_job(job):
+    """Runs generate_maze with the arguments in job, used by the worker processes"""
+    return generate_maze(*job)
+
+def generate_mazes(size, seeds, algorithm=DEFAULT_GENERATOR, solver=None, workers=None,
+                   mazes_per_task=MAZES_PER_TASK):
+    """Generates a maze of the given size for every seed using up to workers processes, or the
+    calling process if workers is 1. Worker processes are sent mazes_per_task mazes at a time.
+    Yields the results of generate_maze in the order of seeds."""
+    jobs = ((size, seed, algorithm, solver) for seed in seeds)
+    if workers == 1:
+        yield from map(_generate_job, jobs)
+        return
+
+    with ProcessPoolExecutor(workers) as executor:
+        yield from executor.map(_generate_job, jobs, chunksize=mazes_per_task)
+
+def decode_maze(size, cells):
+    """Returns a carved Maze of the given size with the packed cells of a generated maze"""
+    field = Maze(size)
+    field.set_cells(cells)
+    field.set_carved()
+    return field
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""Benchmarks of the maze engine over a matrix of maze sizes. Creating, carving, solving and
+resetting mazes, saving and loading games, drawing mazes as text and drawing the game view are
+timed for every size. Results are written as JSON and can be compared against an earlier run,
+which reports every operation that got slower than the baseline allowed.
+
+Drawing the game view needs PyQt5 and is left out when it is not installed. The view is drawn
+to an offscreen image, so no display is needed either. The default sizes go up to 1000x1000x5,
+pass smaller sizes with --sizes for quick runs."""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from coordinate import Coordinate
+from game import Game
+from maze import Maze
+
+#Qt is only imported when the game view is drawn, see _import_qt
+HAS_QT = importlib.util.find_spec('PyQt5') is not None
+
+SIZES = ('10x10x1', '100x100x1', '100x100x3', '300x300x1', '300x300x3', '1000x1000x1',
+         '1000x1000x5')
+OPERATIONS = ('init', 'carve', 'solve', 'unvisit', 'save', 'load', 'str', 'draw')
+SEED = 900
+REPEAT = 3
+#Operations are regressions if they take this much more time than in the baseline, relative and
+#in seconds. The absolute limit keeps timer noise of the smallest mazes from being reported.
+THRESHOLD = 0.10
+MIN_DIFFERENCE = 0.001
+#Size of the offscreen image the game view is drawn to
+VIEW_SIZE = (800, 600)
+APPLICATION = None
+
+def parse_size(text):
+    """Returns the Coordinate of a maze size given as WIDTHxHEIGHTxFLOORS"""
+    try:
+        width, height, floors = (int(part) for part in text.lower().split('x'))
+    except ValueError as error:
+        raise ValueError('Maze sizes are given as WIDTHxHEIGHTxFLOORS: %s' % text) from error
+    if min(width, height, floors) < 1:
+        raise ValueError('Maze dimensions have to be at least 1: %s' % text)
+    return Coordinate(width, height, floors)
+
+def measure(function, setup=None, repeat=REPEAT):
+    """Calls function repeat times with the value returned by setup, which is not timed, and
+    returns the shortest and the mean time in seconds"""
+    times = []
+    for _ in range(repeat):
+        argument = setup() if setup is not None else None
+        started = time.perf_counter()
+        function(argument)
+        times.append(time.perf_counter() - started)
+    return min(times), sum(times) / len(times)
+
+def _carved_maze(size, cells):
+    """Returns a carved maze with a copy of cells"""
+    field = Maze(size, SEED, bytearray(cells))
+    field.set_carved()
+    return field
+
+def _solved_maze(size, cells):
+    """Returns a maze with a copy of cells which has been solved from the entrance"""
+    field = _carved_maze(size, cells)
+    field.solve_maze(Coordinate(0, 0, 0), field.get_goal())
+    return field
+
+def _import_qt():
+    """Imports and returns the Qt classes and the GameView used for drawing the game view. Qt
+    draws offscreen unless another platform has been set. Importing Qt is left until drawing is
+    benchmarked, so the other benchmarks run without it."""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    # pylint: disable=import-outside-toplevel
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtGui import QImage, QPainter
+    from PyQt5.QtCore import Qt
+    from gameview import GameView
+    return QApplication, QImage, QPainter, Qt, GameView
+
+def _get_application(application_class):
+    """Returns the running QApplication, which is created on first use. It is kept in a global
+    so that it outlives the views drawn by the benchmarks."""
+    global APPLICATION # pylint: disable=global-statement
+    if application_class.instance() is None:
+        APPLICATION = application_class([])
+    return application_class.instance()
+
+def _view_drawer(game):
+    """Returns a function which draws game in a game view to an offscreen image with cold
+    caches"""
+    application_class, image_class, painter_class, qt, view_class = _import_qt()
+    _get_application(application_class)
+    view = view_class()
+    view.resize(*VIEW_SIZE)
+    view.game = game
+    image = image_class(*VIEW_SIZE, image_class.Format_ARGB32)
+
+    def draw(_):
+        """Draws the view once"""
+        view.layer_field = None
+        image.fill(qt.white)
+        painter = painter_class(image)
+        view.draw_game(painter)
+        painter.end()
+    return draw
+
+def benchmark_size(size, operations=OPERATIONS, repeat=REPEAT):
+    """Times the operations for a maze of the given size. Returns a dictionary with the shortest
+    and mean times of every operation."""
+    game = Game()
+    game.new_game(size, seed=SEED)
+    cells = bytes(game.get_field().get_cells())
+    results = {}
+
+    def run(operation, function, setup=None):
+        """Times a single operation if it was selected"""
+        if operation in operations:
+            best, mean = measure(function, setup, repeat)
+            results[operation] = {'best': best, 'mean': mean}
+
+    run('init', lambda _: Maze(size, SEED))
+    run('carve', lambda field: field.carve_maze(), lambda: Maze(size, SEED))
+    run('solve', lambda field: field.solve_maze(Coordinate(0, 0, 0), field.get_goal()),
+        lambda: _carved_maze(size, cells))
+    run('unvisit', lambda field: field.make_cells_unvisited(), lambda: _solved_maze(size, cells))
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'benchmark.sav')
+        run('save', lambda _: game.save_game(filename))
+        if 'load' in operations and 'save' not in operations:
+            game.save_game(filename)
+        run('load', lambda _: Game().load_game(filename))
+
+    run('str', lambda _: str(game.get_field()))
+
+    if 'draw' in operations and HAS_QT:
+        run('draw', _view_drawer(game))
+
+    return results
+
+def run_benchmarks(sizes=SIZES, operations=OPERATIONS, repeat=REPEAT, log=None):
+    """Runs the benchmarks for every size given as WIDTHxHEIGHTxFLOORS and returns the results
+    as a dictionary which can be stored as JSON. Progress is written to the text file log."""
+    results = {}
+    for text in sizes:
+        size = parse_size(text)
+        name = '%dx%dx%d' % tuple(size)
+        results[name] = benchmark_size(size, operations, repeat)
+        if log is not None:
+            for operation, timing in results[name].items():
+                print('%-12s %-8s %10.4f s' % (name, operation, timing['best']), file=log)
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'repeat': repeat,
+        'seed': SEED,
+        'results': results,
+    }
+
+def compare(results, baseline, threshold=THRESHOLD, min_difference=MIN_DIFFERENCE):
+    """Compares the best times of results to baseline, both as returned by run_benchmarks.
+    Returns a list of (size, operation, baseline time, time) for every regression. Operations
+    missing from either run are not compared."""
+    regressions = []
+    for size, timings in results['results'].items():
+        for operation, timing in timings.items():
+            if operation not in baseline['results'].get(size, {}):
+                continue
+            old = baseline['results'][size][operation]['best']
+            new = timing['best']
+            if new > old * (1 + threshold) and new - old > min_difference:
+                regressions.append((size, operation, old, new))
+    return regressions
+
+def parse_arguments(argv):
+    """Returns the parsed command line arguments"""
+    parser = argparse.ArgumentParser(description='Benchmark the maze engine over a matrix of '
+                                                 'maze sizes.')
+    parser.add_argument('--sizes', nargs='+', default=SIZES, metavar='SIZE',
+                        help='maze sizes as WIDTHxHEIGHTxFLOORS')
+    parser.add_argument('--operations', nargs='+', choices=OPERATIONS, default=OPERATIONS,
+                        metavar='OPERATION', help='operations to time: ' + ', '.join(OPERATIONS))
+    parser.add_argument('-r', '--repeat', type=int, default=REPEAT,
+                        help='number of times every operation is timed')
+    parser.add_argument('-o', '--output', metavar='FILENAME',
+                        help='write the results to a file instead of the standard output')
+    parser.add_argument('-b', '--baseline', metavar='FILENAME',
+                        help='report operations that are slower than in this earlier result')
+    parser.add_argument('-t', '--threshold', type=float, default=THRESHOLD,
+                        help='allowed slowdown compared to the baseline, 0.1 is 10%%')
+    arguments = parser.parse_args(argv)
+
+    if arguments.repeat < 1:
+        parser.error('repeat has to be at least 1')
+    for size in arguments.sizes:
+        try:
+            parse_size(size)
+        except ValueError as error:
+            parser.error(str(error))
+    return arguments
+
+def main(argv=None):
+    """Runs the benchmarks according to the command line arguments. Progress and the comparison
+    are written to the standard error. Returns 1 if there were regressions, otherwise 0."""
+    arguments = parse_arguments(argv)
+    if 'draw' in arguments.operations and not HAS_QT:
+        print('PyQt5 is not installed, not drawing the game view', file=sys.stderr)
+
+    results = run_benchmarks(arguments.sizes, arguments.operations, arguments.repeat, sys.stderr)
+    if arguments.output:
+        with open(arguments.output, 'w', encoding='utf-8') as output:
+            json.dump(results, output, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if arguments.baseline:
+        with open(arguments.baseline, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline, arguments.threshold)
+        for size, operation, old, new in regressions:
+            #A baseline time of zero has no relative change
+            change = ' (%+.0f%%)' % ((new / old - 1) * 100) if old > 0 else ''
+            print('Regression: %s %s took %.4f s, baseline %.4f s%s'
+                  % (size, operation, new, old, change), file=sys.stderr)
+        if regressions:
+            return 1
+        print('No regressions against the baseline', file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,14 @@
 #!/usr/bin/env python3
-"""Includes the Cell class which mazes consist of."""
+"""Includes the Cell class which mazes consist of and the CellView class which is used for
+accessing cells packed inside a Maze."""
+
+#Packed cell value constants. A packed cell is a single byte where bits 0-5 are the walls in the
+#order of the direction constants below, bit 6 marks the entrance and bit 7 marks the goal. This is
+#the same layout that is used in saved games.
+WALL_BITS = 0b00111111
+CLOSED_CELL = WALL_BITS
+NO_SOLUTION = 0xFF
+WALL_DIRECTIONS = frozenset(range(6))
 
 class Cell:
     """The Cell class which mazes consist of."""
@@ -10,8 +19,8 @@ class Cell:
     RIGHT = 3       #Increases x
     BACK = 4        #Decreases y
     FRONT = 5       #Increases y
-    ENTRANCE = 6    #Used in maze saving/loading only
-    GOAL = 7        #Used in maze saving/loading only
+    ENTRANCE = 6    #Marker bit in the packed cell value
+    GOAL = 7        #Marker bit in the packed cell value
 
     """
         _______________
@@ -28,34 +37,30 @@ class Cell:
 
     """
 
+    __slots__ = ('__value', '__visited', '__solution_direction')
+
     def __init__(self):
-        self.__top_wall = True
-        self.__bottom_wall = True
-        self.__left_wall = True
-        self.__right_wall = True
-        self.__back_wall = True
-        self.__front_wall = True
-        self.__entrance = False
-        self.__goal = False
+        #Walls and markers are kept as a packed cell value, see WALL_BITS
+        self.__value = CLOSED_CELL
 
         self.__visited = False
         self.__solution_direction = None
 
     def set_as_entrance(self):
         """Sets the current cell as the maze entrance"""
-        self.__entrance = True
+        self.__value |= 1 << Cell.ENTRANCE
 
     def set_as_goal(self):
         """Sets the current cell as the maze goal"""
-        self.__goal = True
+        self.__value |= 1 << Cell.GOAL
 
     def is_entrance(self):
         """Returns whether the current cell is the entrance"""
-        return self.__entrance
+        return bool(self.__value & 1 << Cell.ENTRANCE)
 
     def is_goal(self):
         """Returns whether the current cell is the goal"""
-        return self.__goal
+        return bool(self.__value & 1 << Cell.GOAL)
 
     def set_visited(self, flag):
         """Allows changing of the current cells visited flag"""
@@ -65,36 +70,20 @@ class Cell:
         """Returns whether the current cell has the visited flag checked"""
         return self.__visited
 
+    def walls_mask(self):
+        """Returns the walls as a bitmask, where bit n is set if there is a wall in direction n"""
+        return self.__value & WALL_BITS
+
     def is_wall(self, wall):
         """Returns whether the current cell has a wall in the specified direction"""
-        if wall == Cell.TOP:
-            return self.__top_wall
-        elif wall == Cell.BOTTOM:
-            return self.__bottom_wall
-        elif wall == Cell.LEFT:
-            return self.__left_wall
-        elif wall == Cell.RIGHT:
-            return self.__right_wall
-        elif wall == Cell.BACK:
-            return self.__back_wall
-        elif wall == Cell.FRONT:
-            return self.__front_wall
+        if wall in WALL_DIRECTIONS:
+            return bool(self.__value & 1 << wall)
         return None
 
     def remove_wall(self, wall):
         """Removes wall from the specified direction"""
-        if wall == Cell.TOP:
-            self.__top_wall = False
-        elif wall == Cell.BOTTOM:
-            self.__bottom_wall = False
-        elif wall == Cell.LEFT:
-            self.__left_wall = False
-        elif wall == Cell.RIGHT:
-            self.__right_wall = False
-        elif wall == Cell.BACK:
-            self.__back_wall = False
-        elif wall == Cell.FRONT:
-            self.__front_wall = False
+        if wall in WALL_DIRECTIONS:
+            self.__value &= ~(1 << wall)
 
     def set_solution(self, direction):
         """Used for storing the direction to the goal"""
@@ -103,3 +92,69 @@ class Cell:
     def get_solution(self):
         """Retrieve the direction to the goal"""
         return self.__solution_direction
+
+
+class CellView:
+    """Lightweight view of a single cell stored inside a Maze. Has the same interface as Cell but
+    reads and writes the packed cell data of the maze directly, so creating one is cheap and
+    changes made through it are visible through every other view of the same cell."""
+
+    __slots__ = ('__maze', '__index')
+
+    def __init__(self, maze, index):
+        self.__maze = maze
+        self.__index = index
+
+    def set_as_entrance(self):
+        """Sets the current cell as the maze entrance"""
+        self.__maze.set_cell_value(self.__index,
+                                   self.__maze.get_cell_value(self.__index) | 1 << Cell.ENTRANCE)
+
+    def set_as_goal(self):
+        """Sets the current cell as the maze goal"""
+        self.__maze.set_cell_value(self.__index,
+                                   self.__maze.get_cell_value(self.__index) | 1 << Cell.GOAL)
+
+    def is_entrance(self):
+        """Returns whether the current cell is the entrance"""
+        return bool(self.__maze.get_cell_value(self.__index) & 1 << Cell.ENTRANCE)
+
+    def is_goal(self):
+        """Returns whether the current cell is the goal"""
+        return bool(self.__maze.get_cell_value(self.__index) & 1 << Cell.GOAL)
+
+    def set_visited(self, flag):
+        """Allows changing of the current cells visited flag"""
+        self.__maze.set_cell_visited(self.__index, flag)
+
+    def is_visited(self):
+        """Returns whether the current cell has the visited flag checked"""
+        return self.__maze.is_cell_visited(self.__index)
+
+    def walls_mask(self):
+        """Returns the walls as a bitmask, where bit n is set if there is a wall in direction n"""
+        return self.__maze.walls_mask(self.__index)
+
+    def is_wall(self, wall):
+        """Returns whether the current cell has a wall in the specified direction"""
+        if wall in WALL_DIRECTIONS:
+            return bool(self.__maze.get_cell_value(self.__index) & 1 << wall)
+        return None
+
+    def remove_wall(self, wall):
+        """Removes wall from the specified direction"""
+        if wall in WALL_DIRECTIONS:
+            self.__maze.set_cell_value(self.__index,
+                                       self.__maze.get_cell_value(self.__index) & ~(1 << wall))
+
+    def set_solution(self, direction):
+        """Used for storing the direction to the goal"""
+        self.__maze.set_cell_solution(self.__index, direction)
+
+    def get_solution(self):
+        """Retrieve the direction to the goal"""
+        return self.__maze.get_cell_solution(self.__index)
+
+    def get_index(self):
+        """Returns the linear index of the cell inside its maze"""
+        return self.__index
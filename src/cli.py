@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Command line tool for generating and solving mazes without the user interface. Nothing from
+PyQt5 is imported, so the tool works on machines without a display."""
+
+import argparse
+import json
+import sys
+import time
+from coordinate import Coordinate
+from game import Game
+from generators import GENERATORS, DEFAULT_GENERATOR
+from solvers import SOLVERS, DEFAULT_SOLVER, get_solver
+from textexport import STYLES, write_text
+from stats import EngineStats
+from mazecache import MazeCache
+import saveformat
+
+def parse_arguments(argv):
+    """Returns the parsed command line arguments"""
+    parser = argparse.ArgumentParser(description='Generate and solve mazes without the user '
+                                                 'interface.')
+    parser.add_argument('width', type=int, help='width of the mazes')
+    parser.add_argument('height', type=int, help='height of the mazes')
+    parser.add_argument('floors', type=int, nargs='?', default=1, help='number of floors')
+    parser.add_argument('-n', '--count', type=int, default=1, help='number of mazes to generate')
+    parser.add_argument('-s', '--seed', type=int,
+                        help='seed of the first maze, the following mazes use the next seeds')
+    parser.add_argument('-a', '--algorithm', choices=sorted(GENERATORS),
+                        default=DEFAULT_GENERATOR, help='maze generator')
+    parser.add_argument('--solver', choices=sorted(SOLVERS), default=DEFAULT_SOLVER,
+                        help='maze solver')
+    parser.add_argument('--no-solve', action='store_true', help='only generate the mazes')
+    parser.add_argument('-p', '--print', action='store_true', dest='print_maze',
+                        help='print the mazes')
+    parser.add_argument('--style', choices=sorted(STYLES), default='ascii',
+                        help='drawing style of printed mazes')
+    parser.add_argument('-o', '--save', metavar='FILENAME',
+                        help='save the mazes, {} in the name is replaced with the maze number')
+    parser.add_argument('--legacy', action='store_true', help='save in the LABv20 format')
+    parser.add_argument('--compression', choices=sorted(saveformat.COMPRESSION_NAMES),
+                        default='zlib',
+                        help='compression of saved mazes, uncompressed saves can be loaded lazily')
+    parser.add_argument('--cache', metavar='DIRECTORY',
+                        help='load seeded mazes from and store them to a maze cache')
+    parser.add_argument('--tiled', action='store_true',
+                        help='carve the mazes one chunk at a time as they are used, for mazes '
+                             'larger than memory')
+    parser.add_argument('--stats', action='store_true',
+                        help='print engine counters and phase timings as JSON')
+    arguments = parser.parse_args(argv)
+
+    if min(arguments.width, arguments.height, arguments.floors) < 1:
+        parser.error('maze dimensions have to be at least 1')
+    if arguments.count < 1:
+        parser.error('count has to be at least 1')
+    if arguments.save and arguments.count > 1 and '{}' not in arguments.save:
+        parser.error('the save file name needs {} when saving several mazes')
+    if arguments.tiled and (arguments.save or arguments.cache or arguments.print_maze):
+        parser.error('tiled mazes cannot be saved, cached or printed')
+    if arguments.tiled and arguments.solver != 'field':
+        parser.error('tiled mazes can only be solved with the field solver')
+    return arguments
+
+def path_length(field, start):
+    """Returns the number of moves in the solution stored in field starting from start"""
+    offsets = field.get_offsets()
+    index = field.index(start)
+    moves = 0
+    direction = field.get_cell_solution(index)
+    while direction is not None:
+        index += offsets[direction]
+        moves += 1
+        direction = field.get_cell_solution(index)
+    return moves
+
+def main(argv=None):
+    """Generates, solves, prints and saves mazes according to the command line arguments and
+    reports the time taken. Returns the exit status."""
+    arguments = parse_arguments(argv)
+    size = Coordinate(arguments.width, arguments.height, arguments.floors)
+    solver = get_solver(arguments.solver)
+    game = Game()
+    if arguments.stats:
+        game.set_stats(EngineStats())
+    if arguments.cache:
+        game.set_maze_cache(MazeCache(arguments.cache))
+    carve_times = []
+    solve_times = []
+    lengths = []
+
+    for number in range(arguments.count):
+        seed = None if arguments.seed is None else arguments.seed + number
+        started = time.perf_counter()
+        if arguments.tiled:
+            game.new_tiled_game(size, seed)
+        else:
+            game.new_game(size, arguments.algorithm, seed)
+        carve_times.append(time.perf_counter() - started)
+        field = game.get_field()
+        report = 'Maze %d: carved in %.3f s' % (number + 1, carve_times[-1])
+
+        if not arguments.no_solve:
+            start = game.get_player().get_position()
+            started = time.perf_counter()
+            if not solver(field, start, field.get_goal()):
+                print('Maze %d: no solution found' % (number + 1), file=sys.stderr)
+                return 1
+            solve_times.append(time.perf_counter() - started)
+            lengths.append(path_length(field, start))
+            report += ', solved in %.3f s, path length %d' % (solve_times[-1], lengths[-1])
+
+        if arguments.print_maze:
+            write_text(field, sys.stdout, arguments.style)
+        if arguments.save:
+            game.save_game(arguments.save.format(number + 1), arguments.legacy,
+                           saveformat.COMPRESSION_NAMES[arguments.compression])
+        print(report)
+
+    if arguments.count > 1:
+        print('Carving: total %.3f s, mean %.3f s' % (sum(carve_times),
+                                                      sum(carve_times) / arguments.count))
+        if lengths:
+            print('Solving: total %.3f s, mean %.3f s' % (sum(solve_times),
+                                                          sum(solve_times) / arguments.count))
+            print('Path length: min %d, mean %.1f, max %d' % (min(lengths),
+                                                               sum(lengths) / len(lengths),
+                                                               max(lengths)))
+    if arguments.stats:
+        print(json.dumps(game.get_stats().as_dict(), indent=2, sort_keys=True))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
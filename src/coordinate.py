@@ -1,68 +1,41 @@
 #!/usr/bin/env python3
 """Coordinate class, more like a struct, which groups x, y and z"""
 
-#This should have been a namedtuple but since they are immutable, a class
-#was required...
+from collections import namedtuple
 
-class Coordinate:
-    """A coordinate container with x, y and z values. Direct access to fields is allowed and
-    preferred"""
+class Coordinate(namedtuple('Coordinate', ['x', 'y', 'z'])):
+    """An immutable coordinate container with x, y and z values. Direct access to fields is allowed
+    and preferred. Coordinates are hashable and compare equal to plain (x, y, z) tuples, so either
+    can be used as dictionary keys. Arithmetic works element-wise with another coordinate or
+    tuple, or with a single number."""
 
-    def __init__(self, x=0, y=0, z=0):
-        self.x = x
-        self.y = y
-        self.z = z
-        self.n = 0 #Used for iterator access
+    __slots__ = ()
 
-    def __eq__(self, other):
-        return self.x == other.x and self.y == other.y and self.z == other.z
+    def __new__(cls, x=0, y=0, z=0):
+        return tuple.__new__(cls, (x, y, z))
 
     def __add__(self, other):
-        if isinstance(other, self.__class__):
-            return Coordinate(self.x + other.x, self.y + other.y, self.z + other.z)
+        if isinstance(other, tuple):
+            return Coordinate(self.x + other[0], self.y + other[1], self.z + other[2])
         return Coordinate(self.x + other, self.y + other, self.z + other)
 
     def __sub__(self, other):
-        if isinstance(other, self.__class__):
-            return Coordinate(self.x - other.x, self.y - other.y, self.z - other.z)
+        if isinstance(other, tuple):
+            return Coordinate(self.x - other[0], self.y - other[1], self.z - other[2])
         return Coordinate(self.x - other, self.y - other, self.z - other)
 
     def __mul__(self, other):
-        if isinstance(other, self.__class__):
-            return Coordinate(self.x * other.x, self.y * other.y, self.z * other.z)
+        if isinstance(other, tuple):
+            return Coordinate(self.x * other[0], self.y * other[1], self.z * other[2])
         return Coordinate(self.x * other, self.y * other, self.z * other)
 
+    __rmul__ = __mul__
+
     def __truediv__(self, other):
-        if isinstance(other, self.__class__):
-            return Coordinate(self.x / other.x, self.y / other.y, self.z / other.z)
+        if isinstance(other, tuple):
+            return Coordinate(self.x / other[0], self.y / other[1], self.z / other[2])
         return Coordinate(self.x / other, self.y / other, self.z / other)
 
-    def __getitem__(self, i):
-        if i == 0:
-            return self.x
-        elif i == 1:
-            return self.y
-        elif i == 2:
-            return self.z
-        raise IndexError("Coordinate index out of range")
-
-    def __iter__(self):
-        self.n = 0
-        return self
-
-    def __next__(self):
-        if self.n == 0:
-            result = self.x
-        elif self.n == 1:
-            result = self.y
-        elif self.n == 2:
-            result = self.z
-        else:
-            raise StopIteration
-
-        self.n += 1
-        return result
-
     def __str__(self):
         return "Coordinate: x=%d, y=%d, z=%d" % (self.x, self.y, self.z)
 
@@ -1,12 +1,17 @@
 #!/usr/bin/env python3
 """The main Game class acting as kind of a container for a Player and the Maze"""
 
+import time
 from struct import pack, unpack
 from os import path
-from cell import Cell
+from cell import WALL_BITS
 from maze import Maze
+from tiledmaze import TiledMaze
+from generators import get_generator_steps, DEFAULT_GENERATOR
 from player import Player
 from coordinate import Coordinate
+import saveformat
+from steps import run_steps
 
 #Saved file constants
 HEADER_SIZE = 18
@@ -21,18 +26,111 @@ class Game:
         self.__player = None
         self.__time = 0
         self.__won = False
+        self.__stats = None
+        self.__pool = None
+        self.__cache = None
+
+    def set_stats(self, stats):
+        """Sets the EngineStats which collects counters and timings of the game and its mazes,
+        None turns instrumentation off"""
+        self.__stats = stats
+        if isinstance(self.__field, Maze):
+            self.__field.set_stats(stats)
+
+    def get_stats(self):
+        """Returns the EngineStats of the game or None"""
+        return self.__stats
+
+    def set_maze_pool(self, pool):
+        """Sets the MazePool which new unseeded games take ready carved mazes from, None turns
+        pooling off"""
+        self.__pool = pool
+
+    def get_maze_pool(self):
+        """Returns the MazePool of the game or None"""
+        return self.__pool
+
+    def set_maze_cache(self, cache):
+        """Sets the MazeCache which seeded mazes are loaded from and stored to, None turns
+        caching off"""
+        self.__cache = cache
+
+    def get_maze_cache(self):
+        """Returns the MazeCache of the game or None"""
+        return self.__cache
+
+    def new_game(self, mazesize, algorithm=DEFAULT_GENERATOR, seed=None):
+        """New game, takes maze dimensions and optionally the name of the maze generator and a
+        seed for the maze as input. Unseeded games start at once if the maze pool has a maze of
+        the right size ready, seeded games if the maze cache has the maze."""
+        self.start_game(run_steps(self.carve_steps(mazesize, algorithm, seed)))
+
+    def carve_steps(self, mazesize, algorithm=DEFAULT_GENERATOR, seed=None):
+        """Step generator which carves a new maze without changing the game and returns it, so
+        the maze can be carved in a worker thread and then passed to start_game. Yields the
+        number of cells carved so far, see the steps module. Unseeded mazes are taken from the
+        maze pool and seeded mazes from the maze cache without any steps when they are there."""
+        pooled = seed is None and self.__pool is not None
+        if pooled:
+            field = self.__pool.take(mazesize, algorithm)
+            if self.__stats is not None:
+                self.__stats.add('maze_pool_misses' if field is None else 'maze_pool_hits')
+            if field is not None:
+                field.set_stats(self.__stats)
+                return field
+
+        if seed is not None and self.__cache is not None:
+            started = time.perf_counter()
+            field = self.__cache.get(mazesize, seed, algorithm)
+            if self.__stats is not None:
+                self.__stats.add('maze_cache_misses' if field is None else 'maze_cache_hits')
+            if field is not None:
+                self.__add_time('cache_read', started)
+                field.set_stats(self.__stats)
+                return field
+
+        try:
+            field = Maze(mazesize, seed, stats=self.__stats)
+            yield from get_generator_steps(algorithm)(field, Coordinate(0, 0, 0))
+        finally:
+            #The pool waits after a miss so it does not carve at the same time, even if carving
+            #was cancelled
+            if pooled:
+                self.__pool.refill(mazesize, algorithm)
+
+        if seed is not None and self.__cache is not None:
+            started = time.perf_counter()
+            if not self.__cache.put(field, seed, algorithm) and self.__stats is not None:
+                self.__stats.add('maze_cache_write_failures')
+            self.__add_time('cache_write', started)
+        return field
+
+    def start_game(self, field):
+        """Starts a new game in a carved maze from carve_steps"""
+        self.__set_field(field)
+        self.__player = Player(Coordinate(0, 0, 0))
+        self.__won = False
+        self.__time = 0
+        self.__finish('new_game')
 
-    def new_game(self, mazesize):
-        """New game, takes maze dimensions as input"""
-        self.__field = Maze(mazesize)
-        self.__field.carve_maze(Coordinate(0, 0, 0))
+    def new_tiled_game(self, mazesize, seed=None, store=None):
+        """New game in a tiled maze, which is carved one chunk at a time as the player explores it
+        so mazes can be larger than memory. Changed chunks are kept in the store directory."""
+        self.__set_field(TiledMaze(mazesize, seed, store=store))
         self.__player = Player(Coordinate(0, 0, 0))
         self.__won = False
         self.__time = 0
 
-    def set_elapsed_time(self, time):
-        """Called by the GUI before saving to update the time, time should be in seconds"""
-        self.__time = int(time)
+    def __set_field(self, field):
+        """Replaces the maze of the game. A replaced tiled maze is closed, so its changed chunks
+        are written to its store and a temporary store is removed."""
+        if isinstance(self.__field, TiledMaze) and self.__field is not field:
+            self.__field.close()
+        self.__field = field
+
+    def set_elapsed_time(self, seconds):
+        """Called by the GUI before saving to update the time, which is given in seconds"""
+        self.__time = int(seconds)
 
     def get_elapsed_time(self):
         """Returns elapsed time in seconds"""
@@ -51,9 +149,10 @@ class Game:
         return self.__player
 
     def check_victory(self):
-        """This is called to change the state of the game into a won game if conditions are met.
-        Returns True if the state is changed, false otherwise."""
-        if self.__field.get_goal() == self.__player.get_position() and not self.__won:
+        """This is called to change the state of the game into a won game if conditions are met,
+        which is when the player is at any goal. Returns True if the state is changed, false
+        otherwise."""
+        if self.__field.is_goal(self.__player.get_position()) and not self.__won:
             self.__won = True
             return True
         return False
@@ -63,8 +162,26 @@ class Game:
         For checking requirements, check_victory should be used to actually update the state"""
         return self.__won
 
-    def save_game(self, filename):
-        """Saves the current Game instance as filename"""
+    def save_game(self, filename, legacy=False, compression=saveformat.COMPRESSION_ZLIB):
+        """Saves the current Game instance as filename using the version 3 format. Saves are
+        compressed unless compression is saveformat.COMPRESSION_NONE, which makes larger files
+        that can be loaded lazily. Legacy saves use the LABv20 format instead, which fits mazes of
+        up to 255 cells along every axis and can be read by older versions of the game. Tiled
+        games cannot be saved and raise ValueError."""
+        if isinstance(self.__field, TiledMaze):
+            raise ValueError('Tiled games cannot be saved')
+
+        if not legacy:
+            with open(filename, 'wb') as save_file:
+                saveformat.write_game(save_file, self.__field, self.__player,
+                                      self.get_elapsed_time(), compression, self.__stats)
+            self.__finish('save_game')
+            return
+
+        if max(self.__field.get_dimensions(True)) > 0xFF or self.__player.get_moves() > 0xFFFF:
+            raise ValueError('Game does not fit in a legacy save file')
+
+        started = time.perf_counter()
         with open(filename, 'wb') as save_file:
             save_file.write(HEADER_SIGNATURE)
             save_file.write(pack('BBB', *self.__field.get_dimensions(True)))
@@ -72,100 +189,113 @@ class Game:
             save_file.write(pack('H', self.__player.get_moves()))
             save_file.write(pack('I', self.get_elapsed_time()))
 
-            for z in range(self.__field.get_floors()):
-                for y in range(self.__field.get_height()):
-                    for x in range(self.__field.get_width()):
-                        cell_value = self.encode_cell(self.__field, Coordinate(x, y, z))
-                        save_file.write(pack('B', cell_value))
+            #Mazes store their cells in the saved game layout, so all cells are written at once
+            save_file.write(self.__field.get_cells())
+        self.__add_time('write', started)
+        self.__finish('save_game')
+
+    def __add_time(self, phase, started):
+        """Adds the time since the performance counter value started to phase if the game has
+        stats"""
+        if self.__stats is not None:
+            self.__stats.add_time(phase, time.perf_counter() - started)
+
+    def __finish(self, operation):
+        """Reports a finished operation if the game has stats"""
+        if self.__stats is not None:
+            self.__stats.finish(operation)
 
     @staticmethod
     def encode_cell(field, coordinate):
         """Returns the binary value of the cell at coordinate in field"""
-        cell_value = 0
-        cell = field.get_cell(coordinate)
-
-        if cell.is_wall(Cell.TOP):
-            cell_value |= 1 << Cell.TOP
-        if cell.is_wall(Cell.BOTTOM):
-            cell_value |= 1 << Cell.BOTTOM
-        if cell.is_wall(Cell.LEFT):
-            cell_value |= 1 << Cell.LEFT
-        if cell.is_wall(Cell.RIGHT):
-            cell_value |= 1 << Cell.RIGHT
-        if cell.is_wall(Cell.BACK):
-            cell_value |= 1 << Cell.BACK
-        if cell.is_wall(Cell.FRONT):
-            cell_value |= 1 << Cell.FRONT
-
-        if cell.is_entrance():
-            cell_value |= 1 << Cell.ENTRANCE
-        if cell.is_goal():
-            cell_value |= 1 << Cell.GOAL
-
-        return cell_value
-
-    def load_game(self, filename):
-        """Replaces the current Game instance with that in filename"""
+        return field.get_cell_value(field.index(coordinate))
+
+    @staticmethod
+    def __read_header(header, filesize):
+        """Checks the header of a saved game against the size of the file. Returns the maze
+        dimensions, the player and the elapsed time or raises ValueError if the file is invalid."""
+        if filesize < HEADER_SIZE or len(header) < HEADER_SIZE:
+            raise ValueError('File is not a valid save file!')
+
+        #Check that the header signature matches
+        if not header[:6] == HEADER_SIGNATURE:
+            raise ValueError('File is not a valid save file!')
+
+        maze_dimensions = Coordinate(*unpack('BBB', header[6:9]))
+
+        #Check that the file size matches with what it should be according to the header
+        if filesize != HEADER_SIZE + maze_dimensions.x * maze_dimensions.y * maze_dimensions.z:
+            raise ValueError('File is not a valid save file!')
+
+        player_coord = Coordinate(*unpack('BBB', header[9:12]))
+        player_moves = unpack('H', header[12:14])[0]
+
+        #Check that the player is inside the maze
+        if (player_coord.x >= maze_dimensions.x or
+                player_coord.y >= maze_dimensions.y or
+                player_coord.z >= maze_dimensions.z):
+            raise ValueError('File is not a valid save file!')
+
+        loaded_time = unpack('I', header[14:18])[0]
+        return maze_dimensions, Player(player_coord, player_moves), loaded_time
+
+    def load_game(self, filename, lazy=False, workers=None):
+        """Replaces the current Game instance with that in filename, which can be in either the
+        version 3 or the legacy LABv20 format. Version 3 floors are decompressed in parallel by up
+        to workers threads. A lazy load of a legacy or an uncompressed version 3 save maps the
+        file into memory instead of reading it. Only the outer faces of the maze are read at once
+        to check their walls, other cells are read from disk when they are used. Changes to a
+        lazily loaded maze are copy-on-write and never reach the file, and only the pages where
+        outer walls had to be added are copied. Compressed saves cannot be loaded lazily and
+        raise ValueError if lazy is set."""
         with open(filename, 'rb') as load_file:
             filesize = path.getsize(filename)
 
-            if filesize < HEADER_SIZE:
-                raise ValueError('File is not a valid save file!')
-
-            #Check that the header signature matches
-            if not load_file.read(6) == HEADER_SIGNATURE:
-                raise ValueError('File is not a valid save file!')
-
-            maze_dimensions = Coordinate(*unpack('BBB', load_file.read(3)))
-
-            #Check that the file size matches with what it should be according to the header
-            if filesize != HEADER_SIZE + maze_dimensions.x * maze_dimensions.y * maze_dimensions.z:
-                raise ValueError('File is not a valid save file!')
-
-            loaded_field = Maze(maze_dimensions)
-
-            player_coord = Coordinate(*unpack('BBB', load_file.read(3)))
-            player_moves = unpack('H', load_file.read(2))[0]
-
-            #Check that the player is inside the maze
-            if (player_coord.x >= maze_dimensions.x or
-                    player_coord.y >= maze_dimensions.y or
-                    player_coord.z >= maze_dimensions.z):
-                raise ValueError('File is not a valid save file!')
-
-            loaded_player = Player(player_coord, player_moves)
-
-            loaded_time = unpack('I', load_file.read(4))[0]
-
-            for z in range(loaded_field.get_floors()):
-                for y in range(loaded_field.get_height()):
-                    for x in range(loaded_field.get_width()):
-                        cell_value = unpack('B', load_file.read(1))[0]
-                        self.decode_cell(loaded_field, Coordinate(x, y, z), cell_value)
+            if saveformat.is_save_file(load_file):
+                if lazy:
+                    loaded_field, self.__player, self.__time = saveformat.map_game(
+                        load_file, filesize, self.__stats)
+                else:
+                    loaded_field, self.__player, self.__time = saveformat.read_game(
+                        load_file, filesize, workers, self.__stats)
+                self.__set_field(loaded_field)
+                self.__won = False
+                self.__finish('load_game')
+                return
+
+            maze_dimensions, loaded_player, loaded_time = self.__read_header(
+                load_file.read(HEADER_SIZE), filesize)
+
+            if lazy:
+                loaded_field = saveformat.map_cells(load_file, HEADER_SIZE, maze_dimensions,
+                                                    self.__stats)
+            else:
+                #The cell payload is already in the layout mazes use internally, so it is read
+                #at once
+                loaded_field = Maze(maze_dimensions, stats=self.__stats)
+                started = time.perf_counter()
+                cells = load_file.read()
+                self.__add_time('read', started)
+
+                started = time.perf_counter()
+                loaded_field.set_cells(cells)
+
+                #Hacked saves could open the outer walls which the maze relies on
+                loaded_field.seal_edges()
+                self.__add_time('decode', started)
 
             loaded_field.set_carved()
-            self.__field = loaded_field
+            self.__set_field(loaded_field)
             self.__player = loaded_player
             self.__time = loaded_time
             self.__won = False
+        self.__finish('load_game')
 
     @staticmethod
     def decode_cell(field, coordinate, cell_value):
-        """Updates the cell at coordinate in field according to cell_value"""
-        if not cell_value & (1 << Cell.TOP):
-            field.get_cell(coordinate).remove_wall(Cell.TOP)
-        if not cell_value & (1 << Cell.BOTTOM):
-            field.get_cell(coordinate).remove_wall(Cell.BOTTOM)
-        if not cell_value & (1 << Cell.LEFT):
-            field.get_cell(coordinate).remove_wall(Cell.LEFT)
-        if not cell_value & (1 << Cell.RIGHT):
-            field.get_cell(coordinate).remove_wall(Cell.RIGHT)
-        if not cell_value & (1 << Cell.BACK):
-            field.get_cell(coordinate).remove_wall(Cell.BACK)
-        if not cell_value & (1 << Cell.FRONT):
-            field.get_cell(coordinate).remove_wall(Cell.FRONT)
-
-        if cell_value & (1 << Cell.ENTRANCE):
-            field.get_cell(coordinate).set_as_entrance()
-        if cell_value & (1 << Cell.GOAL):
-            field.get_cell(coordinate).set_as_goal()
+        """Updates the cell at coordinate in field according to cell_value. Walls are only
+        removed and markers only added, as when decoding into a freshly created maze."""
+        index = field.index(coordinate)
+        old_value = field.get_cell_value(index)
+        field.set_cell_value(index, (old_value & cell_value & WALL_BITS) |
+                             ((old_value | cell_value) & ~WALL_BITS & 0xFF))
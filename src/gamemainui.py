@@ -2,14 +2,20 @@
 """GameMainUI UI class file"""
 
 from os import path, makedirs
-from PyQt5.QtWidgets import QMainWindow, QAction, QFileDialog, QMessageBox, QLabel
-from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import (QMainWindow, QAction, QFileDialog, QMessageBox, QLabel,
+                             QProgressDialog)
+from PyQt5.QtCore import Qt, QThreadPool, QTimer
 from gameview import GameView
+from mazepool import MazePool
 from newgamedialog import NewGameDialog
 from victorydialog import VictoryDialog
 from helpdialog import HelpDialog
+from generators import DEFAULT_GENERATOR, STEP_GENERATORS
+from solvers import STEP_SOLVERS
 
 SAVEFOLDER = '../save'
+#Milliseconds a task has to run before its progress dialog is shown
+PROGRESS_DELAY = 500
 
 class GameMainUI(QMainWindow):
     """The main UI window class that calls all other UI classes"""
@@ -17,15 +23,24 @@ class GameMainUI(QMainWindow):
     def __init__(self):
         super().__init__()
 
-        self.setCentralWidget(GameView())
+        #The next maze of the same size is carved in the background, so it is ready when the
+        #player starts a new game
+        self.setCentralWidget(GameView(MazePool()))
+        self.centralWidget().moved.connect(self.update_moves)
+        self.centralWidget().won.connect(self.victory)
+        self.centralWidget().loaded.connect(self.game_loaded)
+        self.centralWidget().solved.connect(self.game_solved)
+        self.centralWidget().unsolvable.connect(self.game_unsolvable)
 
+        self.algorithm = DEFAULT_GENERATOR
         self.time_text = QLabel()
         self.move_text = QLabel()
 
-        self.update_timer = QTimer()
-        self.update_timer.setInterval(100)
-        self.update_timer.timeout.connect(self.refresh)
-        self.update_timer.start()
+        #The clock only changes once a second, everything else is updated when the game changes
+        self.clock_timer = QTimer()
+        self.clock_timer.setInterval(1000)
+        self.clock_timer.timeout.connect(self.update_clock)
+        self.clock_timer.start()
 
         self.initialize_ui()
 
@@ -81,52 +96,113 @@ class GameMainUI(QMainWindow):
         self.setWindowTitle('Labyrinth')
         self.statusBar().addWidget(self.move_text)
         self.statusBar().addPermanentWidget(self.time_text)
+        self.refresh()
         self.show()
 
     def keyPressEvent(self, event): # pylint: disable=invalid-name
         """Redefined function that gets called periodically by the base class.
         Passes key press events to the central widget."""
         self.centralWidget().keyPressEvent(event)
-        self.victory_check()
 
     def refresh(self):
-        """Periodically called according to the interval in update_timer to update UI
-        information"""
+        """Updates all UI information"""
+        self.update_moves()
+        self.update_clock()
 
-        #Pass refresh to central widget
-        self.centralWidget().refresh()
-
-        #Update statusbar
+    def update_moves(self):
+        """Called when the player has moved to update the number of moves in the statusbar"""
         moves = self.centralWidget().get_game_instance().get_player().get_moves()
         self.move_text.setText('Moves: ' + str(moves))
+
+    def update_clock(self):
+        """Called every second by clock_timer to update the time in the statusbar"""
         if not self.centralWidget().get_game_instance().is_won():
             minutes = int(self.centralWidget().get_time() / 1000 / 60)
             seconds = int(self.centralWidget().get_time() / 1000) % 60
             self.time_text.setText('Time: %02d:%02.d' % (minutes, seconds))
 
-        self.update()
-        self.victory_check()
+    def game_loaded(self):
+        """Called when a new game has been started or a game has been loaded"""
+        self.change_menu_action_states(True)
+        self.statusBar().clearMessage()
+        self.clock_timer.start()
+        self.refresh()
 
     def menu_new_game(self):
         """Called when New Game is chosen from the File menu"""
         old_dimensions = self.centralWidget().get_game_instance().get_field().get_dimensions(True)
-        dlg = NewGameDialog(old_dimensions)
+        dlg = NewGameDialog(old_dimensions, self.algorithm)
         if dlg.exec_():
-            self.centralWidget().get_game_instance().new_game(dlg.get_values())
-            self.centralWidget().reset_timer()
-            self.change_menu_action_states(True)
+            self.algorithm = dlg.get_algorithm()
+            dimensions = dlg.get_values()
+            self.run_task('Carving the maze...', dimensions.x * dimensions.y * dimensions.z,
+                          self.centralWidget().new_game(dimensions, self.algorithm),
+                          self.algorithm in STEP_GENERATORS)
 
     def menu_solve(self):
         """Called when Solve is chosen from the File menu"""
-        if self.centralWidget().solve_game():
-            self.change_menu_action_states(False)
-        else:
-            error_dialog = QMessageBox()
-            error_dialog.setWindowTitle('Warning')
-            error_dialog.setIcon(QMessageBox.Warning)
-            error_dialog.setText('Solver could not find a solution. Either the maze is missing a '
-                                 'goal or it is unreachable.')
-            error_dialog.exec_()
+        field = self.centralWidget().get_game_instance().get_field()
+        cells = field.get_width() * field.get_height() * field.get_floors()
+        self.run_task('Solving the maze...', cells, self.centralWidget().solve_game(),
+                      self.centralWidget().solver in STEP_SOLVERS)
+
+    def run_task(self, label, cells, task, cancellable=True):
+        """Starts a MazeTask that handles the given number of cells in the global thread pool
+        with a progress dialog. The dialog is only shown if the task takes a while and cancelling
+        it cancels the task. Tasks which run in a single step cannot stop early, so they are not
+        cancellable and have no Cancel button. The menus are disabled until the task has
+        ended."""
+        self.menuBar().setEnabled(False)
+        dialog = QProgressDialog(label, 'Cancel', 0, 0, self)
+        if not cancellable:
+            dialog.setCancelButton(None)
+        dialog.setWindowTitle('Labyrinth')
+        dialog.setWindowModality(Qt.WindowModal)
+        dialog.setMinimumDuration(PROGRESS_DELAY)
+        dialog.setAutoClose(False)
+        dialog.setAutoReset(False)
+        dialog.canceled.connect(task.cancel)
+
+        def progress(done):
+            """Shows the number of cells done, the dialog is busy until the first report"""
+            dialog.setMaximum(cells)
+            dialog.setValue(min(done, cells))
+
+        def ended(*_):
+            """Hides the dialog and enables the menus"""
+            dialog.canceled.disconnect(task.cancel)
+            dialog.hide()
+            dialog.deleteLater()
+            self.menuBar().setEnabled(True)
+
+        task.signals.progress.connect(progress)
+        for signal in (task.signals.finished, task.signals.cancelled, task.signals.failed):
+            signal.connect(ended)
+        task.signals.failed.connect(self.task_failed)
+        QThreadPool.globalInstance().start(task)
+
+    def game_solved(self):
+        """Called when the maze has been solved"""
+        self.change_menu_action_states(False)
+
+    @staticmethod
+    def game_unsolvable():
+        """Called when the solver could not find a solution"""
+        error_dialog = QMessageBox()
+        error_dialog.setWindowTitle('Warning')
+        error_dialog.setIcon(QMessageBox.Warning)
+        error_dialog.setText('Solver could not find a solution. Either the maze is missing a '
+                             'goal or it is unreachable.')
+        error_dialog.exec_()
+
+    @staticmethod
+    def task_failed(message):
+        """Called when carving or solving failed"""
+        error_dialog = QMessageBox()
+        error_dialog.setWindowTitle('Error')
+        error_dialog.setIcon(QMessageBox.Critical)
+        error_dialog.setText(message)
+        error_dialog.exec_()
 
     def menu_save_game(self):
         """Called when Save Game is chosen from the File menu"""
@@ -145,10 +221,7 @@ class GameMainUI(QMainWindow):
             self, 'Open file', SAVEFOLDER, "Saved games (*.sav)")[0]
         if file_name:
             try:
-                self.centralWidget().get_game_instance().load_game(file_name)
-                self.centralWidget().reset_timer()
-                self.change_menu_action_states(True)
-                self.refresh()
+                self.centralWidget().load_game(file_name)
             except ValueError as error:
                 error_dialog = QMessageBox()
                 error_dialog.setWindowTitle('Error')
@@ -171,17 +244,17 @@ class GameMainUI(QMainWindow):
         about_dialog.setText('Labyrinth v2.0\n\nCopyright 2018')
         about_dialog.exec_()
 
-    def victory_check(self):
-        """Calls periodically by the refresh function to check if the goal has been reached.
-        If the goal has been reached, the victory dialog is shown and the game is finished."""
-        if self.centralWidget().get_game_instance().check_victory():
-            self.centralWidget().store_time()
-            self.change_menu_action_states(False)
-            dlg = VictoryDialog(self.centralWidget().get_game_instance().get_field().is_solved(),
-                                self.centralWidget().get_game_instance().get_player().get_moves(),
-                                self.centralWidget().get_game_instance().get_elapsed_time())
-            dlg.exec_()
-            self.statusBar().showMessage('Game over. Start or load a new game from the File menu.')
+    def victory(self):
+        """Called when the goal has been reached. The victory dialog is shown and the game is
+        finished."""
+        self.centralWidget().store_time()
+        self.clock_timer.stop()
+        self.change_menu_action_states(False)
+        dlg = VictoryDialog(self.centralWidget().get_game_instance().get_field().is_solved(),
+                            self.centralWidget().get_game_instance().get_player().get_moves(),
+                            self.centralWidget().get_game_instance().get_elapsed_time())
+        dlg.exec_()
+        self.statusBar().showMessage('Game over. Start or load a new game from the File menu.')
 
     def change_menu_action_states(self, state):
         """Used to enable or disable menu items."""
@@ -1,70 +1,230 @@
 #!/usr/bin/env python3
 """GameView UI class file"""
 
+from collections import OrderedDict
 from PyQt5.QtWidgets import QWidget
-from PyQt5.QtGui import QPainter, QPen
-from PyQt5.QtCore import Qt, QElapsedTimer
+from PyQt5.QtGui import QPainter, QPainterPath, QPen, QPixmap
+from PyQt5.QtCore import Qt, QElapsedTimer, QLineF, QPointF, QRect, QRectF, QTimer, pyqtSignal
 from game import Game
 from cell import Cell
 from coordinate import Coordinate
+from solvers import get_solver_steps, DEFAULT_SOLVER
+from mazetask import MazeTask
 
 TILESIZE = 20
+#Floors are drawn once into cached pixmaps of LAYER_TILE x LAYER_TILE cells
+LAYER_TILE = 32
+#Number of cached floor pixmaps kept besides the ones visible in the view. Every pixmap takes
+#about 1.6 MB, and only pixmaps of the current floor are kept.
+LAYER_CACHE_SIZE = 4
+#Default auto-solve playback speed in moves per second
+PLAYBACK_SPEED = 10
+#Shortest interval between auto-solve playback ticks in milliseconds, faster playback makes
+#several moves on every tick
+PLAYBACK_INTERVAL = 16
 
 class GameView(QWidget):
-    """GameView UI class handles drawing the game and also keeps the Game instance"""
-    def __init__(self):
+    """GameView UI class handles drawing the game and also keeps the Game instance. Changes to
+    the game state are announced with the moved, solved, unsolvable, won and loaded signals.
+    Carving and solving run as MazeTasks in a worker thread. Pool is an optional MazePool which
+    new unseeded games take ready carved mazes from."""
+
+    moved = pyqtSignal()
+    solved = pyqtSignal()
+    unsolvable = pyqtSignal()
+    won = pyqtSignal()
+    loaded = pyqtSignal()
+
+    def __init__(self, pool=None):
         super().__init__()
         self.game = Game()
+        self.game.set_maze_pool(pool)
         self.game.new_game(Coordinate(20, 20, 2))
+        self.solver = DEFAULT_SOLVER
+        self.task = None
+        self.layers = OrderedDict()
+        self.layer_field = None
+        self.layer_floor = None
+        self.visible_layers = 0
+        self.solution_lines = {}
+        self.maze_pen = QPen(Qt.black, 1, Qt.SolidLine)
+        self.solution_pen = QPen(Qt.green, 1, Qt.SolidLine)
+        self.player_pen = QPen(Qt.red, 1, Qt.SolidLine)
         self.elapsed_timer = QElapsedTimer()
         self.elapsed_timer.start()
 
+        #Auto-solve moves the player along the solution on every tick of playback_timer
+        self.playback_timer = QTimer()
+        self.playback_timer.timeout.connect(self.play_solution)
+        self.playback_speed = PLAYBACK_SPEED
+        self.playback_steps = 1
+        self.set_playback_speed(PLAYBACK_SPEED)
+
     def keyPressEvent(self, event): # pylint: disable=invalid-name
         """Redefined function that gets called periodically by the base class.
-        Disable movement when maze is solved or game is won."""
+        Disable movement when maze is solved or game is won, and all keys while the maze is
+        carved or solved."""
+        if self.task is not None:
+            return
+
+        if event.key() == Qt.Key_Space:
+            self.toggle_playback()
+        if event.key() == Qt.Key_Plus:
+            self.set_playback_speed(self.playback_speed * 2)
+        if event.key() == Qt.Key_Minus:
+            self.set_playback_speed(self.playback_speed // 2)
+
         if not self.game.get_field().is_solved() and not self.game.is_won():
             if event.key() == Qt.Key_Right:
-                self.game.get_player().move_player(self.game.get_field(), Cell.RIGHT)
+                self.move_player(Cell.RIGHT)
             if event.key() == Qt.Key_Left:
-                self.game.get_player().move_player(self.game.get_field(), Cell.LEFT)
+                self.move_player(Cell.LEFT)
             if event.key() == Qt.Key_Up:
-                self.game.get_player().move_player(self.game.get_field(), Cell.BACK)
+                self.move_player(Cell.BACK)
             if event.key() == Qt.Key_Down:
-                self.game.get_player().move_player(self.game.get_field(), Cell.FRONT)
+                self.move_player(Cell.FRONT)
             if event.key() == Qt.Key_Q:
-                self.game.get_player().move_player(self.game.get_field(), Cell.TOP)
+                self.move_player(Cell.TOP)
             if event.key() == Qt.Key_A:
-                self.game.get_player().move_player(self.game.get_field(), Cell.BOTTOM)
-        self.update()
+                self.move_player(Cell.BOTTOM)
 
-    def paintEvent(self, event): # pylint: disable=invalid-name,unused-argument
+    def paintEvent(self, event): # pylint: disable=invalid-name
         """Redefined function that gets called periodically by the base class.
-        Used to call drawing functions."""
+        Used to call drawing functions, only the region that needs updating is drawn."""
         painter = QPainter()
         painter.begin(self)
-        self.draw_game(painter)
+        self.draw_game(painter, event.rect())
         painter.end()
 
-    def refresh(self):
-        """Periodically called from GameMainUI and used to update player position if the
-        auto-solve option has been enabled"""
-        if self.game.get_field().is_solved() and not self.game.is_won():
+    def move_player(self, direction):
+        """Moves the player in direction, repaints the changed part of the view and emits moved,
+        and won if the goal was reached. Returns True if moving succeeded, False otherwise."""
+        old_position = self.game.get_player().get_position()
+        old_offsets = self.get_view_offsets()
+        if not self.game.get_player().move_player(self.game.get_field(), direction):
+            return False
+
+        self.update_player(old_position, old_offsets)
+        self.moved.emit()
+        if self.game.check_victory():
+            self.stop_playback()
+            self.won.emit()
+        return True
+
+    def play_solution(self):
+        """Called by playback_timer to move the player along the solution when the maze has been
+        solved. Playback stops when the goal is reached or the solution ends."""
+        for _ in range(self.playback_steps):
+            if not self.game.get_field().is_solved() or self.game.is_won():
+                self.stop_playback()
+                return
             player_position = self.game.get_player().get_position()
             solution_direction = self.game.get_field().get_cell(player_position).get_solution()
-            self.game.get_player().move_player(self.game.get_field(), solution_direction)
+            if not self.move_player(solution_direction):
+                self.stop_playback()
+                return
+
+    def set_playback_speed(self, moves_per_second):
+        """Sets the auto-solve playback speed in moves per second"""
+        self.playback_speed = max(1, moves_per_second)
+        interval = 1000 / self.playback_speed
+        self.playback_steps = max(1, round(PLAYBACK_INTERVAL / interval))
+        self.playback_timer.setInterval(max(PLAYBACK_INTERVAL, int(interval)))
+
+    def start_playback(self):
+        """Starts moving the player along the solution if the maze has been solved"""
+        if self.game.get_field().is_solved() and not self.game.is_won():
+            self.playback_timer.start()
+
+    def stop_playback(self):
+        """Stops moving the player along the solution"""
+        self.playback_timer.stop()
+
+    def toggle_playback(self):
+        """Pauses or resumes moving the player along the solution"""
+        if self.playback_timer.isActive():
+            self.stop_playback()
+        else:
+            self.start_playback()
+
+    def update_player(self, old_position, old_offsets):
+        """Schedules a repaint after the player has moved from old_position. Only the old and new
+        cells of the player are repainted unless the view has scrolled or the floor changed."""
+        position = self.game.get_player().get_position()
+        if old_offsets != self.get_view_offsets() or old_position.z != position.z:
+            self.update()
+        elif old_position != position:
+            self.update(self.cell_rect(old_position).united(self.cell_rect(position)))
+
+    def cell_rect(self, position):
+        """Returns the rectangle of the view covered by the cell at position"""
+        x_offset, y_offset = self.get_view_offsets()
+        return QRect(int(position.x * TILESIZE + x_offset) - 1,
+                     int(position.y * TILESIZE + y_offset) - 1,
+                     TILESIZE + 2, TILESIZE + 2)
+
+    def create_task(self, steps, on_finished):
+        """Returns a MazeTask which runs the step generator steps. On_finished is called with the
+        result in the GUI thread unless the task is cancelled or fails. The task is started by
+        the caller with a QThreadPool after connecting to its signals."""
+        task = MazeTask(steps)
+        task.signals.finished.connect(on_finished)
+        for signal in (task.signals.finished, task.signals.cancelled, task.signals.failed):
+            signal.connect(self.task_ended)
+        self.task = task
+        return task
+
+    def task_ended(self):
+        """Called when the running MazeTask has ended, enables the keys again"""
+        self.task = None
 
     def solve_game(self):
-        """Called by GameMainUI to solve the maze"""
+        """Called by GameMainUI to solve the maze in a worker thread. Returns the MazeTask, see
+        create_task. When it finishes, solved or unsolvable is emitted."""
+        self.stop_playback()
         goal_position = self.game.get_field().get_goal()
         player_position = self.game.get_player().get_position()
-        return self.game.get_field().solve_maze(player_position, goal_position)
+        steps = get_solver_steps(self.solver)(self.game.get_field(), player_position,
+                                              goal_position)
+        return self.create_task(steps, lambda found: self.solve_finished(found, player_position))
+
+    def solve_finished(self, found, player_position):
+        """Called when solving has finished. The lines of the solution are built once here for
+        every floor."""
+        if not found:
+            self.unsolvable.emit()
+            return
+        self.build_solution_lines(player_position)
+        self.update()
+        self.solved.emit()
+        self.start_playback()
+
+    def new_game(self, dimensions, algorithm):
+        """Called by GameMainUI to start a new game. The maze is carved in a worker thread while
+        the current game stays in the view, the new maze replaces it when it is ready. Returns
+        the MazeTask, see create_task. Cancelling it keeps the current game."""
+        self.stop_playback()
+        return self.create_task(self.game.carve_steps(dimensions, algorithm), self.start_game)
 
-    def draw_game(self, painter):
-        """Called by paintEvent to initialize the actual drawing of the game"""
-        line_pen = QPen(Qt.black, 1, Qt.SolidLine)
-        painter.setPen(line_pen)
+    def start_game(self, field):
+        """Called when a new maze has been carved to start a game in it"""
+        self.game.start_game(field)
+        self.reset_timer()
+        self.update()
+        self.loaded.emit()
+
+    def load_game(self, file_name):
+        """Called by GameMainUI to load a saved game, raises ValueError if the file is not a
+        valid save file"""
+        self.game.load_game(file_name)
+        self.stop_playback()
+        self.reset_timer()
+        self.update()
+        self.loaded.emit()
 
-        #Calculate offsets to move view acc. to position or center the maze if whole maze fits
+    def get_view_offsets(self):
+        """Returns the x and y offsets of the maze in the view. The view follows the player or
+        the maze is centered if the whole maze fits."""
         if self.width() < self.game.get_field().get_width() * TILESIZE:
             x_offset = self.width()/2 - self.game.get_player().get_position().x * TILESIZE
         else:
@@ -75,86 +235,164 @@ class GameView(QWidget):
         else:
             y_offset = (self.height() - self.game.get_field().get_height() * TILESIZE) / 2
 
-        #Draw the current floor and solution if the maze is solved
+        return x_offset, y_offset
+
+    def check_field(self):
+        """Drops the cached drawings if the game has a different maze than when they were made"""
+        field = self.game.get_field()
+        if self.layer_field is not field:
+            self.layers.clear()
+            self.solution_lines = {}
+            self.layer_field = field
+
+    def draw_game(self, painter, rect=None):
+        """Called by paintEvent to initialize the actual drawing of the game. Only the cells
+        inside rect are drawn, or the cells inside the whole view if rect is not given."""
+        self.check_field()
+        x_offset, y_offset = self.get_view_offsets()
+        if rect is None:
+            rect = self.rect()
+
+        #Find the cells overlapping rect, solution lines reach into the neighboring cells so one
+        #more cell is drawn on every side
+        field = self.game.get_field()
+        first_x = max(0, int((rect.left() - x_offset) // TILESIZE) - 1)
+        last_x = min(field.get_width(), int((rect.right() - x_offset) // TILESIZE) + 2)
+        first_y = max(0, int((rect.top() - y_offset) // TILESIZE) - 1)
+        last_y = min(field.get_height(), int((rect.bottom() - y_offset) // TILESIZE) + 2)
+
+        #Draw the cached pixmaps of the visible part of the current floor
         z = self.game.get_player().get_floor()
-        for y in range(self.game.get_field().get_height()):
-            for x in range(self.game.get_field().get_width()):
-                coordinates = Coordinate(x, y, z)
-                self.draw_maze(painter, x_offset, y_offset, coordinates)
-                if self.game.get_field().get_cell(coordinates).get_solution():
-                    self.draw_solution(painter, x_offset, y_offset, coordinates)
+        tiles_y = range(first_y // LAYER_TILE, (last_y - 1) // LAYER_TILE + 1)
+        tiles_x = range(first_x // LAYER_TILE, (last_x - 1) // LAYER_TILE + 1)
+        self.visible_layers = len(tiles_x) * len(tiles_y)
+        for tile_y in tiles_y:
+            for tile_x in tiles_x:
+                painter.drawPixmap(QPointF(tile_x * LAYER_TILE * TILESIZE + x_offset,
+                                           tile_y * LAYER_TILE * TILESIZE + y_offset),
+                                   self.get_layer(z, tile_x, tile_y))
+
+        #Draw the solution if the maze is solved, the lines are in maze coordinates
+        if field.is_solved() and z in self.solution_lines:
+            painter.save()
+            painter.translate(x_offset, y_offset)
+            painter.setPen(self.solution_pen)
+            painter.drawLines(self.solution_lines[z])
+            painter.restore()
 
         #Draw the player
         self.draw_player(painter, x_offset, y_offset)
 
-    def draw_maze(self, painter, x_offset, y_offset, coordinates):
-        """Draws the maze"""
-        maze_pen = QPen(Qt.black, 1, Qt.SolidLine)
-        painter.setPen(maze_pen)
-        cell = self.game.get_field().get_cell(coordinates)
+    def get_layer(self, z, tile_x, tile_y):
+        """Returns a pixmap with the walls, ladders and holes of a tile of floor z, which is drawn
+        the first time it is needed. Pixmaps are dropped when the maze or the floor changes and
+        when more than LAYER_CACHE_SIZE of them besides the visible ones are cached."""
+        self.check_field()
+        if self.layer_floor != z:
+            self.layers.clear()
+            self.layer_floor = z
+        key = (z, tile_x, tile_y)
+        layer = self.layers.get(key)
+        if layer is not None:
+            self.layers.move_to_end(key)
+            return layer
+
+        #Collect the lines and holes of the whole tile and draw them with one call each
+        field = self.game.get_field()
+        lines = []
+        holes = QPainterPath()
+        for y in range(tile_y * LAYER_TILE, min(field.get_height(), (tile_y + 1) * LAYER_TILE)):
+            for x in range(tile_x * LAYER_TILE, min(field.get_width(), (tile_x + 1) * LAYER_TILE)):
+                self.add_maze_geometry(lines, holes, Coordinate(x - tile_x * LAYER_TILE,
+                                                               y - tile_y * LAYER_TILE, z),
+                                       field.get_cell_value(field.index((x, y, z))))
+
+        #One extra pixel for the walls on the right and bottom edges of the tile
+        layer = QPixmap(LAYER_TILE * TILESIZE + 1, LAYER_TILE * TILESIZE + 1)
+        layer.fill(Qt.transparent)
+        painter = QPainter()
+        painter.begin(layer)
+        painter.setPen(self.maze_pen)
+        painter.drawLines(lines)
+        painter.drawPath(holes)
+        painter.end()
+
+        self.layers[key] = layer
+        while len(self.layers) > self.visible_layers + LAYER_CACHE_SIZE:
+            self.layers.popitem(last=False)
+        return layer
+
+    @staticmethod
+    def add_maze_geometry(lines, holes, coordinates, value):
+        """Adds the walls and ladders of a cell with the packed value to lines and its hole to
+        holes. Coordinates are relative to the drawn area."""
         x = coordinates.x
         y = coordinates.y
 
-        if cell.is_wall(Cell.BACK) and not cell.is_entrance():
-            painter.drawLine(x*TILESIZE+x_offset, y*TILESIZE+y_offset,
-                             (x+1)*TILESIZE+x_offset, y*TILESIZE+y_offset)
-        if cell.is_wall(Cell.FRONT) and not cell.is_goal():
-            painter.drawLine(x*TILESIZE+x_offset, (y+1)*TILESIZE+y_offset,
-                             (x+1)*TILESIZE+x_offset, (y+1)*TILESIZE+y_offset)
-        if cell.is_wall(Cell.LEFT):
-            painter.drawLine(x*TILESIZE+x_offset, y*TILESIZE+y_offset,
-                             x*TILESIZE+x_offset, (y+1)*TILESIZE+y_offset)
-        if cell.is_wall(Cell.RIGHT):
-            painter.drawLine((x+1)*TILESIZE+x_offset, y*TILESIZE+y_offset,
-                             (x+1)*TILESIZE+x_offset, (y+1)*TILESIZE+y_offset)
-
-        if not cell.is_wall(Cell.TOP):
-            #Draw ladders
-            painter.drawLine(x*TILESIZE+6+x_offset, y*TILESIZE+2+y_offset,
-                             x*TILESIZE+6+x_offset, (y+1)*TILESIZE-6+y_offset)
-            painter.drawLine((x+1)*TILESIZE-6+x_offset, y*TILESIZE+2+y_offset,
-                             (x+1)*TILESIZE-6+x_offset, (y+1)*TILESIZE-6+y_offset)
-            painter.drawLine(x*TILESIZE+6+x_offset, y*TILESIZE+4+y_offset,
-                             (x+1)*TILESIZE-6+x_offset, y*TILESIZE+4+y_offset)
-            painter.drawLine(x*TILESIZE+6+x_offset, y*TILESIZE+8+y_offset,
-                             (x+1)*TILESIZE-6+x_offset, y*TILESIZE+8+y_offset)
-            painter.drawLine(x*TILESIZE+6+x_offset, y*TILESIZE+12+y_offset,
-                             (x+1)*TILESIZE-6+x_offset, y*TILESIZE+12+y_offset)
-
-        if not cell.is_wall(Cell.BOTTOM):
-            painter.drawEllipse(x*TILESIZE+2+x_offset, y*TILESIZE+TILESIZE/2+y_offset,
-                                TILESIZE-4, TILESIZE/2-4)
-
-    def draw_solution(self, painter, x_offset, y_offset, coordinates):
-        """Draws the solution"""
-        solution_pen = QPen(Qt.green, 1, Qt.SolidLine)
-        painter.setPen(solution_pen)
-        cell = self.game.get_field().get_cell(coordinates)
+        if value & 1 << Cell.BACK and not value & 1 << Cell.ENTRANCE:
+            lines.append(QLineF(x*TILESIZE, y*TILESIZE, (x+1)*TILESIZE, y*TILESIZE))
+        if value & 1 << Cell.FRONT and not value & 1 << Cell.GOAL:
+            lines.append(QLineF(x*TILESIZE, (y+1)*TILESIZE, (x+1)*TILESIZE, (y+1)*TILESIZE))
+        if value & 1 << Cell.LEFT:
+            lines.append(QLineF(x*TILESIZE, y*TILESIZE, x*TILESIZE, (y+1)*TILESIZE))
+        if value & 1 << Cell.RIGHT:
+            lines.append(QLineF((x+1)*TILESIZE, y*TILESIZE, (x+1)*TILESIZE, (y+1)*TILESIZE))
+
+        if not value & 1 << Cell.TOP:
+            #Ladders
+            lines.append(QLineF(x*TILESIZE+6, y*TILESIZE+2, x*TILESIZE+6, (y+1)*TILESIZE-6))
+            lines.append(QLineF((x+1)*TILESIZE-6, y*TILESIZE+2,
+                                (x+1)*TILESIZE-6, (y+1)*TILESIZE-6))
+            lines.append(QLineF(x*TILESIZE+6, y*TILESIZE+4, (x+1)*TILESIZE-6, y*TILESIZE+4))
+            lines.append(QLineF(x*TILESIZE+6, y*TILESIZE+8, (x+1)*TILESIZE-6, y*TILESIZE+8))
+            lines.append(QLineF(x*TILESIZE+6, y*TILESIZE+12, (x+1)*TILESIZE-6, y*TILESIZE+12))
+
+        if not value & 1 << Cell.BOTTOM:
+            holes.addEllipse(x*TILESIZE+2, y*TILESIZE+TILESIZE/2, TILESIZE-4, TILESIZE/2-4)
+
+    def build_solution_lines(self, start):
+        """Builds the lines of the solution for every floor by following the solution from start,
+        so only the cells on the path are visited"""
+        self.check_field()
+        field = self.game.get_field()
+        offsets = field.get_offsets()
+        self.solution_lines = {}
+        index = field.index(start)
+        direction = field.get_cell_solution(index)
+        while direction is not None:
+            coordinates = field.get_coordinate(index)
+            self.add_solution_geometry(self.solution_lines.setdefault(coordinates.z, []),
+                                       coordinates, direction)
+            index += offsets[direction]
+            direction = field.get_cell_solution(index)
+
+    @staticmethod
+    def add_solution_geometry(lines, coordinates, direction):
+        """Adds the solution line leading from the cell at coordinates in direction to lines"""
         x = coordinates.x
         y = coordinates.y
 
-        if cell.get_solution() == Cell.RIGHT:
-            painter.drawLine(x*TILESIZE+x_offset+TILESIZE/2, y*TILESIZE+y_offset+TILESIZE/2,
-                             (x+1)*TILESIZE+x_offset+TILESIZE/2, y*TILESIZE+y_offset+TILESIZE/2)
-        if cell.get_solution() == Cell.LEFT:
-            painter.drawLine((x-1)*TILESIZE+x_offset+TILESIZE/2, y*TILESIZE+y_offset+TILESIZE/2,
-                             x*TILESIZE+x_offset+TILESIZE/2, y*TILESIZE+y_offset+TILESIZE/2)
-        if cell.get_solution() == Cell.BACK:
-            painter.drawLine(x*TILESIZE+x_offset+TILESIZE/2, y*TILESIZE+y_offset+TILESIZE/2,
-                             x*TILESIZE+x_offset+TILESIZE/2, (y-1)*TILESIZE+y_offset+TILESIZE/2)
-        if cell.get_solution() == Cell.FRONT:
-            painter.drawLine(x*TILESIZE+x_offset+TILESIZE/2, (y+1)*TILESIZE+y_offset+TILESIZE/2,
-                             x*TILESIZE+x_offset+TILESIZE/2, y*TILESIZE+y_offset+TILESIZE/2)
+        if direction == Cell.RIGHT:
+            lines.append(QLineF(x*TILESIZE+TILESIZE/2, y*TILESIZE+TILESIZE/2,
+                                (x+1)*TILESIZE+TILESIZE/2, y*TILESIZE+TILESIZE/2))
+        if direction == Cell.LEFT:
+            lines.append(QLineF((x-1)*TILESIZE+TILESIZE/2, y*TILESIZE+TILESIZE/2,
+                                x*TILESIZE+TILESIZE/2, y*TILESIZE+TILESIZE/2))
+        if direction == Cell.BACK:
+            lines.append(QLineF(x*TILESIZE+TILESIZE/2, y*TILESIZE+TILESIZE/2,
+                                x*TILESIZE+TILESIZE/2, (y-1)*TILESIZE+TILESIZE/2))
+        if direction == Cell.FRONT:
+            lines.append(QLineF(x*TILESIZE+TILESIZE/2, (y+1)*TILESIZE+TILESIZE/2,
+                                x*TILESIZE+TILESIZE/2, y*TILESIZE+TILESIZE/2))
 
     def draw_player(self, painter, x_offset, y_offset):
         """Draws the player"""
-        player_pen = QPen(Qt.red, 1, Qt.SolidLine)
-        painter.setPen(player_pen)
+        painter.setPen(self.player_pen)
         player_position = self.game.get_player().get_position()
-        painter.drawEllipse(player_position.x*TILESIZE+2+x_offset,
-                            player_position.y*TILESIZE+2+y_offset,
-                            TILESIZE-4,
-                            TILESIZE-4)
+        painter.drawEllipse(QRectF(player_position.x*TILESIZE+2+x_offset,
+                                   player_position.y*TILESIZE+2+y_offset,
+                                   TILESIZE-4,
+                                   TILESIZE-4))
 
     def reset_timer(self):
         """Resets the internal timer, should be called always when the current time is updated
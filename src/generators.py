@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""Registry of maze generation algorithms. Every generator takes a freshly created Maze, the
+coordinates of the entrance and a bias, and carves a perfect maze where every cell can be reached
+through exactly one path. Bias determines how many more times likely the generator is going to
+stay on the current floor vs. going up or down a floor, just like in Maze.carve_maze."""
+
+from array import array
+from coordinate import Coordinate
+from cell import Cell
+from maze import Maze, BIAS
+from steps import PROGRESS_STEP, run_steps, single_step
+import numpyengine
+
+#Chance of joining two neighboring cells on the same floor in Eller's algorithm, joining cells on
+#different floors is bias times less likely
+JOIN_CHANCE = 0.5
+#Chance of extending a set to the next layer in Eller's algorithm, each set extends at least once
+EXTEND_CHANCE = 0.3
+
+def _finish_maze(maze, start):
+    """Marks the entrance and goal and sets the maze as carved. The goal is always the 'max'
+    coordinates of the maze, same as with the default carver."""
+    maze.get_cell(start).set_as_entrance()
+    maze.get_cell(maze.get_dimensions()).set_as_goal()
+    maze.make_cells_unvisited()
+    maze.set_carved()
+
+def carve_binary_tree(maze, start=Coordinate(0, 0, 0), bias=BIAS):
+    """Binary tree generator, connects every cell to its LEFT, BACK or BOTTOM neighbor. Needs only
+    a single pass and no extra memory, but the mazes have long corridors along the edges."""
+    run_steps(carve_binary_tree_steps(maze, start, bias))
+
+def carve_binary_tree_steps(maze, start=Coordinate(0, 0, 0), bias=BIAS):
+    """Step generator version of carve_binary_tree, yields the number of cells carved so far"""
+    maze_random = maze.get_random()
+    done = 0
+    for z in range(maze.get_floors()):
+        for y in range(maze.get_height()):
+            for x in range(maze.get_width()):
+                done += 1
+                if not done % PROGRESS_STEP:
+                    yield done
+                left_weight = bias if x > 0 else 0
+                back_weight = bias if y > 0 else 0
+                bottom_weight = 1 if z > 0 else 0
+                total = left_weight + back_weight + bottom_weight
+                if not total:
+                    continue
+
+                choice = maze_random.randrange(0, total)
+                if choice < left_weight:
+                    direction = Cell.LEFT
+                elif choice < left_weight + back_weight:
+                    direction = Cell.BACK
+                else:
+                    direction = Cell.BOTTOM
+                maze.carve_passage(maze.index((x, y, z)), direction)
+
+    _finish_maze(maze, start)
+
+def carve_sidewinder(maze, start=Coordinate(0, 0, 0), bias=BIAS):
+    """Sidewinder generator, carves runs of cells to the RIGHT and connects each run once to the
+    previous row or floor from a random cell of the run. Needs only a single pass."""
+    run_steps(carve_sidewinder_steps(maze, start, bias))
+
+def carve_sidewinder_steps(maze, start=Coordinate(0, 0, 0), bias=BIAS):
+    """Step generator version of carve_sidewinder, yields the number of cells carved so far"""
+    maze_random = maze.get_random()
+    done = 0
+    for z in range(maze.get_floors()):
+        for y in range(maze.get_height()):
+            back_weight = bias if y > 0 else 0
+            bottom_weight = 1 if z > 0 else 0
+            run_start = 0
+
+            for x in range(maze.get_width()):
+                done += 1
+                if not done % PROGRESS_STEP:
+                    yield done
+                at_end = x == maze.get_width() - 1
+
+                #The very first row has nothing to connect to, so it is a single run
+                if not back_weight and not bottom_weight:
+                    if not at_end:
+                        maze.carve_passage(maze.index((x, y, z)), Cell.RIGHT)
+                    continue
+
+                if at_end or maze_random.randrange(0, 2) == 0:
+                    run_cell = maze.index((maze_random.randrange(run_start, x + 1), y, z))
+                    if maze_random.randrange(0, back_weight + bottom_weight) < back_weight:
+                        maze.carve_passage(run_cell, Cell.BACK)
+                    else:
+                        maze.carve_passage(run_cell, Cell.BOTTOM)
+                    run_start = x + 1
+                else:
+                    maze.carve_passage(maze.index((x, y, z)), Cell.RIGHT)
+
+    _finish_maze(maze, start)
+
+def carve_eller(maze, start=Coordinate(0, 0, 0), bias=BIAS):
+    """Eller's algorithm generalized to three dimensions. The maze is swept one layer at a time
+    along y, where a layer consists of one row from every floor, so only the sets of a single
+    layer are kept in memory."""
+    run_steps(carve_eller_steps(maze, start, bias))
+
+def carve_eller_steps(maze, start=Coordinate(0, 0, 0), bias=BIAS):
+    """Step generator version of carve_eller, yields the number of cells carved so far after
+    every layer which reaches another multiple of PROGRESS_STEP cells"""
+    maze_random = maze.get_random()
+    width = maze.get_width()
+    floors = maze.get_floors()
+    layer_size = width * floors
+
+    #Set of each cell in the current layer, indexed by z * width + x, and the union-find parents
+    #of the sets in the current layer
+    sets = [None] * layer_size
+    parent = {}
+    next_set = 0
+
+    def find(cell_set):
+        """Returns the representative set with path halving"""
+        while parent[cell_set] != cell_set:
+            parent[cell_set] = parent[parent[cell_set]]
+            cell_set = parent[cell_set]
+        return cell_set
+
+    def join(i, j, y, direction):
+        """Joins the sets of layer cells i and j if they differ by carving from i"""
+        first = find(sets[i])
+        second = find(sets[j])
+        if first != second:
+            parent[second] = first
+            maze.carve_passage(maze.index((i % width, y, i // width)), direction)
+
+    for y in range(maze.get_height()):
+        last = y == maze.get_height() - 1
+        if y and (y * layer_size) // PROGRESS_STEP != ((y - 1) * layer_size) // PROGRESS_STEP:
+            yield y * layer_size
+
+        #Cells that were not connected from the previous layer start in a set of their own
+        parent.clear()
+        for i in range(layer_size):
+            if sets[i] is None:
+                sets[i] = next_set
+                next_set += 1
+            parent[sets[i]] = sets[i]
+
+        #Randomly join neighbors on the same floor, the last layer joins all remaining sets
+        for z in range(floors):
+            for x in range(width - 1):
+                if last or maze_random.random() < JOIN_CHANCE:
+                    join(z * width + x, z * width + x + 1, y, Cell.RIGHT)
+
+        #Floors are joined in a random order so that ladders are not all at the same spot
+        for z in range(floors - 1):
+            columns = list(range(width))
+            maze_random.shuffle(columns)
+            for x in columns:
+                if last or maze_random.random() < JOIN_CHANCE / bias:
+                    join(z * width + x, (z + 1) * width + x, y, Cell.TOP)
+
+        if last:
+            break
+
+        #Every set has to continue to the next layer at least once
+        members = {}
+        for i in range(layer_size):
+            members.setdefault(find(sets[i]), []).append(i)
+
+        sets = [None] * layer_size
+        for cell_set, cells in members.items():
+            extended = [i for i in cells if maze_random.random() < EXTEND_CHANCE]
+            if not extended:
+                extended = [maze_random.choice(cells)]
+            for i in extended:
+                sets[i] = cell_set
+                maze.carve_passage(maze.index((i % width, y, i // width)), Cell.FRONT)
+
+    _finish_maze(maze, start)
+
+def carve_kruskal(maze, start=Coordinate(0, 0, 0), bias=BIAS):
+    """Randomized Kruskal's algorithm with union-find. Walls are removed in random order whenever
+    they separate two unconnected cells, walls between floors are bias times less likely to be
+    picked next than walls on the same floor."""
+    run_steps(carve_kruskal_steps(maze, start, bias))
+
+def carve_kruskal_steps(maze, start=Coordinate(0, 0, 0), bias=BIAS):
+    """Step generator version of carve_kruskal, yields the number of cells joined to the maze
+    so far"""
+    maze_random = maze.get_random()
+    width = maze.get_width()
+    height = maze.get_height()
+    floors = maze.get_floors()
+    offsets = maze.get_offsets()
+
+    #Walls are stored as index * 8 + direction to keep the lists compact
+    same_floor = []
+    between_floors = []
+    for z in range(floors):
+        for y in range(height):
+            for x in range(width):
+                index = maze.index((x, y, z))
+                if x < width - 1:
+                    same_floor.append(index * 8 + Cell.RIGHT)
+                if y < height - 1:
+                    same_floor.append(index * 8 + Cell.FRONT)
+                if z < floors - 1:
+                    between_floors.append(index * 8 + Cell.TOP)
+    maze_random.shuffle(same_floor)
+    maze_random.shuffle(between_floors)
+
+    parent = array('l', range(width * height * floors))
+
+    def find(index):
+        """Returns the representative cell with path halving"""
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    joined = 0
+    while same_floor or between_floors:
+        #Weighted pick of the next wall without replacement
+        same_floor_weight = bias * len(same_floor)
+        if maze_random.random() * (same_floor_weight + len(between_floors)) < same_floor_weight:
+            wall = same_floor.pop()
+        else:
+            wall = between_floors.pop()
+
+        index = wall >> 3
+        direction = wall & 7
+        first = find(index)
+        second = find(index + offsets[direction])
+        if first != second:
+            parent[second] = first
+            maze.carve_passage(index, direction)
+            joined += 1
+            if not joined % PROGRESS_STEP:
+                yield joined
+
+    _finish_maze(maze, start)
+
+GENERATORS = {
+    'dfs': Maze.carve_maze,
+    'eller': carve_eller,
+    'kruskal': carve_kruskal,
+    'sidewinder': carve_sidewinder,
+    'binary-tree': carve_binary_tree,
+}
+
+if numpyengine.HAS_NUMPY:
+    GENERATORS['numpy'] = numpyengine.carve_maze
+
+#Step generator versions of the generators which can be run a little at a time, see the steps
+#module
+STEP_GENERATORS = {
+    'dfs': Maze.carve_steps,
+    'eller': carve_eller_steps,
+    'kruskal': carve_kruskal_steps,
+    'sidewinder': carve_sidewinder_steps,
+    'binary-tree': carve_binary_tree_steps,
+}
+
+DEFAULT_GENERATOR = 'dfs'
+
+#Version of the maze generators, which has to be increased whenever a generator carves a different
+#maze for the same seed than before. Mazes cached by an older version are then carved again.
+GENERATOR_VERSION = 1
+
+def register_generator(name, generator, steps=None):
+    """Adds a generator to the registry. The generator is called with a Maze, the entrance
+    coordinates and the bias. Steps is an optional step generator version of it, which yields
+    the number of cells carved so far."""
+    GENERATORS[name] = generator
+    if steps is None:
+        STEP_GENERATORS.pop(name, None)
+    else:
+        STEP_GENERATORS[name] = steps
+
+def get_generator(name):
+    """Returns the generator registered under name"""
+    if name not in GENERATORS:
+        raise ValueError('Unknown maze generator: %s' % name)
+    return GENERATORS[name]
+
+def get_generator_steps(name):
+    """Returns the step generator version of the generator registered under name. Generators
+    without one are run in a single step."""
+    generator = get_generator(name)
+    if name in STEP_GENERATORS:
+        return STEP_GENERATORS[name]
+    return lambda *args: single_step(generator, *args)
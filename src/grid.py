@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""The CellGrid base class with the cell layout shared by Maze and TiledMaze"""
+
+from coordinate import Coordinate
+from cell import Cell, CellView, WALL_BITS
+
+#Directions without a wall for every wall mask, in direction order
+OPEN_DIRECTIONS = tuple(tuple(direction for direction in range(6) if not mask & 1 << direction)
+                        for mask in range(WALL_BITS + 1))
+
+class CellGrid:
+    """Base class for mazes of the given size whose cells are numbered in z, y, x order. The
+    subclasses store the packed cell values and provide get_cell_value and set_cell_value."""
+
+    def __init__(self, size):
+        self.__size = size
+        self.__floor_size = size.x * size.y
+
+        #Linear index offset to the neighboring cell, indexed by direction
+        offsets = [0] * 6
+        offsets[Cell.TOP] = self.__floor_size
+        offsets[Cell.BOTTOM] = -self.__floor_size
+        offsets[Cell.LEFT] = -1
+        offsets[Cell.RIGHT] = 1
+        offsets[Cell.BACK] = -size.x
+        offsets[Cell.FRONT] = size.x
+        self.__offsets = tuple(offsets)
+
+    def get_cell_value(self, index):
+        """Returns the packed value of the cell at the given linear index"""
+        raise NotImplementedError
+
+    def index(self, point):
+        """Returns the linear index of the cell at the given coordinates"""
+        x, y, z = point
+        return z * self.__floor_size + y * self.__size.x + x
+
+    def get_coordinate(self, index):
+        """Returns the coordinates of the cell at the given linear index"""
+        z, rest = divmod(index, self.__floor_size)
+        y, x = divmod(rest, self.__size.x)
+        return Coordinate(x, y, z)
+
+    def get_cell(self, point):
+        """Returns a view of the cell at the given coordinates. Point can be a Coordinate, a plain
+        (x, y, z) tuple or a linear index."""
+        if isinstance(point, int):
+            return CellView(self, point)
+        return CellView(self, self.index(point))
+
+    def get_offsets(self):
+        """Returns a tuple of linear index offsets to the neighboring cell, indexed by direction"""
+        return self.__offsets
+
+    def walls_mask(self, index):
+        """Returns the walls of the cell at the given linear index as a bitmask, where bit n is set
+        if there is a wall in direction n"""
+        return self.get_cell_value(index) & WALL_BITS
+
+    def open_directions(self, index):
+        """Returns a tuple of the directions without a wall from the cell at the given linear
+        index. Moving in direction d leads to the index plus get_offsets()[d]."""
+        return OPEN_DIRECTIONS[self.get_cell_value(index) & WALL_BITS]
+
+    def is_goal(self, point):
+        """Returns whether there is a goal at the given coordinates"""
+        return bool(self.get_cell_value(self.index(point)) & 1 << Cell.GOAL)
+
+    def is_entrance(self, point):
+        """Returns whether there is an entrance at the given coordinates"""
+        return bool(self.get_cell_value(self.index(point)) & 1 << Cell.ENTRANCE)
+
+    def get_width(self):
+        """Returns the width (x-dimension) of the maze"""
+        return self.__size.x
+
+    def get_height(self):
+        """Returns the height (y-dimension) of the maze"""
+        return self.__size.y
+
+    def get_floors(self):
+        """Returns the number of floors (z-dimension) of the maze"""
+        return self.__size.z
+
+    def get_dimensions(self, full_dimensions=False):
+        """Returns a tuple of the maze dimensions"""
+        if not full_dimensions:
+            return self.__size - 1
+        return self.__size
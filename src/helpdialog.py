@@ -50,12 +50,24 @@ class HelpDialog(QDialog):
         ladder_text = QLabel('Ascend/descend ladder')
         ladder_text.setAlignment(Qt.AlignRight)
 
+        pause_key = QLabel('Space')
+        pause_text = QLabel('Pause/resume auto-solve')
+        pause_text.setAlignment(Qt.AlignRight)
+
+        speed_key = QLabel('+/-')
+        speed_text = QLabel('Auto-solve speed')
+        speed_text.setAlignment(Qt.AlignRight)
+
         self.main_layout.addWidget(controls_text)
         self.main_layout.addLayout(self.controls_layout)
         self.controls_layout.addWidget(move_key, 0, 0, 1, 1)
         self.controls_layout.addWidget(move_text, 0, 1, 1, 1)
         self.controls_layout.addWidget(ladder_key, 1, 0, 1, 1)
         self.controls_layout.addWidget(ladder_text, 1, 1, 1, 1)
+        self.controls_layout.addWidget(pause_key, 2, 0, 1, 1)
+        self.controls_layout.addWidget(pause_text, 2, 1, 1, 1)
+        self.controls_layout.addWidget(speed_key, 3, 0, 1, 1)
+        self.controls_layout.addWidget(speed_text, 3, 1, 1, 1)
         self.main_layout.addSpacing(10)
 
     def initialize_hotkeys(self):
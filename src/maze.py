@@ -2,313 +2,646 @@
 """The Maze class which is basically a container for Cells"""
 
 import random
-from copy import copy
+import re
+import time
+from array import array
+from collections import deque
 from coordinate import Coordinate
-from cell import Cell
+from cell import Cell, CellView, CLOSED_CELL, NO_SOLUTION, WALL_BITS
+from grid import CellGrid, OPEN_DIRECTIONS
+from textexport import iter_ascii
+from stats import CountingRandom
+from steps import PROGRESS_STEP, run_steps
 
 BIAS = 5
 
-class Maze:
+#Largest epoch that fits in a visit stamp
+MAX_EPOCH = 0xFFFF
+
+#Opposite direction of each direction, indexed by direction
+OPPOSITE = (Cell.BOTTOM, Cell.TOP, Cell.RIGHT, Cell.LEFT, Cell.FRONT, Cell.BACK)
+
+#Directions the carver can take on the same floor and between floors for every edge mask, in the
+#order the carver considers them
+CARVER_FLOOR_DIRECTIONS = tuple(tuple(direction for direction in (Cell.LEFT, Cell.RIGHT, Cell.BACK,
+                                                                   Cell.FRONT)
+                                      if not mask & 1 << direction)
+                                for mask in range(WALL_BITS + 1))
+CARVER_LADDER_DIRECTIONS = tuple(tuple(direction for direction in (Cell.TOP, Cell.BOTTOM)
+                                       if not mask & 1 << direction)
+                                 for mask in range(WALL_BITS + 1))
+
+#Translation tables which add a single wall to packed cell values, indexed by direction
+ADD_WALL = tuple(bytes(value | 1 << direction for value in range(256))
+                 for direction in range(6))
+
+#Matches the packed values of cells with an entrance or goal marker, which are the only values
+#with bits above the walls set
+MARKED_CELL = re.compile(rb'[\x40-\xff]')
+
+#Mazes with at most this many cells keep a shared Coordinate instance for every cell
+INTERN_LIMIT = 1 << 16
+
+class Maze(CellGrid):
     """The Maze class which is a container class for Cells"""
 
-    def __init__(self, size, seed=None):
+    def __init__(self, size, seed=None, cells=None, stats=None):
         """
         Initialize maze with cells that have walls on all sides
         Seed can be passed for unit testing
+        Cells can be an existing writable buffer in the packed layout, such as a memory mapped
+        saved game, which is then used as is instead of allocating closed cells
+        Stats can be an EngineStats which collects counters and timings of the maze
         """
 
-        self.__maze = [None] * size.z
+        started = time.perf_counter()
+        super().__init__(size)
+
+        #Cells are stored packed in z, y, x order with one byte per cell using the saved game
+        #layout. Visited flags and solution directions are kept in parallel buffers, which are
+        #allocated on first use so that mapped mazes stay cheap to open.
         self.__size = size
+        self.__floor_size = size.x * size.y
+        if cells is None:
+            cells = bytearray([CLOSED_CELL]) * (self.__floor_size * size.z)
+        elif len(cells) != self.__floor_size * size.z:
+            raise ValueError('Cell data does not match the maze dimensions')
+        self.__cells = cells
+        self.__solution = None
+
+        self.__offsets = self.get_offsets()
+
+        #Directions leading out of the maze as a mask for every x, y and z
+        self.__x_edges = bytes((x == 0) << Cell.LEFT | (x == size.x - 1) << Cell.RIGHT
+                               for x in range(size.x))
+        self.__y_edges = bytes((y == 0) << Cell.BACK | (y == size.y - 1) << Cell.FRONT
+                               for y in range(size.y))
+        self.__z_edges = bytes((z == 0) << Cell.BOTTOM | (z == size.z - 1) << Cell.TOP
+                               for z in range(size.z))
         self.__carved = False
         self.__solved = False
 
-        for i in range(size.z):
-            self.__maze[i] = [None] * size.y
-            for j in range(size.y):
-                self.__maze[i][j] = [None] * size.x
-                for k in range(size.x):
-                    self.__maze[i][j][k] = Cell()
+        #A cell is visited when its stamp equals the current epoch, so all cells are made
+        #unvisited at once by starting a new epoch
+        self.__visit_stamps = None
+        self.__epoch = 1
+
+        #Distance to the goal and next step direction of every cell, built lazily and dropped
+        #whenever walls or markers change
+        self.__distance_field = None
 
-        random.seed(seed)
+        #Sets of entrance and goal indices, built on first use and kept up to date when cells are
+        #changed through set_cell_value
+        self.__markers = None
+
+        #Shared coordinates of every cell in small mazes, built on first use
+        self.__coordinates = None
+
+        #Every maze has a random generator of its own, so mazes with the same seed are the same
+        #even when they are generated at the same time
+        self.__random = random.Random(seed)
+
+        self.__stats = stats
+        self.__add_time('allocate', started)
 
     def __str__(self):
         """
-        Draws the complete maze
+        Draws the complete maze, see textexport for writing large mazes without building the
+        whole drawing in memory
         """
-
-        row1 = ""
-        row2 = ""
-        result = ""
-
-        for z in range(self.__size.z):
-            result += "Floor " + str(z + 1) + '\n'
-            for y in range(self.__size.y):
-                for x in range(self.__size.x):
-                    if self.get_cell(Coordinate(x, y, z)).is_wall(Cell.BACK):
-                        row1 += "##"
-                    else:
-                        row1 += "# "
-                    if self.get_cell(Coordinate(x, y, z)).is_wall(Cell.LEFT):
-                        row2 += "#"
-                    else:
-                        row2 += " "
-                    if (not self.get_cell(Coordinate(x, y, z)).is_wall(Cell.TOP) and not
-                            self.get_cell(Coordinate(x, y, z)).is_wall(Cell.BOTTOM)):
-                        row2 += "X"
-                    elif not self.get_cell(Coordinate(x, y, z)).is_wall(Cell.TOP):
-                        row2 += "/"
-                    elif not self.get_cell(Coordinate(x, y, z)).is_wall(Cell.BOTTOM):
-                        row2 += "\\"
-                    else:
-                        row2 += " "
-
-                row1 += "#\n"
-                row2 += "#\n"
-
-                result = result + row1 + row2
-
-                row1 = ""
-                row2 = ""
-
-            result += "##" * self.__size.x + "#\n"
-
-        return result
+        return ''.join(iter_ascii(self))
+
+    def get_coordinate(self, index):
+        """Returns the coordinates of the cell at the given linear index. Small mazes return a
+        shared instance for each cell, which is safe since coordinates are immutable."""
+        if self.__coordinates is None and len(self.__cells) <= INTERN_LIMIT:
+            self.__coordinates = [Coordinate(x, y, z) for z in range(self.__size.z)
+                                  for y in range(self.__size.y) for x in range(self.__size.x)]
+        if self.__coordinates is not None:
+            return self.__coordinates[index]
+        return super().get_coordinate(index)
 
     def get_cell(self, point):
-        """Returns the cell at the given coordinates"""
-        return self.__maze[point.z][point.y][point.x]
+        """Returns a view of the cell at the given coordinates. Point can be a Coordinate, a plain
+        (x, y, z) tuple or a linear index."""
+        if self.__stats is not None:
+            self.__stats.add('get_cell')
+        if isinstance(point, int):
+            return CellView(self, point)
+        return CellView(self, self.index(point))
+
+    def get_random(self):
+        """Returns the random generator of the maze, which generators should use for carving"""
+        return self.__random
+
+    def set_stats(self, stats):
+        """Sets the EngineStats which collects counters and timings of the maze, None turns
+        instrumentation off"""
+        self.__stats = stats
+
+    def get_stats(self):
+        """Returns the EngineStats of the maze or None"""
+        return self.__stats
+
+    def walls_mask(self, index):
+        """Returns the walls of the cell at the given linear index as a bitmask, where bit n is set
+        if there is a wall in direction n"""
+        return self.__cells[index] & WALL_BITS
+
+    def open_directions(self, index):
+        """Returns a tuple of the directions without a wall from the cell at the given linear
+        index. Moving in direction d leads to the index plus get_offsets()[d]."""
+        return OPEN_DIRECTIONS[self.__cells[index] & WALL_BITS]
+
+    def seal_edges(self):
+        """Adds walls on all outer edges of the maze. Edges always have walls in generated mazes,
+        which the neighbor tables rely on, so this is used for loaded mazes. Only the cells which
+        miss a wall are written, so a copy-on-write mapping only copies their pages."""
+        cells = self.__cells
+        width = self.__size.x
+        floor_size = self.__floor_size
+        last_floor = len(cells) - floor_size
+
+        def seal(start, stop, step, direction):
+            #Faces are read with a single slice, which is translated as bytes since mapped cell
+            #buffers are memoryviews
+            current = bytes(cells[start:stop:step])
+            sealed = current.translate(ADD_WALL[direction])
+            if sealed == current:
+                return
+            for offset, (old, new) in enumerate(zip(current, sealed)):
+                if old != new:
+                    cells[start + offset * step] = new
+
+        seal(0, floor_size, 1, Cell.BOTTOM)
+        seal(last_floor, len(cells), 1, Cell.TOP)
+        for floor in range(0, len(cells), floor_size):
+            seal(floor, floor + width, 1, Cell.BACK)
+            seal(floor + floor_size - width, floor + floor_size, 1, Cell.FRONT)
+        seal(0, len(cells), width, Cell.LEFT)
+        seal(width - 1, len(cells), width, Cell.RIGHT)
+
+        self.__distance_field = None
+
+    def get_cells(self):
+        """Returns the packed cell buffer. The buffer is shared with the maze, so changes made to it
+        are changes to the maze and invalidate_distance_field has to be called after them"""
+        return self.__cells
+
+    def set_cells(self, data):
+        """Replaces all cells with the packed values in data, which can be any bytes-like object
+        with one byte per cell in z, y, x order"""
+        if len(data) != len(self.__cells):
+            raise ValueError('Cell data does not match the maze dimensions')
+        self.__cells[:] = data
+        self.__distance_field = None
+        self.__markers = None
+
+    def get_cell_value(self, index):
+        """Returns the packed value of the cell at the given linear index"""
+        return self.__cells[index]
+
+    def set_cell_value(self, index, value):
+        """Replaces the packed value of the cell at the given linear index"""
+        self.__cells[index] = value
+        self.__distance_field = None
+        if self.__markers is not None:
+            entrances, goals = self.__markers
+            if value & 1 << Cell.ENTRANCE:
+                entrances.add(index)
+            else:
+                entrances.discard(index)
+            if value & 1 << Cell.GOAL:
+                goals.add(index)
+            else:
+                goals.discard(index)
+
+    def is_cell_visited(self, index):
+        """Returns the visited flag of the cell at the given linear index"""
+        stamps = self.__visit_stamps
+        return stamps is not None and stamps[index] == self.__epoch
+
+    def set_cell_visited(self, index, flag):
+        """Sets the visited flag of the cell at the given linear index"""
+        self.__get_visit_stamps()[index] = self.__epoch if flag else 0
+
+    def get_cell_solution(self, index):
+        """Returns the solution direction of the cell at the given linear index or None"""
+        if self.__solution is None:
+            return None
+        direction = self.__solution[index]
+        if direction == NO_SOLUTION:
+            return None
+        return direction
+
+    def set_cell_solution(self, index, direction):
+        """Sets the solution direction of the cell at the given linear index, None clears it"""
+        if direction is None:
+            if self.__solution is not None:
+                self.__solution[index] = NO_SOLUTION
+        else:
+            self.__get_solution()[index] = direction
 
     def get_goal(self):
         """Returns the coordiantes for the goal in the maze. Always checks the 'last' cell first
-        since except for hacked saves it is always the goal"""
-        if self.get_cell(self.__size - 1).is_goal():
+        since except for hacked saves it is always the goal. If there are several goals, the one
+        with the lowest index is returned otherwise."""
+        if self.__cells[-1] & 1 << Cell.GOAL:
             return self.__size - 1
-        else:
-            for z in range(self.__size.z):
-                for y in range(self.__size.y):
-                    for x in range(self.__size.x):
-                        if self.get_cell(Coordinate(x, y, z)).is_goal():
-                            return Coordinate(x, y, z)
+        goals = self.__get_markers()[1]
+        if goals:
+            return self.get_coordinate(min(goals))
         return None
 
-    def get_width(self):
-        """Returns the width (x-dimension) of the maze"""
-        return self.__size.x
-
-    def get_height(self):
-        """Returns the height (y-dimension) of the maze"""
-        return self.__size.y
-
-    def get_floors(self):
-        """Returns the number of floors (z-dimension) of the maze"""
-        return self.__size.z
-
-    def get_dimensions(self, full_dimensions=False):
-        """Returns a tuple of the maze dimensions"""
-        if not full_dimensions:
-            return self.__size - 1
-        return self.__size
+    def get_goals(self):
+        """Returns the coordinates of all goals in the maze in index order"""
+        return [self.get_coordinate(index) for index in sorted(self.__get_markers()[1])]
+
+    def get_entrances(self):
+        """Returns the coordinates of all entrances in the maze in index order"""
+        return [self.get_coordinate(index) for index in sorted(self.__get_markers()[0])]
+
+    def is_goal(self, point):
+        """Returns whether there is a goal at the given coordinates"""
+        return bool(self.__cells[self.index(point)] & 1 << Cell.GOAL)
+
+    def is_entrance(self, point):
+        """Returns whether there is an entrance at the given coordinates"""
+        return bool(self.__cells[self.index(point)] & 1 << Cell.ENTRANCE)
+
+    def __get_markers(self):
+        """Returns the sets of entrance and goal indices, finding the marked cells with a single
+        regular expression search over the cells if they are not cached"""
+        if self.__markers is None:
+            entrances = set()
+            goals = set()
+            for match in MARKED_CELL.finditer(self.__cells):
+                value = self.__cells[match.start()]
+                if value & 1 << Cell.ENTRANCE:
+                    entrances.add(match.start())
+                if value & 1 << Cell.GOAL:
+                    goals.add(match.start())
+            self.__markers = (entrances, goals)
+        return self.__markers
 
     def set_carved(self):
         """Sets the maze as carved. Carving sets this flag automatically, should only be used when
         loading a saved game"""
         self.__carved = True
+        self.__distance_field = None
 
     def is_carved(self):
         """Returns whether the maze is carved"""
         return self.__carved
 
+    def set_solved(self):
+        """Sets the maze as solved. Solving sets this flag automatically, should only be used by
+        external solvers"""
+        self.__solved = True
+
     def is_solved(self):
         """Returns whether the maze is solved"""
         return self.__solved
 
-    def carve_maze(self, start=Coordinate(0, 0, 0)):
+    def carve_maze(self, start=Coordinate(0, 0, 0), bias=BIAS):
         """Recursive carver implemented in an iterative manner. Takes coordinates for carving
-        start or defaults to x=0, y=0 and z=0."""
+        start or defaults to x=0, y=0 and z=0. Bias is passed on to carver_unvisited_neighbors."""
+        run_steps(self.carve_steps(start, bias))
+
+    def carve_steps(self, start=Coordinate(0, 0, 0), bias=BIAS):
+        """Step generator version of carve_maze, yields the number of cells carved so far. See
+        the steps module."""
+        yield from self.__run_loop('carve', self.__carve, start, bias)
 
-        stack = [copy(start)]
+        #When the stack is empty, carving is finished
+        #Make all cells unvisited for future use
+
+        self.make_cells_unvisited()
+        self.__carved = True
+        self.__distance_field = None
+        self.__finish('carve_maze')
+
+    def __carve(self, start, bias):
+        """Carving loop of carve_maze as a step generator. Returns None followed by the loop
+        counters, see __run_loop."""
+
+        cells = self.__cells
+        stamps = self.__get_visit_stamps()
+        epoch = self.__epoch
+        offsets = self.__offsets
+        index = self.index(start)
+        stack = [index]
 
         #Carver start is set as entrance, goal is always the 'max' coordinates of the maze
         self.get_cell(start).set_as_entrance()
         self.get_cell(self.__size - 1).set_as_goal()
+        moves = pops = high_water = 0
 
         while stack:
 
+            #The stack is at its highest right before popping
+            high_water = max(high_water, len(stack))
+
             #Pop cell from stack when no neighbors found
-            cell = stack.pop()
+            index = stack.pop()
+            pops += 1
 
-            neighbors = self.carver_unvisited_neighbors(cell)
-            self.get_cell(cell).set_visited(True)
+            neighbors = self.__carver_neighbors(index, bias)
+            stamps[index] = epoch
 
             while neighbors:
                 #Found neighbors, choose one at random and add old cell to stack
-                stack.append(copy(cell))
-                direction = random.randrange(0, len(neighbors))
-
-                if neighbors[direction] == Cell.TOP:
-                    self.get_cell(cell).remove_wall(Cell.TOP)
-                    self.get_cell(Coordinate(cell.x, cell.y, cell.z+1)).remove_wall(Cell.BOTTOM)
-                    cell.z += 1
-
-                elif neighbors[direction] == Cell.BOTTOM:
-                    self.get_cell(cell).remove_wall(Cell.BOTTOM)
-                    self.get_cell(Coordinate(cell.x, cell.y, cell.z-1)).remove_wall(Cell.TOP)
-                    cell.z -= 1
-
-                elif neighbors[direction] == Cell.LEFT:
-                    self.get_cell(cell).remove_wall(Cell.LEFT)
-                    self.get_cell(Coordinate(cell.x-1, cell.y, cell.z)).remove_wall(Cell.RIGHT)
-                    cell.x -= 1
-
-                elif neighbors[direction] == Cell.RIGHT:
-                    self.get_cell(cell).remove_wall(Cell.RIGHT)
-                    self.get_cell(Coordinate(cell.x+1, cell.y, cell.z)).remove_wall(Cell.LEFT)
-                    cell.x += 1
-
-                elif neighbors[direction] == Cell.BACK:
-                    self.get_cell(cell).remove_wall(Cell.BACK)
-                    self.get_cell(Coordinate(cell.x, cell.y-1, cell.z)).remove_wall(Cell.FRONT)
-                    cell.y -= 1
-
-                elif neighbors[direction] == Cell.FRONT:
-                    self.get_cell(cell).remove_wall(Cell.FRONT)
-                    self.get_cell(Coordinate(cell.x, cell.y+1, cell.z)).remove_wall(Cell.BACK)
-                    cell.y += 1
-
-                neighbors = self.carver_unvisited_neighbors(cell)
-                self.get_cell(cell).set_visited(True)
+                stack.append(index)
+                moves += 1
+                if not moves % PROGRESS_STEP:
+                    yield moves
+                direction = neighbors[self.__random.randrange(0, len(neighbors))]
 
-        #When the stack is empty, carving is finished
-        #Make all cells unvisited for future use
+                #Remove the walls on both sides when moving to the neighbor
+                cells[index] &= ~(1 << direction)
+                index += offsets[direction]
+                cells[index] &= ~(1 << OPPOSITE[direction])
 
-        self.make_cells_unvisited()
-        self.__carved = True
+                neighbors = self.__carver_neighbors(index, bias)
+                stamps[index] = epoch
+
+        return None, moves, pops, high_water
 
     def solve_maze(self, start, goal):
         """Recursive solver implemented in an iterative manner, needs coordinates for solving
         start."""
-        stack = [copy(start)]
+        return run_steps(self.solve_steps(start, goal))
+
+    def solve_steps(self, start, goal):
+        """Step generator version of solve_maze, yields the number of cells visited so far. See
+        the steps module. A solve which is cancelled or does not find the goal leaves the maze
+        without a solution."""
+        found = False
+        try:
+            found = yield from self.__run_loop('solve', self.__solve, start, goal)
+        finally:
+            #Reset visited flags for future use, and for stability if no goal was found or
+            #solving was cancelled
+            self.make_cells_unvisited()
+            if not found:
+                #The directions written so far are a partial path, which must not be drawn
+                self.__solution = None
+                self.__solved = False
+        if found:
+            self.__solved = True
+        self.__finish('solve_maze')
+        return found
+
+    def __solve(self, start, goal):
+        """Solving loop of solve_maze as a step generator. Returns whether the goal was found
+        followed by the loop counters, see __run_loop."""
+        solution = self.__get_solution()
+        stamps = self.__get_visit_stamps()
+        offsets = self.__offsets
+        goal_index = self.index(goal)
+        index = self.index(start)
+        if index == goal_index:
+            #The loop only checks for the goal after moving, so starting at it is handled here
+            solution[index] = NO_SOLUTION
+            return True, 0, 1, 1
+        stack = [index]
+        moves = pops = high_water = 0
 
         while stack:
 
+            #The stack is at its highest right before popping
+            high_water = max(high_water, len(stack))
+
             #Pop cell from stack when no neighbors found
-            cell = stack.pop()
+            index = stack.pop()
+            pops += 1
 
-            neighbors = self.solver_unvisited_neighbors(cell)
-            self.get_cell(cell).set_visited(True)
+            neighbors = self.__solver_neighbors(index)
+            stamps[index] = self.__epoch
 
             while neighbors:
                 #Found neighbors, choose one at random and add old cell to stack
-                stack.append(copy(cell))
-                direction = random.randrange(0, len(neighbors))
-
-                self.get_cell(cell).set_solution(neighbors[direction])
-
-                if neighbors[direction] == Cell.TOP:
-                    cell.z += 1
-
-                elif neighbors[direction] == Cell.BOTTOM:
-                    cell.z -= 1
+                stack.append(index)
+                moves += 1
+                if not moves % PROGRESS_STEP:
+                    yield moves
+                direction = neighbors[self.__random.randrange(0, len(neighbors))]
 
-                elif neighbors[direction] == Cell.LEFT:
-                    cell.x -= 1
+                solution[index] = direction
+                index += offsets[direction]
 
-                elif neighbors[direction] == Cell.RIGHT:
-                    cell.x += 1
-
-                elif neighbors[direction] == Cell.BACK:
-                    cell.y -= 1
-
-                elif neighbors[direction] == Cell.FRONT:
-                    cell.y += 1
-
-                neighbors = self.solver_unvisited_neighbors(cell)
-                self.get_cell(cell).set_visited(True)
+                neighbors = self.__solver_neighbors(index)
+                stamps[index] = self.__epoch
 
                 #Only need to check for goal after moving since stack cells are already visited and
                 #start != goal
 
-                if cell == goal:
-                    self.make_cells_unvisited()
-                    self.__solved = True
-                    return True
-
-            self.get_cell(cell).set_solution(None)
+                if index == goal_index:
+                    return True, moves, pops, max(high_water, len(stack))
+
+            solution[index] = NO_SOLUTION
+
+        return False, moves, pops, high_water
+
+    def __run_loop(self, phase, loop, *args):
+        """Runs the carving or solving step generator loop, passing on its steps, and returns
+        its result. The loop returns its result followed by the number of moves to a new cell,
+        the number of cells popped from the stack and the largest size of the stack. With stats
+        these are recorded as the cells visited, backtracks and stack high-water mark of phase,
+        along with the random draws and the time taken."""
+        stats = self.__stats
+        if stats is None:
+            return (yield from loop(*args))[0]
+
+        self.__random = CountingRandom(self.__random)
+        started = time.perf_counter()
+        try:
+            result, moves, pops, high_water = yield from loop(*args)
+        finally:
+            self.__add_time(phase, started)
+            draws = self.__random.draws
+            self.__random = self.__random.get_wrapped()
+
+        #The starting cell is visited without a move and popped without backtracking
+        stats.add(phase + '_cells_visited', moves + 1)
+        stats.add(phase + '_backtracks', pops - 1)
+        stats.set_maximum(phase + '_stack_high_water', high_water)
+        stats.add(phase + '_rng_draws', draws)
+        return result
 
-        #Solver could not find a goal, reset visited flag for stability
-        self.make_cells_unvisited()
-        return False
+    def __add_time(self, phase, started):
+        """Adds the time since the performance counter value started to phase if the maze has
+        stats"""
+        if self.__stats is not None:
+            self.__stats.add_time(phase, time.perf_counter() - started)
+
+    def __finish(self, operation):
+        """Reports a finished operation if the maze has stats"""
+        if self.__stats is not None:
+            self.__stats.finish(operation)
+
+    def carve_passage(self, index, direction):
+        """Removes the wall between the cell at the given linear index and its neighbor in
+        direction from both cells. Used by the maze generators."""
+        self.__cells[index] &= ~(1 << direction)
+        self.__cells[index + self.__offsets[direction]] &= ~(1 << OPPOSITE[direction])
+        self.__distance_field = None
+
+    def invalidate_distance_field(self):
+        """Drops the cached distance field and goal locations, needed only after changing the cell
+        buffer directly"""
+        self.__distance_field = None
+        self.__markers = None
+
+    def __get_distance_field(self):
+        """Returns the distances to the nearest goal and next step directions of all cells,
+        building them with a single breadth-first search from all goals if they are not cached.
+        Unreachable cells have a distance of -1 and no next step."""
+        if self.__distance_field is None:
+            run_steps(self.distance_field_steps())
+        return self.__distance_field
+
+    def distance_field_steps(self):
+        """Step generator which builds the distance field unless it is cached, yields the
+        number of cells reached so far. See the steps module."""
+        if self.__distance_field is not None:
+            return
+
+        started = time.perf_counter()
+        cells = self.__cells
+        distances = array('i', [-1]) * len(cells)
+        next_step = bytearray([NO_SOLUTION]) * len(cells)
+
+        goals = sorted(self.__get_markers()[1])
+        for goal_index in goals:
+            distances[goal_index] = 0
+        queue = deque(goals)
+        reached = len(goals)
+
+        #Cells are handled in batches with a progress report after each batch
+        while queue:
+            for _ in range(PROGRESS_STEP):
+                if not queue:
+                    break
+                index = queue.popleft()
+                for direction in OPEN_DIRECTIONS[cells[index] & WALL_BITS]:
+                    #The neighbor has to be able to move back into this cell
+                    neighbor = index + self.__offsets[direction]
+                    if distances[neighbor] < 0 and not cells[neighbor] & 1 << OPPOSITE[direction]:
+                        distances[neighbor] = distances[index] + 1
+                        next_step[neighbor] = OPPOSITE[direction]
+                        queue.append(neighbor)
+                        reached += 1
+            yield reached
+
+        self.__distance_field = (distances, next_step)
+        self.__add_time('distance_field', started)
+
+    def get_distance_to_goal(self, point):
+        """Returns the number of moves from point to the nearest goal or None if no goal can be
+        reached"""
+        distance = self.__get_distance_field()[0][self.index(point)]
+        if distance < 0:
+            return None
+        return distance
+
+    def get_next_step(self, point):
+        """Returns the direction to move from point towards the nearest goal or None at a goal or
+        if no goal can be reached"""
+        direction = self.__get_distance_field()[1][self.index(point)]
+        if direction == NO_SOLUTION:
+            return None
+        return direction
+
+    def solve_from(self, start):
+        """Stores the shortest path from start to the nearest goal as solution directions using the
+        distance field, so only the path itself is walked. Returns True if a goal is reachable,
+        False otherwise."""
+        next_step = self.__get_distance_field()[1]
+        index = self.index(start)
+        if self.__distance_field[0][index] < 0:
+            return False
+
+        solution = self.__get_solution()
+        while next_step[index] != NO_SOLUTION:
+            solution[index] = next_step[index]
+            index += self.__offsets[next_step[index]]
+
+        self.__solved = True
+        return True
 
     def make_cells_unvisited(self):
-        """Makes all cells unvisited, used after carving and solving to reset flags"""
-
-        for z in range(self.__size.z):
-            for y in range(self.__size.y):
-                for x in range(self.__size.x):
-                    self.get_cell(Coordinate(x, y, z)).set_visited(False)
-
-    def carver_unvisited_neighbors(self, cell, bias=BIAS):
-        """Used by the carver to find unvisited neighbors, disregards walls. Bias determines how
-        many more times likely the maze carver is going to stay on the current floor vs. going up
-        or down a floor"""
-
-        unvisited = []
-
-        if (cell.x > 0 and not
-                self.get_cell(Coordinate(cell.x-1, cell.y, cell.z)).is_visited()):
-            unvisited.append(Cell.LEFT)
-        if (cell.x < self.__size.x - 1 and not
-                self.get_cell(Coordinate(cell.x+1, cell.y, cell.z)).is_visited()):
-            unvisited.append(Cell.RIGHT)
-        if (cell.y > 0 and not
-                self.get_cell(Coordinate(cell.x, cell.y-1, cell.z)).is_visited()):
-            unvisited.append(Cell.BACK)
-        if (cell.y < self.__size.y - 1 and not
-                self.get_cell(Coordinate(cell.x, cell.y+1, cell.z)).is_visited()):
-            unvisited.append(Cell.FRONT)
+        """Makes all cells unvisited, used after carving and solving to reset flags. Only starts a
+        new epoch, the stamps are cleared when the epoch counter runs out."""
+        started = time.perf_counter()
+        if self.__epoch == MAX_EPOCH:
+            self.__visit_stamps = None
+            self.__epoch = 0
+        self.__epoch += 1
+        self.__add_time('unvisit', started)
+
+    def __get_visit_stamps(self):
+        """Returns the visit stamps, allocating them cleared on first use"""
+        if self.__visit_stamps is None:
+            started = time.perf_counter()
+            self.__visit_stamps = array('H', bytes(2 * len(self.__cells)))
+            self.__add_time('allocate', started)
+        return self.__visit_stamps
+
+    def __get_solution(self):
+        """Returns the solution buffer, allocating it without directions on first use"""
+        if self.__solution is None:
+            started = time.perf_counter()
+            self.__solution = bytearray([NO_SOLUTION]) * len(self.__cells)
+            self.__add_time('allocate', started)
+        return self.__solution
+
+    def __edge_mask(self, index):
+        """Returns the directions leading out of the maze from the cell at index as a mask"""
+        z, rest = divmod(index, self.__floor_size)
+        y, x = divmod(rest, self.__size.x)
+        return self.__x_edges[x] | self.__y_edges[y] | self.__z_edges[z]
+
+    def __carver_neighbors(self, index, bias):
+        """Carver neighbor search by linear index, see carver_unvisited_neighbors"""
+        stamps = self.__visit_stamps
+        epoch = self.__epoch
+        offsets = self.__offsets
+        edges = self.__edge_mask(index)
+
+        unvisited = [direction for direction in CARVER_FLOOR_DIRECTIONS[edges]
+                     if stamps[index + offsets[direction]] != epoch]
         #Only add TOP and BOTTOM directions if no other neighbors have been found or acc. to bias
-        if not unvisited or random.randrange(0, bias) == 0:
-            if (cell.z < self.__size.z - 1 and not
-                    self.get_cell(Coordinate(cell.x, cell.y, cell.z+1)).is_visited()):
-                unvisited.append(Cell.TOP)
-            if (cell.z > 0 and not
-                    self.get_cell(Coordinate(cell.x, cell.y, cell.z-1)).is_visited()):
-                unvisited.append(Cell.BOTTOM)
+        if not unvisited or self.__random.randrange(0, bias) == 0:
+            unvisited.extend(direction for direction in CARVER_LADDER_DIRECTIONS[edges]
+                             if stamps[index + offsets[direction]] != epoch)
 
         if unvisited:
             return unvisited
         return None
 
-    def solver_unvisited_neighbors(self, cell):
-        """Used by the solver to list unvisited neighbors, checks both walls and visited flags"""
+    def __solver_neighbors(self, index):
+        """Solver neighbor search by linear index, see solver_unvisited_neighbors"""
+        stamps = self.__visit_stamps
+        epoch = self.__epoch
+        offsets = self.__offsets
 
-        unvisited = []
-
-        if (cell.z < self.__size.z - 1 and not
-                self.get_cell(Coordinate(cell.x, cell.y, cell.z)).is_wall(Cell.TOP) and not
-                self.get_cell(Coordinate(cell.x, cell.y, cell.z+1)).is_visited()):
-            unvisited.append(Cell.TOP)
-        if (cell.z > 0 and not
-                self.get_cell(Coordinate(cell.x, cell.y, cell.z)).is_wall(Cell.BOTTOM) and not
-                self.get_cell(Coordinate(cell.x, cell.y, cell.z-1)).is_visited()):
-            unvisited.append(Cell.BOTTOM)
-        if (cell.x > 0 and not
-                self.get_cell(Coordinate(cell.x, cell.y, cell.z)).is_wall(Cell.LEFT) and not
-                self.get_cell(Coordinate(cell.x-1, cell.y, cell.z)).is_visited()):
-            unvisited.append(Cell.LEFT)
-        if (cell.x < self.__size.x - 1 and not
-                self.get_cell(Coordinate(cell.x, cell.y, cell.z)).is_wall(Cell.RIGHT) and not
-                self.get_cell(Coordinate(cell.x+1, cell.y, cell.z)).is_visited()):
-            unvisited.append(Cell.RIGHT)
-        if (cell.y > 0 and not
-                self.get_cell(Coordinate(cell.x, cell.y, cell.z)).is_wall(Cell.BACK) and not
-                self.get_cell(Coordinate(cell.x, cell.y-1, cell.z)).is_visited()):
-            unvisited.append(Cell.BACK)
-        if (cell.y < self.__size.y - 1 and not
-                self.get_cell(Coordinate(cell.x, cell.y, cell.z)).is_wall(Cell.FRONT) and not
-                self.get_cell(Coordinate(cell.x, cell.y+1, cell.z)).is_visited()):
-            unvisited.append(Cell.FRONT)
+        unvisited = [direction for direction in
+                     OPEN_DIRECTIONS[(self.__cells[index] | self.__edge_mask(index)) & WALL_BITS]
+                     if stamps[index + offsets[direction]] != epoch]
 
         if unvisited:
             return unvisited
         return None
+
+    def carver_unvisited_neighbors(self, cell, bias=BIAS):
+        """Used by the carver to find unvisited neighbors, disregards walls. Bias determines how
+        many more times likely the maze carver is going to stay on the current floor vs. going up
+        or down a floor"""
+        self.__get_visit_stamps()
+        return self.__carver_neighbors(self.index(cell), bias)
+
+    def solver_unvisited_neighbors(self, cell):
+        """Used by the solver to list unvisited neighbors, checks both walls and visited flags"""
+        self.__get_visit_stamps()
+        return self.__solver_neighbors(self.index(cell))
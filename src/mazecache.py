@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""Persistent cache of carved seeded mazes. Carving is deterministic for a seed, so a maze is
+stored under a key derived from its dimensions, seed, generator and GENERATOR_VERSION and later
+loaded instead of carved again.
+
+Every entry is a file with the packed cells in the saved game layout, followed by the state of
+the random generator of the maze after carving, so a maze from the cache solves the same way as a
+freshly carved one. Entries are written to a temporary file and renamed into place, so readers
+never see partial entries and several processes can share a cache directory. When the entries
+take more than the size limit, the least recently used ones are removed."""
+
+import hashlib
+import os
+import tempfile
+import time
+from struct import Struct
+from coordinate import Coordinate
+from maze import Maze
+from generators import get_generator, DEFAULT_GENERATOR, GENERATOR_VERSION
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+SIGNATURE = b'LABc10'
+#Signature and dimensions
+HEADER = Struct('<6sIII')
+#State of a random.Random: version, 625 words of internal state, whether there is a next Gaussian
+#value and the value
+RANDOM_STATE = Struct('<B625I?d')
+SUFFIX = '.maze'
+#Default size limit of the cache in bytes
+MAX_BYTES = 256 << 20
+#Temporary files older than this many seconds are left over from interrupted writes
+STALE_TEMPORARY = 3600
+
+def cache_key(size, seed, algorithm):
+    """Returns the key of the maze of size carved by algorithm from seed"""
+    description = '%d,%d,%d|%r|%s|%d' % (*size, seed, algorithm, GENERATOR_VERSION)
+    return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+class MazeCache:
+    """Size-bounded cache of carved mazes in directory, which is created if needed"""
+
+    def __init__(self, directory, max_bytes=MAX_BYTES):
+        self.__directory = directory
+        self.__max_bytes = max_bytes
+        self.__hits = 0
+        self.__misses = 0
+        self.__write_failures = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def __path(self, key):
+        """Returns the file name of the entry with key"""
+        return os.path.join(self.__directory, key + SUFFIX)
+
+    def get(self, size, seed, algorithm=DEFAULT_GENERATOR):
+        """Returns the cached maze of size carved by algorithm from seed, or None if it is not in
+        the cache. Damaged entries are removed."""
+        filename = self.__path(cache_key(size, seed, algorithm))
+        try:
+            with open(filename, 'rb') as cache_file:
+                field = self.__read(cache_file, size, seed)
+        except FileNotFoundError:
+            field = None
+        except ValueError:
+            self.__remove(filename)
+            field = None
+
+        if field is None:
+            self.__misses += 1
+            return None
+
+        #The modification time is the last use of the entry
+        try:
+            os.utime(filename)
+        except OSError:
+            pass
+        self.__hits += 1
+        return field
+
+    @staticmethod
+    def __read(cache_file, size, seed):
+        """Reads a maze from an entry, raises ValueError if the entry is damaged"""
+        header = cache_file.read(HEADER.size)
+        if len(header) != HEADER.size or HEADER.unpack(header) != (SIGNATURE, *size):
+            raise ValueError('Damaged maze cache entry')
+
+        #The cells are read straight into the buffer the maze uses
+        cells = bytearray(size.x * size.y * size.z)
+        if cache_file.readinto(cells) != len(cells):
+            raise ValueError('Damaged maze cache entry')
+        state = cache_file.read(RANDOM_STATE.size + 1)
+        if len(state) != RANDOM_STATE.size:
+            raise ValueError('Damaged maze cache entry')
+        version, *words, has_gauss, gauss = RANDOM_STATE.unpack(state)
+
+        field = Maze(size, seed, cells)
+        field.seal_edges()
+        field.set_carved()
+        try:
+            field.get_random().setstate((version, tuple(words), gauss if has_gauss else None))
+        except (TypeError, ValueError) as error:
+            raise ValueError('Damaged maze cache entry') from error
+        return field
+
+    def put(self, field, seed, algorithm=DEFAULT_GENERATOR):
+        """Stores a maze carved by algorithm from seed, then evicts entries if the cache is
+        too large. The cache is only used to save time, so failed writes are counted instead of
+        raised. Returns whether the maze was stored."""
+        size = field.get_dimensions(True)
+        version, words, gauss = field.get_random().getstate()
+        data = b''.join((HEADER.pack(SIGNATURE, *size), field.get_cells(),
+                         RANDOM_STATE.pack(version, *words, gauss is not None, gauss or 0.0)))
+
+        #Writing to a temporary file and renaming it replaces the entry atomically
+        temporary = None
+        try:
+            handle, temporary = tempfile.mkstemp(suffix='.tmp', dir=self.__directory)
+            with os.fdopen(handle, 'wb') as cache_file:
+                cache_file.write(data)
+            os.replace(temporary, self.__path(cache_key(size, seed, algorithm)))
+        except OSError:
+            if temporary is not None:
+                self.__remove(temporary)
+            self.__write_failures += 1
+            return False
+
+        #Eviction is tried again after the next write if it fails
+        try:
+            self.evict()
+        except OSError:
+            pass
+        return True
+
+    def get_or_carve(self, size, seed, algorithm=DEFAULT_GENERATOR):
+        """Returns the cached maze of size carved by algorithm from seed, carving and storing it
+        if it is not in the cache"""
+        field = self.get(size, seed, algorithm)
+        if field is None:
+            field = Maze(size, seed)
+            get_generator(algorithm)(field, Coordinate(0, 0, 0))
+            self.put(field, seed, algorithm)
+        return field
+
+    def evict(self):
+        """Removes the least recently used entries until the cache fits in its size limit, and
+        temporary files left over from interrupted writes. Only one process evicts at a time."""
+        with open(os.path.join(self.__directory, '.lock'), 'wb') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            entries = []
+            total = 0
+            now = time.time()
+            for entry in os.scandir(self.__directory):
+                try:
+                    status = entry.stat()
+                except OSError:
+                    continue
+                if entry.name.endswith(SUFFIX):
+                    entries.append((status.st_mtime, status.st_size, entry.path))
+                    total += status.st_size
+                elif entry.name.endswith('.tmp') and now - status.st_mtime > STALE_TEMPORARY:
+                    self.__remove(entry.path)
+
+            entries.sort()
+            for _, file_size, path in entries:
+                if total <= self.__max_bytes:
+                    break
+                self.__remove(path)
+                total -= file_size
+
+    @staticmethod
+    def __remove(filename):
+        """Removes a file, which another process may have removed already"""
+        try:
+            os.remove(filename)
+        except OSError:
+            pass
+
+    def get_hits(self):
+        """Returns the number of mazes found in the cache"""
+        return self.__hits
+
+    def get_misses(self):
+        """Returns the number of mazes not found in the cache"""
+        return self.__misses
+
+    def get_write_failures(self):
+        """Returns the number of mazes that could not be stored"""
+        return self.__write_failures
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""MazePool keeps a few ready carved mazes for the recently used maze sizes and generators, so a
+new game of the same size can start without waiting for carving. Mazes are carved one at a time
+by a daemon thread, which refills the pool after every maze taken from it. Only unseeded games
+use the pool, since pooled mazes are random.
+
+After a miss the caller carves the maze itself. Carving shares the interpreter with the daemon
+thread, so the pool pauses until the caller is done and calls refill, which also marks the size
+as used. Otherwise every miss would take twice as long."""
+
+import threading
+from collections import OrderedDict
+from coordinate import Coordinate
+from maze import Maze
+from generators import get_generator, get_generator_steps
+
+#Number of ready mazes kept for every size and generator
+CAPACITY = 1
+#Number of recently used sizes and generators kept in the pool, older ones are evicted
+MAX_KEYS = 3
+#Mazes with more cells than this are never pooled. The pool shares the interpreter with the user
+#interface, and mazes of this size carve in a few milliseconds, well under the time of a frame.
+MAX_CELLS = 1 << 10
+
+class MazePool:
+    """Bounded pool of ready carved mazes refilled in the background. The pool is safe to use
+    from several threads."""
+
+    def __init__(self, capacity=CAPACITY, max_keys=MAX_KEYS, max_cells=MAX_CELLS):
+        self.__capacity = capacity
+        self.__max_keys = max_keys
+        self.__max_cells = max_cells
+
+        #Ready mazes of every size and generator, least recently used first
+        self.__ready = OrderedDict()
+        self.__hits = 0
+        self.__misses = 0
+        self.__closed = False
+        #Number of callers carving mazes of their own after a miss
+        self.__carving = 0
+        self.__changed = threading.Condition()
+        self.__thread = None
+
+    def take(self, size, algorithm):
+        """Returns a ready maze of size carved by algorithm or None if there is none. After a
+        hit the size and generator are marked as used and the pool is refilled in the background.
+        After a miss the pool pauses until refill is called, which the caller has to do once it
+        has carved the maze itself or given up. Raises ValueError for unknown generators."""
+        get_generator(algorithm)
+        key = (tuple(size), algorithm)
+        with self.__changed:
+            ready = self.__ready.get(key)
+            if ready:
+                self.__hits += 1
+                self.__use(key)
+                self.__changed.notify_all()
+                return ready.pop(0)
+            self.__misses += 1
+            self.__carving += 1
+        return None
+
+    def refill(self, size, algorithm):
+        """Called after a miss when the caller is done carving. Marks size and algorithm as used
+        and continues carving in the background. Raises ValueError for unknown generators."""
+        get_generator(algorithm)
+        with self.__changed:
+            self.__carving = max(self.__carving - 1, 0)
+            self.__use((tuple(size), algorithm))
+            self.__changed.notify_all()
+
+    def prefetch(self, size, algorithm):
+        """Marks size and algorithm as used so that a maze is carved for them in the background.
+        Raises ValueError for unknown generators."""
+        get_generator(algorithm)
+        with self.__changed:
+            self.__use((tuple(size), algorithm))
+            self.__changed.notify_all()
+
+    def __use(self, key):
+        """Moves key to the most recently used end of the pool, adding it and evicting the least
+        recently used keys if needed. Returns the list of ready mazes of key, or None if mazes of
+        its size are too large to be pooled. Called with the lock held after the generator has
+        been checked."""
+        width, height, floors = key[0]
+        if self.__closed or width * height * floors > self.__max_cells:
+            return None
+        if key not in self.__ready:
+            self.__ready[key] = []
+            while len(self.__ready) > self.__max_keys:
+                self.__ready.popitem(last=False)
+        self.__ready.move_to_end(key)
+        if self.__thread is None:
+            self.__thread = threading.Thread(target=self.__refill, name='MazePool', daemon=True)
+            self.__thread.start()
+        return self.__ready[key]
+
+    def __next_key(self):
+        """Returns the most recently used key which needs more mazes or None. Called with the
+        lock held."""
+        for key in reversed(self.__ready):
+            if len(self.__ready[key]) < self.__capacity:
+                return key
+        return None
+
+    def __refill(self):
+        """Carves mazes for the keys that need them until the pool is closed, run by the daemon
+        thread"""
+        while True:
+            with self.__changed:
+                while not self.__closed and (self.__carving or self.__next_key() is None):
+                    self.__changed.wait()
+                if self.__closed:
+                    return
+                key = self.__next_key()
+
+            field = Maze(Coordinate(*key[0]))
+            for _ in get_generator_steps(key[1])(field, Coordinate(0, 0, 0)):
+                #A miss pauses carving until the caller has carved its own maze
+                with self.__changed:
+                    while not self.__closed and self.__carving:
+                        self.__changed.wait()
+                    if self.__closed:
+                        return
+
+            with self.__changed:
+                #The key may have been evicted while carving
+                if key in self.__ready and len(self.__ready[key]) < self.__capacity:
+                    self.__ready[key].append(field)
+                self.__changed.notify_all()
+
+    def wait_ready(self, timeout=None):
+        """Waits until a maze is ready for every size and generator in the pool. Returns False
+        if the timeout in seconds ran out first, True otherwise."""
+        with self.__changed:
+            return self.__changed.wait_for(
+                lambda: self.__closed or self.__next_key() is None, timeout)
+
+    def get_ready_count(self):
+        """Returns the number of ready mazes in the pool"""
+        with self.__changed:
+            return sum(len(ready) for ready in self.__ready.values())
+
+    def get_hits(self):
+        """Returns the number of times a ready maze was taken from the pool"""
+        return self.__hits
+
+    def get_misses(self):
+        """Returns the number of times no ready maze was available"""
+        return self.__misses
+
+    def clear(self):
+        """Drops all ready mazes and forgets the used sizes"""
+        with self.__changed:
+            self.__ready.clear()
+            self.__changed.notify_all()
+
+    def close(self):
+        """Drops all ready mazes and stops the background thread after its current maze"""
+        with self.__changed:
+            self.__closed = True
+            self.__ready.clear()
+            self.__changed.notify_all()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""MazeTask runs a step generator in a worker thread of a QThreadPool, so carving and solving
+large mazes does not block the user interface. See the steps module for step generators."""
+
+from threading import Event
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+class TaskSignals(QObject):
+    """Signals of a MazeTask. They are emitted from the worker thread and delivered to the GUI
+    thread, which created the task."""
+
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(object)
+    cancelled = pyqtSignal()
+    failed = pyqtSignal(str)
+
+class MazeTask(QRunnable):
+    """Runs a step generator to the end in a worker thread. Progress emits the number of cells
+    done after every step and finished emits the result. Exactly one of finished, cancelled and
+    failed is emitted when the task ends."""
+
+    def __init__(self, steps):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.signals = TaskSignals()
+        self.steps = steps
+        self.cancel_requested = Event()
+
+    def cancel(self):
+        """Asks the task to stop, which it does after the current step. Can be called from any
+        thread."""
+        self.cancel_requested.set()
+
+    def run(self):
+        """Called by the thread pool to run the steps in a worker thread"""
+        try:
+            while not self.cancel_requested.is_set():
+                try:
+                    done = next(self.steps)
+                except StopIteration as stop:
+                    self.signals.finished.emit(stop.value)
+                    return
+                self.signals.progress.emit(done)
+            self.steps.close()
+            self.signals.cancelled.emit()
+        except Exception as error: # pylint: disable=broad-except
+            #Exceptions must not escape into the thread pool, and a task always has to end with
+            #one of the signals so the GUI leaves the task
+            self.signals.failed.emit(str(error) or type(error).__name__)
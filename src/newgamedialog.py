@@ -1,13 +1,14 @@
 #!/usr/bin/env python3
 """NewGameDialog UI class file"""
 
-from PyQt5.QtWidgets import QLabel, QVBoxLayout, QDialog, QDialogButtonBox, QSpinBox
+from PyQt5.QtWidgets import QLabel, QVBoxLayout, QDialog, QDialogButtonBox, QSpinBox, QComboBox
 from PyQt5.QtCore import Qt
 from coordinate import Coordinate
+from generators import GENERATORS, DEFAULT_GENERATOR
 
 class NewGameDialog(QDialog):
     """The NewGameDialog which allows selecting dimensions of a new maze"""
-    def __init__(self, old_dimensions):
+    def __init__(self, old_dimensions, old_algorithm=DEFAULT_GENERATOR):
         super().__init__()
 
         self.setWindowTitle('New Game')
@@ -28,12 +29,19 @@ class NewGameDialog(QDialog):
         self.floors.setRange(1, 5)
         self.floors.setValue(old_dimensions.z)
 
+        self.algorithm_text = QLabel('Algorithm:')
+        self.algorithm = QComboBox()
+        self.algorithm.addItems(sorted(GENERATORS))
+        self.algorithm.setCurrentText(old_algorithm)
+
         layout.addWidget(self.width_text)
         layout.addWidget(self.width)
         layout.addWidget(self.height_text)
         layout.addWidget(self.height)
         layout.addWidget(self.floors_text)
         layout.addWidget(self.floors)
+        layout.addWidget(self.algorithm_text)
+        layout.addWidget(self.algorithm)
 
         # OK and Cancel buttons
         self.buttons = QDialogButtonBox(
@@ -49,3 +57,7 @@ class NewGameDialog(QDialog):
     def get_values(self):
         """Method returning the values chosen in the dialog"""
         return Coordinate(self.width.value(), self.height.value(), self.floors.value())
+
+    def get_algorithm(self):
+        """Method returning the name of the maze generator chosen in the dialog"""
+        return self.algorithm.currentText()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Optional NumPy backed engine for carving and solving very large mazes.
+
+The functions here operate directly on the packed cell buffer of a Maze, so the result is an
+ordinary Maze that can be played, saved and drawn like any other. NumPy is not required by the
+rest of the game, HAS_NUMPY tells whether the engine can be used.
+
+The carver does not replay the randomized depth-first carver of Maze, since that algorithm is
+inherently sequential. Instead every cell is connected to exactly one of its LEFT, BACK or BOTTOM
+neighbors, which is a three dimensional binary tree maze. The result is a perfect maze just like
+the one from Maze.carve_maze: every cell is reachable and there is exactly one path between any
+two cells. The same maze seed always produces the same maze.
+"""
+
+from coordinate import Coordinate
+from cell import Cell, NO_SOLUTION
+from maze import BIAS
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAS_NUMPY = np is not None
+
+def _require_numpy():
+    """Raises an error if NumPy is not available"""
+    if not HAS_NUMPY:
+        raise RuntimeError('The NumPy engine requires NumPy to be installed')
+
+def _wall_bits(selected, direction):
+    """Returns a uint8 array with the wall bit of direction set where selected is True"""
+    return selected.view(np.uint8) << np.uint8(direction)
+
+def carve_maze(maze, start=Coordinate(0, 0, 0), bias=BIAS):
+    """Carves maze as a three dimensional binary tree one floor at a time. Bias determines how
+    many more times likely a cell is connected on the current floor vs. down a floor, as in
+    Maze.carve_maze. Takes coordinates for the entrance or defaults to x=0, y=0 and z=0."""
+    _require_numpy()
+
+    width = maze.get_width()
+    height = maze.get_height()
+    walls = np.frombuffer(maze.get_cells(), dtype=np.uint8).reshape(maze.get_floors(), height,
+                                                                      width)
+
+    #Seed the generator from the maze random state so that the maze seed decides the result
+    rng = np.random.default_rng(maze.get_random().getrandbits(64))
+
+    left_weight = np.where(np.arange(width) > 0, bias, 0).astype(np.uint32).reshape(1, width)
+    back_weight = np.where(np.arange(height) > 0, bias, 0).astype(np.uint32).reshape(height, 1)
+
+    for z in range(maze.get_floors()):
+        bottom_weight = 1 if z > 0 else 0
+        total = left_weight + back_weight + bottom_weight
+
+        #Choose a parent direction for each cell according to the weights by scaling 16-bit
+        #random numbers, the cell at x=0 and y=0 on the bottom floor has no parent since it is the
+        #root of the tree
+        choice = (rng.integers(0, 1 << 16, (height, width), dtype=np.uint16) * total) >> 16
+        go_left = choice < left_weight
+        go_back = ~go_left & (choice < left_weight + back_weight)
+        go_bottom = ~go_left & ~go_back & (total > 0)
+
+        #Collect the removed wall bits of the floor and apply them all at once
+        removed = _wall_bits(go_left, Cell.LEFT) | _wall_bits(go_back, Cell.BACK)
+        removed[:, :-1] |= _wall_bits(go_left[:, 1:], Cell.RIGHT)
+        removed[:-1, :] |= _wall_bits(go_back[1:, :], Cell.FRONT)
+        if z > 0:
+            removed |= _wall_bits(go_bottom, Cell.BOTTOM)
+            walls[z - 1] &= ~_wall_bits(go_bottom, Cell.TOP)
+        walls[z] &= ~removed
+
+    maze.get_cell(start).set_as_entrance()
+    maze.get_cell(maze.get_dimensions()).set_as_goal()
+    maze.make_cells_unvisited()
+    maze.set_carved()
+
+def solve_maze(maze, start, goal):
+    """Breadth-first solver which expands the whole frontier at once with array operations. Stores
+    the shortest path from start to goal as solution directions in the maze. Returns True if the
+    goal was found, False otherwise."""
+    _require_numpy()
+
+    walls = np.frombuffer(maze.get_cells(), dtype=np.uint8)
+    offsets = maze.get_offsets()
+    start_index = maze.index(start)
+    goal_index = maze.index(goal)
+
+    #Direction that was used to step into each cell, only valid for visited cells
+    came_from = np.full(walls.size, NO_SOLUTION, dtype=np.uint8)
+    visited = np.zeros(walls.size, dtype=bool)
+    visited[start_index] = True
+    frontier = np.array([start_index], dtype=np.int64)
+
+    while frontier.size and not visited[goal_index]:
+        frontier_walls = walls[frontier]
+        expanded = []
+        for direction in range(6):
+            #Maze edges always have walls, so open directions never leave the maze
+            neighbors = frontier[(frontier_walls & (1 << direction)) == 0] + offsets[direction]
+            neighbors = neighbors[~visited[neighbors]]
+            visited[neighbors] = True
+            came_from[neighbors] = direction
+            expanded.append(neighbors)
+        frontier = np.concatenate(expanded)
+
+    if not visited[goal_index]:
+        return False
+
+    #Walk back from the goal and store the direction to take in each cell on the path
+    index = goal_index
+    while index != start_index:
+        direction = int(came_from[index])
+        index -= offsets[direction]
+        maze.set_cell_solution(index, direction)
+
+    maze.set_solved()
+    return True
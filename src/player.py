@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """The Player class and associated functions"""
 
-from cell import Cell
+from cell import WALL_DIRECTIONS
 from coordinate import Coordinate
 
 class Player:
@@ -16,6 +16,10 @@ class Player:
         """Returns the player position as a coordinate"""
         return self.__position
 
+    def set_position(self, position):
+        """Moves the player to position without counting it as a move"""
+        self.__position = position
+
     def get_floor(self):
         """Returns the current player floor"""
         return self.__position.z
@@ -32,21 +36,12 @@ class Player:
 
     def move_player(self, maze, direction):
         """Assumes all maze edges have walls, doesn't check if trying to go out of the maze
-        boundaries. Returns True if moving succeeded, False otherwise"""
-        if not maze.get_cell(self.__position).is_wall(direction):
-            if direction == Cell.TOP:
-                self.__position.z += 1
-            elif direction == Cell.BOTTOM:
-                self.__position.z -= 1
-            elif direction == Cell.LEFT:
-                self.__position.x -= 1
-            elif direction == Cell.RIGHT:
-                self.__position.x += 1
-            elif direction == Cell.BACK:
-                self.__position.y -= 1
-            elif direction == Cell.FRONT:
-                self.__position.y += 1
-
+        boundaries. Returns True if moving succeeded, False otherwise. Coordinates are immutable, so
+        the position is replaced with a new coordinate instead of being changed in place and
+        positions returned earlier by get_position keep their values."""
+        index = maze.index(self.__position)
+        if direction in WALL_DIRECTIONS and not maze.walls_mask(index) & 1 << direction:
+            self.__position = maze.get_coordinate(index + maze.get_offsets()[direction])
             self.__moves += 1
             return True
 
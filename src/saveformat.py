@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""Version 3 saved game format.
+
+The header holds the maze dimensions and player position as 16-bit values and the number of moves
+and elapsed time as 32-bit values, followed by an index of file offsets for every floor. Each
+floor is stored as an independently compressed chunk, so single floors can be read without
+decompressing the rest of the file and whole mazes can be decompressed in parallel.
+
+Walls between two cells are only stored once. A chunk consists of bitplanes with one bit per cell
+of the floor in the order TOP, RIGHT, FRONT, ENTRANCE and GOAL. The BOTTOM, LEFT and BACK walls
+are the TOP, RIGHT and FRONT walls of the neighboring cells, which is why decoding a floor also
+needs the TOP plane of the floor below it. It is stored first so that it can be decompressed on
+its own.
+
+Uncompressed saves store every floor as one packed byte per cell instead, which is the layout
+mazes use in memory. The cells of the whole maze then follow the index in one piece, so the file
+can be mapped into memory and loaded lazily like a legacy save.
+"""
+
+import lzma
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from mmap import mmap, ACCESS_COPY
+from struct import Struct
+from cell import Cell
+from coordinate import Coordinate
+from maze import Maze
+from player import Player
+
+SIGNATURE = b'LABv30'
+#Signature, dimensions, player position, moves, elapsed time and compression method
+HEADER = Struct('<6sHHHHHHIIB')
+OFFSET = Struct('<Q')
+
+#Compression methods of the floor chunks, uncompressed chunks are packed cells
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_LZMA = 2
+COMPRESSION_NAMES = {'none': COMPRESSION_NONE, 'zlib': COMPRESSION_ZLIB, 'lzma': COMPRESSION_LZMA}
+
+#Compress function and decompressor factory of every compression method
+COMPRESSORS = {
+    COMPRESSION_ZLIB: (zlib.compress, zlib.decompressobj),
+    COMPRESSION_LZMA: (lzma.compress, lzma.LZMADecompressor),
+}
+
+#Bits stored for every cell in chunk order
+PLANE_BITS = (Cell.TOP, Cell.RIGHT, Cell.FRONT, Cell.ENTRANCE, Cell.GOAL)
+
+#Translate tables from packed cells to binary digits and back for every bit
+TO_DIGITS = [b''.join(b'1' if value & 1 << bit else b'0' for value in range(256))
+             for bit in range(8)]
+FROM_DIGITS = [bytes.maketrans(b'01', bytes([0, 1 << bit])) for bit in range(8)]
+
+def _invalid():
+    """Returns the error raised for files that are not valid saves"""
+    return ValueError('File is not a valid save file!')
+
+def _plane_size(floor_size):
+    """Returns the size in bytes of a bitplane with one bit for every cell of a floor"""
+    return (floor_size + 7) // 8
+
+def _encode_plane(floor, bit):
+    """Returns bit of every cell in floor packed as a bitplane. The cells are translated to binary
+    digits and parsed as a single integer, which packs them without a loop in Python."""
+    padding = _plane_size(len(floor)) * 8 - len(floor)
+    value = int(floor.translate(TO_DIGITS[bit]), 2) << padding
+    return value.to_bytes(_plane_size(len(floor)), 'big')
+
+def _plane_digits(plane, floor_size):
+    """Returns a bitplane unpacked to one binary digit per cell"""
+    value = int.from_bytes(plane, 'big') >> (len(plane) * 8 - floor_size)
+    return format(value, '0%db' % floor_size).encode('ascii')
+
+def encode_floor(floor):
+    """Returns the uncompressed chunk of a floor given as one packed byte per cell"""
+    floor = bytes(floor)
+    return b''.join(_encode_plane(floor, bit) for bit in PLANE_BITS)
+
+def decode_floor(chunk, below, width, floor_size):
+    """Returns one packed byte per cell for the floor stored in the uncompressed chunk. Below is
+    the chunk or only the TOP plane of the floor below, None for the bottom floor. Walls on the
+    maze edges are decoded as they were saved, so they have to be sealed afterwards."""
+    plane_size = _plane_size(floor_size)
+    if len(chunk) != plane_size * len(PLANE_BITS):
+        raise _invalid()
+    top, right, front, entrance, goal = (
+        _plane_digits(chunk[i * plane_size:(i + 1) * plane_size], floor_size)
+        for i in range(len(PLANE_BITS)))
+
+    #LEFT, BACK and BOTTOM walls are shifted from the neighboring cells. Cells are combined as
+    #big integers, so OR works on all cells of the floor at once.
+    layers = [top.translate(FROM_DIGITS[Cell.TOP]),
+              right.translate(FROM_DIGITS[Cell.RIGHT]),
+              front.translate(FROM_DIGITS[Cell.FRONT]),
+              entrance.translate(FROM_DIGITS[Cell.ENTRANCE]),
+              goal.translate(FROM_DIGITS[Cell.GOAL]),
+              bytes([1 << Cell.LEFT]) + right[:-1].translate(FROM_DIGITS[Cell.LEFT]),
+              bytes([1 << Cell.BACK]) * width + front[:-width].translate(FROM_DIGITS[Cell.BACK])]
+    if below is None:
+        layers.append(bytes([1 << Cell.BOTTOM]) * floor_size)
+    else:
+        layers.append(_plane_digits(below[:plane_size], floor_size).translate(
+            FROM_DIGITS[Cell.BOTTOM]))
+
+    value = 0
+    for layer in layers:
+        value |= int.from_bytes(layer, 'big')
+    return value.to_bytes(floor_size, 'big')
+
+def _decompress(compression, chunk, max_length=None):
+    """Returns the decompressed chunk, or only its first max_length bytes"""
+    decompressor = COMPRESSORS[compression][1]()
+    try:
+        if max_length is None:
+            return decompressor.decompress(chunk)
+        return decompressor.decompress(chunk, max_length)
+    except (zlib.error, lzma.LZMAError) as error:
+        raise _invalid() from error
+
+def _add_time(stats, phase, started):
+    """Adds the time since the performance counter value started to phase if stats is given"""
+    if stats is not None:
+        stats.add_time(phase, time.perf_counter() - started)
+
+def write_game(save_file, maze, player, elapsed_time, compression=COMPRESSION_ZLIB, stats=None):
+    """Writes a maze, player and elapsed time to the binary file object save_file. The time
+    spent encoding and writing is added to stats if given."""
+    started = time.perf_counter()
+    cells = maze.get_cells()
+    floor_size = maze.get_width() * maze.get_height()
+    if compression == COMPRESSION_NONE:
+        #The cells are written at once, so no chunks are built
+        chunks = None
+        chunk_sizes = [floor_size] * maze.get_floors()
+    else:
+        compress = COMPRESSORS[compression][0]
+        chunks = [compress(encode_floor(cells[start:start + floor_size]))
+                  for start in range(0, len(cells), floor_size)]
+        chunk_sizes = [len(chunk) for chunk in chunks]
+    _add_time(stats, 'encode', started)
+
+    started = time.perf_counter()
+    save_file.write(HEADER.pack(SIGNATURE, *maze.get_dimensions(True), *player.get_position(),
+                                player.get_moves(), elapsed_time, compression))
+    offset = HEADER.size + OFFSET.size * (len(chunk_sizes) + 1)
+    for chunk_size in chunk_sizes:
+        save_file.write(OFFSET.pack(offset))
+        offset += chunk_size
+    save_file.write(OFFSET.pack(offset))
+    if chunks is None:
+        save_file.write(cells)
+    else:
+        for chunk in chunks:
+            save_file.write(chunk)
+    _add_time(stats, 'write', started)
+
+def read_header(load_file, filesize):
+    """Reads and checks the header and the chunk index from the start of load_file. Returns the
+    maze dimensions, the player, the elapsed time, the compression method and the file offsets
+    of the floor chunks followed by the end of the last chunk."""
+    if filesize < HEADER.size:
+        raise _invalid()
+    (signature, width, height, floors, player_x, player_y, player_z, moves, elapsed_time,
+     compression) = HEADER.unpack(load_file.read(HEADER.size))
+    maze_dimensions = Coordinate(width, height, floors)
+    player_coord = Coordinate(player_x, player_y, player_z)
+
+    if signature != SIGNATURE or not width or not height or not floors:
+        raise _invalid()
+
+    #Check that the player is inside the maze
+    if player_x >= width or player_y >= height or player_z >= floors:
+        raise _invalid()
+
+    if compression != COMPRESSION_NONE and compression not in COMPRESSORS:
+        raise _invalid()
+
+    index_end = HEADER.size + OFFSET.size * (floors + 1)
+    if filesize < index_end:
+        raise _invalid()
+    offsets = [OFFSET.unpack(load_file.read(OFFSET.size))[0] for _ in range(floors + 1)]
+
+    #Chunks follow the index in order and the last one ends at the end of the file
+    if offsets[0] != index_end or offsets[-1] != filesize:
+        raise _invalid()
+    if any(offsets[i] > offsets[i + 1] for i in range(floors)):
+        raise _invalid()
+    if compression == COMPRESSION_NONE and offsets[-1] - offsets[0] != width * height * floors:
+        raise _invalid()
+
+    return maze_dimensions, Player(player_coord, moves), elapsed_time, compression, offsets
+
+def read_game(load_file, filesize, workers=None, stats=None):
+    """Reads a saved game from the binary file object load_file. Returns the maze, the player and
+    the elapsed time. Chunks are decompressed in parallel by up to workers threads, or in the
+    calling thread if workers is 1. The time spent reading and decoding is added to stats if
+    given."""
+    started = time.perf_counter()
+    maze_dimensions, player, elapsed_time, compression, offsets = read_header(load_file, filesize)
+    chunks = [load_file.read(offsets[i + 1] - offsets[i]) for i in range(maze_dimensions.z)]
+    _add_time(stats, 'read', started)
+
+    started = time.perf_counter()
+    maze = Maze(maze_dimensions, stats=stats)
+    if compression == COMPRESSION_NONE:
+        maze.set_cells(b''.join(chunks))
+    else:
+        def decompress(chunk):
+            """Decompresses a single chunk"""
+            return _decompress(compression, chunk)
+
+        if workers == 1:
+            floors = [decompress(chunk) for chunk in chunks]
+        else:
+            with ThreadPoolExecutor(workers) as executor:
+                floors = list(executor.map(decompress, chunks))
+
+        floor_size = maze_dimensions.x * maze_dimensions.y
+        maze.set_cells(b''.join(
+            decode_floor(floors[z], floors[z - 1] if z else None, maze_dimensions.x, floor_size)
+            for z in range(maze_dimensions.z)))
+
+    #Hacked saves could open the outer walls which the maze relies on
+    maze.seal_edges()
+    maze.set_carved()
+    _add_time(stats, 'decode', started)
+    return maze, player, elapsed_time
+
+def map_cells(load_file, offset, maze_dimensions, stats=None):
+    """Returns a maze using the packed cells in load_file from offset on, which are mapped into
+    memory instead of read. Changes to the maze are copy-on-write and never reach the file.
+    Sealing the outer walls only copies the pages of cells which miss a wall."""
+    #The mapping stays valid after the file is closed
+    mapped = mmap(load_file.fileno(), 0, access=ACCESS_COPY)
+    maze = Maze(maze_dimensions, cells=memoryview(mapped)[offset:], stats=stats)
+
+    #Hacked saves could open the outer walls which the maze relies on
+    maze.seal_edges()
+    maze.set_carved()
+    return maze
+
+def map_game(load_file, filesize, stats=None):
+    """Lazily loads an uncompressed saved game from the binary file object load_file, see
+    map_cells. Returns the maze, the player and the elapsed time. Compressed saves cannot be
+    mapped and raise ValueError."""
+    maze_dimensions, player, elapsed_time, compression, offsets = read_header(load_file, filesize)
+    if compression != COMPRESSION_NONE:
+        raise ValueError('Only uncompressed save files can be loaded lazily!')
+    return map_cells(load_file, offsets[0], maze_dimensions, stats), player, elapsed_time
+
+def read_floor(filename, floor):
+    """Returns the packed cells of a single floor of the saved game in filename. Only the chunk of
+    the floor and the TOP plane of the floor below it are decompressed. Walls on the maze edges
+    are returned as they were saved."""
+    with open(filename, 'rb') as load_file:
+        load_file.seek(0, 2)
+        filesize = load_file.tell()
+        load_file.seek(0)
+        maze_dimensions, _, _, compression, offsets = read_header(load_file, filesize)
+        if not 0 <= floor < maze_dimensions.z:
+            raise IndexError('Floor %d is not in the maze' % floor)
+
+        if compression == COMPRESSION_NONE:
+            load_file.seek(offsets[floor])
+            return load_file.read(offsets[floor + 1] - offsets[floor])
+
+        floor_size = maze_dimensions.x * maze_dimensions.y
+        below = None
+        if floor:
+            load_file.seek(offsets[floor - 1])
+            below = _decompress(compression, load_file.read(offsets[floor] - offsets[floor - 1]),
+                                _plane_size(floor_size))
+        else:
+            load_file.seek(offsets[floor])
+        chunk = _decompress(compression, load_file.read(offsets[floor + 1] - offsets[floor]))
+        return decode_floor(chunk, below, maze_dimensions.x, floor_size)
+
+def is_save_file(load_file):
+    """Returns whether load_file starts with the signature of this format, leaving the file
+    position at the start"""
+    signature = load_file.read(len(SIGNATURE))
+    load_file.seek(0)
+    return signature == SIGNATURE
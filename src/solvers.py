@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""Registry of maze solvers. Every solver takes a Maze and the start and goal coordinates, stores
+the direction to take towards the goal in each cell on the path and returns whether the goal was
+found. Unlike Maze.solve_maze, the solvers here are deterministic and find the shortest path.
+Maze edges are assumed to always have walls."""
+
+import heapq
+from collections import deque
+from cell import Cell, WALL_BITS
+from maze import Maze, OPPOSITE, OPEN_DIRECTIONS
+from steps import PROGRESS_STEP, run_steps, single_step
+import numpyengine
+
+#Cost of climbing up or down a ladder compared to moving on the same floor, used by A*
+FLOOR_COST = 2
+
+def _store_path(maze, came_from, start_index, index):
+    """Walks back from index to start_index along came_from, which maps each reached cell to the
+    direction it was entered from, and stores the solution directions on the way"""
+    offsets = maze.get_offsets()
+    while index != start_index:
+        direction = came_from[index]
+        index -= offsets[direction]
+        maze.set_cell_solution(index, direction)
+
+def solve_bfs(maze, start, goal):
+    """Breadth-first solver, finds the path with the fewest moves"""
+    return run_steps(solve_bfs_steps(maze, start, goal))
+
+def solve_bfs_steps(maze, start, goal):
+    """Step generator version of solve_bfs, yields the number of cells visited so far"""
+    cells = maze.get_cells()
+    offsets = maze.get_offsets()
+    start_index = maze.index(start)
+    goal_index = maze.index(goal)
+
+    came_from = {start_index: None}
+    queue = deque([start_index])
+    visited = 0
+
+    while queue:
+        index = queue.popleft()
+        visited += 1
+        if not visited % PROGRESS_STEP:
+            yield visited
+        if index == goal_index:
+            _store_path(maze, came_from, start_index, goal_index)
+            maze.set_solved()
+            return True
+
+        for direction in OPEN_DIRECTIONS[cells[index] & WALL_BITS]:
+            neighbor = index + offsets[direction]
+            if neighbor not in came_from:
+                came_from[neighbor] = direction
+                queue.append(neighbor)
+
+    return False
+
+def solve_astar(maze, start, goal):
+    """A* solver using the three dimensional Manhattan distance to the goal as the heuristic.
+    Ladders cost FLOOR_COST moves, so paths with fewer floor changes are preferred."""
+    return run_steps(solve_astar_steps(maze, start, goal))
+
+def solve_astar_steps(maze, start, goal):
+    """Step generator version of solve_astar, yields the number of cells visited so far"""
+    cells = maze.get_cells()
+    offsets = maze.get_offsets()
+    width = maze.get_width()
+    floor_size = width * maze.get_height()
+    start_index = maze.index(start)
+    goal_index = maze.index(goal)
+    goal_x, goal_y, goal_z = goal
+
+    def heuristic(index):
+        """Returns the weighted Manhattan distance from index to the goal"""
+        z, rest = divmod(index, floor_size)
+        y, x = divmod(rest, width)
+        return abs(goal_x - x) + abs(goal_y - y) + FLOOR_COST * abs(goal_z - z)
+
+    #Queue entries are the estimated total cost, the cost so far and the cell
+    came_from = {start_index: None}
+    cost = {start_index: 0}
+    queue = [(heuristic(start_index), 0, start_index)]
+    visited = 0
+
+    while queue:
+        _, index_cost, index = heapq.heappop(queue)
+        #Cells reached again at a lower cost leave entries behind that are out of date
+        if index_cost > cost[index]:
+            continue
+        visited += 1
+        if not visited % PROGRESS_STEP:
+            yield visited
+        if index == goal_index:
+            _store_path(maze, came_from, start_index, goal_index)
+            maze.set_solved()
+            return True
+
+        for direction in OPEN_DIRECTIONS[cells[index] & WALL_BITS]:
+            neighbor = index + offsets[direction]
+            if direction in (Cell.TOP, Cell.BOTTOM):
+                neighbor_cost = cost[index] + FLOOR_COST
+            else:
+                neighbor_cost = cost[index] + 1
+            if neighbor not in cost or neighbor_cost < cost[neighbor]:
+                cost[neighbor] = neighbor_cost
+                came_from[neighbor] = direction
+                heapq.heappush(queue, (neighbor_cost + heuristic(neighbor), neighbor_cost,
+                                       neighbor))
+
+    return False
+
+def solve_bidirectional(maze, start, goal):
+    """Bidirectional breadth-first solver, searches from both the start and the goal one level at
+    a time and stops when the searches meet"""
+    return run_steps(solve_bidirectional_steps(maze, start, goal))
+
+def solve_bidirectional_steps(maze, start, goal):
+    """Step generator version of solve_bidirectional, yields the number of cells reached from
+    either side so far"""
+    cells = maze.get_cells()
+    offsets = maze.get_offsets()
+    start_index = maze.index(start)
+    goal_index = maze.index(goal)
+
+    #Direction each cell was entered from when searching from the start, and the direction to
+    #take towards the goal when searching from the goal
+    from_start = {start_index: None}
+    to_goal = {goal_index: None}
+    start_frontier = [start_index]
+    goal_frontier = [goal_index]
+    meeting = start_index if start_index == goal_index else None
+    reached = 0
+
+    while meeting is None and start_frontier and goal_frontier:
+        #Always expand the smaller frontier
+        expand_start = len(start_frontier) <= len(goal_frontier)
+        frontier = start_frontier if expand_start else goal_frontier
+        expanded = []
+
+        for index in frontier:
+            for direction in OPEN_DIRECTIONS[cells[index] & WALL_BITS]:
+                neighbor = index + offsets[direction]
+                if expand_start:
+                    if neighbor in from_start:
+                        continue
+                    from_start[neighbor] = direction
+                    if neighbor in to_goal:
+                        meeting = neighbor
+                else:
+                    #Moving from neighbor back to index has to be possible as well
+                    if cells[neighbor] & 1 << OPPOSITE[direction] or neighbor in to_goal:
+                        continue
+                    to_goal[neighbor] = OPPOSITE[direction]
+                    if neighbor in from_start:
+                        meeting = neighbor
+                expanded.append(neighbor)
+                reached += 1
+                if not reached % PROGRESS_STEP:
+                    yield reached
+                if meeting is not None:
+                    break
+            if meeting is not None:
+                break
+
+        if expand_start:
+            start_frontier = expanded
+        else:
+            goal_frontier = expanded
+
+    if meeting is None:
+        return False
+
+    _store_path(maze, from_start, start_index, meeting)
+    index = meeting
+    while index != goal_index:
+        maze.set_cell_solution(index, to_goal[index])
+        index += offsets[to_goal[index]]
+
+    maze.set_solved()
+    return True
+
+def solve_distance_field(maze, start, goal):
+    """Solver using the distance field cached by the maze, after the field has been built once
+    solving only walks the path itself. The path leads to the nearest goal of the maze if there
+    are several. Falls back to breadth-first search if goal is not a goal of the maze."""
+    return run_steps(solve_distance_field_steps(maze, start, goal))
+
+def solve_distance_field_steps(maze, start, goal):
+    """Step generator version of solve_distance_field, yields the number of cells reached by
+    the distance field so far"""
+    if not maze.is_goal(goal):
+        return (yield from solve_bfs_steps(maze, start, goal))
+    yield from maze.distance_field_steps()
+    return maze.solve_from(start)
+
+SOLVERS = {
+    'dfs': Maze.solve_maze,
+    'bfs': solve_bfs,
+    'astar': solve_astar,
+    'bidirectional': solve_bidirectional,
+    'field': solve_distance_field,
+}
+
+if numpyengine.HAS_NUMPY:
+    SOLVERS['numpy'] = numpyengine.solve_maze
+
+#Step generator versions of the solvers which can be run a little at a time, see the steps
+#module
+STEP_SOLVERS = {
+    'dfs': Maze.solve_steps,
+    'bfs': solve_bfs_steps,
+    'astar': solve_astar_steps,
+    'bidirectional': solve_bidirectional_steps,
+    'field': solve_distance_field_steps,
+}
+
+DEFAULT_SOLVER = 'field'
+
+def register_solver(name, solver, steps=None):
+    """Adds a solver to the registry. The solver is called with a Maze and the start and goal
+    coordinates and returns whether the goal was found. Steps is an optional step generator
+    version of it, which yields the number of cells handled so far."""
+    SOLVERS[name] = solver
+    if steps is None:
+        STEP_SOLVERS.pop(name, None)
+    else:
+        STEP_SOLVERS[name] = steps
+
+def get_solver(name):
+    """Returns the solver registered under name"""
+    if name not in SOLVERS:
+        raise ValueError('Unknown maze solver: %s' % name)
+    return SOLVERS[name]
+
+def get_solver_steps(name):
+    """Returns the step generator version of the solver registered under name. Solvers without
+    one are run in a single step."""
+    solver = get_solver(name)
+    if name in STEP_SOLVERS:
+        return STEP_SOLVERS[name]
+    return lambda *args: single_step(solver, *args)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Opt-in instrumentation of the maze engine. An EngineStats object given to a Maze or a Game
+collects counters, such as cells visited, backtracks and random draws of carving and solving, and
+the time spent in every phase, such as allocating buffers, carving and encoding saved games.
+Mazes and games without stats only pay for a None check, and the hot loops only for a couple of
+local counters.
+
+Counters and timings add up over all operations. After every operation the callback of the stats
+is called with the name of the operation and the stats, which can be used to export them."""
+
+class EngineStats:
+    """Counters, high-water marks and phase timings collected from mazes and games"""
+
+    def __init__(self, callback=None):
+        """Callback is called with the name of the operation and this object after every
+        instrumented operation"""
+        self.__counters = {}
+        self.__timings = {}
+        self.__callback = callback
+
+    def add(self, name, amount=1):
+        """Adds amount to the counter name"""
+        self.__counters[name] = self.__counters.get(name, 0) + amount
+
+    def set_maximum(self, name, value):
+        """Sets the counter name to value if it is larger than the current value"""
+        if value > self.__counters.get(name, 0):
+            self.__counters[name] = value
+
+    def add_time(self, name, seconds):
+        """Adds seconds to the time spent in phase name"""
+        self.__timings[name] = self.__timings.get(name, 0.0) + seconds
+
+    def finish(self, operation):
+        """Counts a finished operation and passes the stats to the callback"""
+        self.add(operation)
+        if self.__callback is not None:
+            self.__callback(operation, self)
+
+    def set_callback(self, callback):
+        """Replaces the callback, None removes it"""
+        self.__callback = callback
+
+    def get_counters(self):
+        """Returns a copy of the counters as a dictionary"""
+        return dict(self.__counters)
+
+    def get_timings(self):
+        """Returns a copy of the phase timings in seconds as a dictionary"""
+        return dict(self.__timings)
+
+    def as_dict(self):
+        """Returns the counters and timings as a dictionary which can be stored as JSON"""
+        return {'counters': self.get_counters(), 'timings': self.get_timings()}
+
+    def reset(self):
+        """Clears all counters and timings"""
+        self.__counters.clear()
+        self.__timings.clear()
+
+class CountingRandom:
+    """Wraps a random generator and counts the draws made through it. The draws are passed on
+    unchanged, so the wrapped generator produces the same sequence as without counting."""
+
+    def __init__(self, wrapped):
+        self.__wrapped = wrapped
+        self.draws = 0
+
+    def get_wrapped(self):
+        """Returns the wrapped random generator"""
+        return self.__wrapped
+
+    def randrange(self, *args):
+        """Counted random.Random.randrange"""
+        self.draws += 1
+        return self.__wrapped.randrange(*args)
+
+    def random(self):
+        """Counted random.Random.random"""
+        self.draws += 1
+        return self.__wrapped.random()
+
+    def choice(self, sequence):
+        """Counted random.Random.choice"""
+        self.draws += 1
+        return self.__wrapped.choice(sequence)
+
+    def shuffle(self, sequence):
+        """Counted random.Random.shuffle, which draws once per element"""
+        self.draws += max(len(sequence) - 1, 0)
+        self.__wrapped.shuffle(sequence)
+
+    def getrandbits(self, bits):
+        """Counted random.Random.getrandbits"""
+        self.draws += 1
+        return self.__wrapped.getrandbits(bits)
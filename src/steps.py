@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""Helpers for step generators, which run long maze operations a little at a time. A step
+generator yields the number of cells done so far every PROGRESS_STEP cells and returns the result
+of the operation, so it can be run in a worker thread that reports progress and stops early when
+the operation is cancelled. Closing a step generator cancels the operation."""
+
+#Number of cells handled between two progress reports
+PROGRESS_STEP = 4096
+
+def run_steps(steps):
+    """Runs the step generator steps to the end and returns the result of the operation"""
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+def single_step(function, *args):
+    """Step generator which calls function with args in a single step and returns its result,
+    used for operations that have no steps of their own"""
+    yield from ()
+    return function(*args)
@@ -2,10 +2,42 @@
 """Labyrinth unit tests for testing non-UI related classes and functions"""
 
 import unittest
-from maze import Maze
-from cell import Cell
+import os
+import sys
+import contextlib
+import tempfile
+import io
+import ctypes
+import mmap
+import threading
+from maze import Maze, OPPOSITE
+from game import Game
+from cell import Cell, WALL_BITS
 from player import Player
 from coordinate import Coordinate
+import numpyengine
+import generators
+import solvers
+import saveformat
+import tiledmaze
+import cli
+import batch
+import textexport
+import benchmark
+from stats import EngineStats
+import steps
+from mazepool import MazePool
+from mazecache import MazeCache
+
+def run_recorded(step_generator):
+    """Runs a step generator to the end and returns its result and the list of its progress
+    reports"""
+    progress = []
+    while True:
+        try:
+            progress.append(next(step_generator))
+        except StopIteration as stop:
+            return stop.value, progress
 
 class Test(unittest.TestCase):
     """Unit testing class used for testing the non-UI related classes and functions"""
@@ -47,6 +79,22 @@ class Test(unittest.TestCase):
         self.assertEqual(field.get_cell(Coordinate(3, 3, 3)).is_visited(), False)
         self.assertEqual(field.get_cell(Coordinate(4, 4, 4)).is_visited(), False)
 
+    def test_unvisited_epochs(self):
+        """Tests that visited flags are cleared by starting a new epoch, also when the epoch
+        counter wraps around"""
+
+        field = Maze(Coordinate(3, 3, 1))
+        field.get_cell(Coordinate(1, 1, 0)).set_visited(True)
+        self.assertEqual(field.get_cell(Coordinate(1, 1, 0)).is_visited(), True)
+
+        field.make_cells_unvisited()
+        self.assertEqual(field.get_cell(Coordinate(1, 1, 0)).is_visited(), False)
+
+        for _ in range(0xFFFF):
+            field.get_cell(Coordinate(2, 2, 0)).set_visited(True)
+            field.make_cells_unvisited()
+            self.assertEqual(field.get_cell(Coordinate(2, 2, 0)).is_visited(), False)
+
     def test_walls(self):
         """Tests that walls are equal on both sides and that the map matches the one generated by
         seed 900"""
@@ -78,6 +126,28 @@ class Test(unittest.TestCase):
         self.assertEqual(field.get_cell(Coordinate(2, 0, 0)).is_wall(Cell.TOP),
                          field.get_cell(Coordinate(2, 0, 1)).is_wall(Cell.BOTTOM))
 
+    def test_wall_tables(self):
+        """Tests the bitmask wall accessors, neighbor offsets and sealing of the maze edges"""
+
+        field = Maze(Coordinate(5, 4, 3))
+        index = field.index(Coordinate(2, 1, 1))
+        self.assertEqual(field.get_offsets(), (20, -20, -1, 1, -5, 5))
+        self.assertEqual(field.open_directions(index), ())
+
+        field.carve_passage(index, Cell.TOP)
+        field.carve_passage(index, Cell.LEFT)
+        self.assertEqual(field.walls_mask(index), 0b00111010)
+        self.assertEqual(field.open_directions(index), (Cell.TOP, Cell.LEFT))
+        self.assertEqual(field.open_directions(index + field.get_offsets()[Cell.TOP]),
+                         (Cell.BOTTOM,))
+
+        for value_index in range(5 * 4 * 3):
+            field.set_cell_value(value_index, 0)
+        field.seal_edges()
+        self.assertEqual(field.walls_mask(field.index(Coordinate(0, 0, 0))), 0b00010110)
+        self.assertEqual(field.walls_mask(field.index(Coordinate(4, 3, 2))), 0b00101001)
+        self.assertEqual(field.walls_mask(field.index(Coordinate(2, 1, 1))), 0)
+
     def test_solver(self):
         """Tests that the solver can find the goal in a maze"""
 
@@ -94,6 +164,690 @@ class Test(unittest.TestCase):
 
         self.assertEqual(player.move_player(field, Cell.FRONT), False)
         self.assertEqual(player.move_player(field, Cell.RIGHT), True)
+        self.assertEqual(player.get_position(), Coordinate(1, 0, 0))
+        self.assertEqual(player.move_player(field, None), False)
+        self.assertEqual(player.get_moves(), 1)
+
+    def test_coordinate(self):
+        """Tests that coordinates are immutable, hashable and work with plain tuples"""
+
+        point = Coordinate(1, 2, 3)
+        self.assertEqual(point + Coordinate(1, 1, 1), Coordinate(2, 3, 4))
+        self.assertEqual(point * 2, Coordinate(2, 4, 6))
+        self.assertEqual(point - 1, (0, 1, 2))
+        self.assertEqual({point: True}[(1, 2, 3)], True)
+        self.assertRaises(AttributeError, setattr, point, 'x', 5)
+
+        field = Maze(Coordinate(5, 5, 5))
+        self.assertIs(field.get_coordinate(field.index(point)),
+                      field.get_coordinate(field.index((1, 2, 3))))
+        field.get_cell((1, 2, 3)).remove_wall(Cell.TOP)
+        self.assertEqual(field.get_cell(field.index(point)).is_wall(Cell.TOP), False)
+
+    def test_cell_storage(self):
+        """Tests that cell views share the packed maze storage which uses the saved game layout"""
+
+        field = Maze(Coordinate(5, 5, 5))
+
+        self.assertEqual(field.get_cell_value(field.index(Coordinate(2, 3, 4))), 0b00111111)
+
+        field.get_cell(Coordinate(2, 3, 4)).remove_wall(Cell.LEFT)
+        field.get_cell(Coordinate(2, 3, 4)).set_as_goal()
+
+        self.assertEqual(field.get_cell(Coordinate(2, 3, 4)).is_wall(Cell.LEFT), False)
+        self.assertEqual(field.get_cell(Coordinate(2, 3, 4)).is_goal(), True)
+        self.assertEqual(field.get_cell_value(field.index(Coordinate(2, 3, 4))), 0b10111011)
+        self.assertEqual(field.get_coordinate(field.index(Coordinate(2, 3, 4))),
+                         Coordinate(2, 3, 4))
+
+    @unittest.skipIf(not numpyengine.HAS_NUMPY, 'NumPy is not installed')
+    def test_numpy_engine(self):
+        """Tests that the NumPy engine carves a perfect maze which both solvers can solve and that
+        the same seed gives the same maze"""
+
+        field = Maze(Coordinate(9, 7, 3), seed=900)
+        numpyengine.carve_maze(field)
+        same_seed = Maze(Coordinate(9, 7, 3), seed=900)
+        numpyengine.carve_maze(same_seed)
+        self.assertEqual(field.get_cells(), same_seed.get_cells())
+
+        #A perfect maze has exactly one passage less than it has cells
+        passages = sum(6 - bin(value & 0b00111111).count('1') for value in field.get_cells())
+        self.assertEqual(passages, 2 * (9 * 7 * 3 - 1))
+
+        self.assertEqual(numpyengine.solve_maze(field, Coordinate(0, 0, 0), field.get_goal()),
+                         True)
+        self.assertEqual(field.solve_maze(Coordinate(0, 0, 0), field.get_goal()), True)
+
+    def test_generators(self):
+        """Tests that every registered generator carves a perfect maze with all cells reachable
+        from the entrance and that the goal is in the last cell"""
+
+        for name in generators.GENERATORS:
+            field = Maze(Coordinate(8, 6, 3), seed=900)
+            generators.get_generator(name)(field, Coordinate(0, 0, 0))
+
+            passages = sum(6 - bin(value & 0b00111111).count('1') for value in field.get_cells())
+            self.assertEqual(passages, 2 * (8 * 6 * 3 - 1), name)
+
+            reached = {field.index(Coordinate(0, 0, 0))}
+            stack = list(reached)
+            while stack:
+                index = stack.pop()
+                for direction in range(6):
+                    neighbor = index + field.get_offsets()[direction]
+                    if not field.get_cell_value(index) & 1 << direction and neighbor not in reached:
+                        reached.add(neighbor)
+                        stack.append(neighbor)
+            self.assertEqual(len(reached), 8 * 6 * 3, name)
+
+            self.assertEqual(field.get_goal(), Coordinate(7, 5, 2), name)
+            self.assertEqual(field.is_carved(), True, name)
+
+        self.assertRaises(ValueError, generators.get_generator, 'unknown')
+
+    def test_solvers(self):
+        """Tests that every registered solver finds the same path as the depth-first solver, which
+        is the only path in a perfect maze, also when given plain tuples"""
+
+        field = Maze(Coordinate(6, 6, 3), seed=900)
+        field.carve_maze()
+        field.solve_maze(Coordinate(0, 0, 0), field.get_goal())
+        expected = [field.get_cell_solution(index) for index in range(6 * 6 * 3)]
+
+        for name in solvers.SOLVERS:
+            field = Maze(Coordinate(6, 6, 3), seed=900)
+            field.carve_maze()
+            self.assertEqual(solvers.get_solver(name)(field, Coordinate(0, 0, 0), field.get_goal()),
+                             True, name)
+            self.assertEqual([field.get_cell_solution(index) for index in range(6 * 6 * 3)],
+                             expected, name)
+            self.assertEqual(field.is_solved(), True, name)
+
+            field = Maze(Coordinate(6, 6, 3), seed=900)
+            field.carve_maze()
+            self.assertTrue(solvers.get_solver(name)(field, (0, 0, 0), (5, 5, 2)), name)
+            self.assertEqual([field.get_cell_solution(index) for index in range(6 * 6 * 3)],
+                             expected, name)
+
+    def test_distance_field(self):
+        """Tests that the distance field matches the solved path and is rebuilt when walls
+        change"""
+
+        field = Maze(Coordinate(6, 6, 3), seed=900)
+        field.carve_maze()
+        solvers.solve_bfs(field, Coordinate(0, 0, 0), field.get_goal())
+
+        position = Coordinate(0, 0, 0)
+        moves = 0
+        while position != field.get_goal():
+            self.assertEqual(field.get_next_step(position),
+                             field.get_cell(position).get_solution())
+            position = field.get_coordinate(field.index(position) +
+                                            field.get_offsets()[field.get_next_step(position)])
+            moves += 1
+        self.assertEqual(field.get_distance_to_goal(Coordinate(0, 0, 0)), moves)
+        self.assertEqual(field.get_distance_to_goal(field.get_goal()), 0)
+        self.assertEqual(field.get_next_step(field.get_goal()), None)
+
+        #Walling off the goal makes every other cell unreachable
+        goal_index = field.index(field.get_goal())
+        field.set_cell_value(goal_index, field.get_cell_value(goal_index) | 0b00111111)
+        self.assertEqual(field.get_distance_to_goal(Coordinate(0, 0, 0)), None)
+        self.assertEqual(field.solve_from(Coordinate(0, 0, 0)), False)
+
+    def test_save_and_load(self):
+        """Tests that saving writes one encoded byte per cell after the header and that loading
+        restores the same maze and player"""
+
+        game = Game()
+        game.new_game(Coordinate(7, 6, 3))
+        game.get_player().move_player(game.get_field(), Cell.RIGHT)
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'test.sav')
+            game.save_game(filename, legacy=True)
+            with open(filename, 'rb') as save_file:
+                data = save_file.read()
+
+            expected = bytes(Game.encode_cell(game.get_field(), Coordinate(x, y, z))
+                             for z in range(3) for y in range(6) for x in range(7))
+            self.assertEqual(data[:6], b'LABv20')
+            self.assertEqual(data[18:], expected)
+
+            loaded = Game()
+            loaded.load_game(filename)
+            self.assertEqual(loaded.get_field().get_cells(), game.get_field().get_cells())
+            self.assertEqual(loaded.get_player().get_position(),
+                             game.get_player().get_position())
+            self.assertEqual(loaded.get_field().get_goal(), Coordinate(6, 5, 2))
+
+    def test_lazy_load(self):
+        """Tests that a lazily loaded game has the same maze as an eagerly loaded one and that
+        changes made to it are not written to the save file"""
+
+        game = Game()
+        game.new_game(Coordinate(7, 6, 3))
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'test.sav')
+            game.save_game(filename, legacy=True)
+            with open(filename, 'rb') as save_file:
+                data = save_file.read()
+
+            loaded = Game()
+            loaded.load_game(filename, lazy=True)
+            field = loaded.get_field()
+            self.assertEqual(field.get_cells(), game.get_field().get_cells())
+            self.assertEqual(field.get_goal(), Coordinate(6, 5, 2))
+            self.assertTrue(field.solve_from(Coordinate(0, 0, 0)))
+
+            field.get_cell(Coordinate(3, 3, 1)).set_as_goal()
+            field.carve_passage(0, Cell.RIGHT)
+            self.assertTrue(field.get_cell(Coordinate(3, 3, 1)).is_goal())
+            del field, loaded
+            with open(filename, 'rb') as save_file:
+                self.assertEqual(save_file.read(), data)
+
+            #Hacked saves with open outer walls are sealed without changing the file
+            with open(filename, 'wb') as save_file:
+                save_file.write(data[:-1] + bytes([data[-1] & 0b11000000]))
+            loaded = Game()
+            loaded.load_game(filename, lazy=True)
+            field = loaded.get_field()
+            self.assertTrue(field.get_cell(Coordinate(6, 5, 2)).is_wall(Cell.RIGHT))
+            self.assertTrue(field.get_cell(Coordinate(6, 5, 2)).is_wall(Cell.TOP))
+            self.assertTrue(field.get_cell(Coordinate(6, 5, 2)).is_wall(Cell.FRONT))
+            #Opening the inner walls of the goal can only make it closer
+            self.assertLessEqual(field.get_distance_to_goal(Coordinate(0, 0, 0)),
+                                 game.get_field().get_distance_to_goal(Coordinate(0, 0, 0)))
+            del field, loaded
+            with open(filename, 'rb') as save_file:
+                self.assertEqual(save_file.read()[-1], data[-1] & 0b11000000)
+
+    @unittest.skipUnless(os.path.exists('/proc/self/smaps'), 'needs /proc/self/smaps')
+    def test_lazy_load_pages(self):
+        """Tests that a lazy load copies only the pages of the mapping where outer walls had to
+        be added"""
+
+        def copied_kilobytes(cells):
+            """Returns the size of the private copies of the mapping holding cells"""
+            address = ctypes.addressof(ctypes.c_char.from_buffer(cells))
+            with open('/proc/self/smaps', encoding='ascii') as smaps:
+                inside = False
+                for line in smaps:
+                    fields = line.split()
+                    if '-' in fields[0] and ':' not in fields[0]:
+                        start, end = (int(part, 16) for part in fields[0].split('-'))
+                        inside = start <= address < end
+                    elif inside and fields[0] == 'Private_Dirty:':
+                        return int(fields[1])
+            return None
+
+        size = Coordinate(255, 200, 2)
+        header = b'LABv20' + bytes((*size, 0, 0, 0)) + bytes(6)
+        cells = bytearray([WALL_BITS]) * (size.x * size.y * size.z)
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'test.sav')
+            with open(filename, 'wb') as save_file:
+                save_file.write(header + cells)
+                #Pages of the file not yet written to disk would count as copies
+                save_file.flush()
+                os.fsync(save_file.fileno())
+            game = Game()
+            game.load_game(filename, lazy=True)
+            self.assertEqual(copied_kilobytes(game.get_field().get_cells()), 0)
+
+            #Only the page of the cell missing its outer wall is copied
+            open_cell = Coordinate(254, 100, 1)
+            cells[game.get_field().index(open_cell)] &= ~(1 << Cell.RIGHT)
+            with open(filename, 'wb') as save_file:
+                save_file.write(header + cells)
+                save_file.flush()
+                os.fsync(save_file.fileno())
+            game = Game()
+            game.load_game(filename, lazy=True)
+            self.assertTrue(game.get_field().get_cell(open_cell).is_wall(Cell.RIGHT))
+            self.assertEqual(copied_kilobytes(game.get_field().get_cells()),
+                             mmap.PAGESIZE // 1024)
+
+    def test_save_format(self):
+        """Tests that version 3 saves restore the same game with every compression method, that
+        single floors can be read on their own, that only uncompressed saves can be loaded lazily
+        and that large mazes fit in the format"""
+
+        game = Game()
+        game.new_game(Coordinate(9, 7, 4))
+        game.get_player().move_player(game.get_field(), Cell.RIGHT)
+        game.set_elapsed_time(42)
+        floor_size = 9 * 7
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'test.sav')
+            for compression in saveformat.COMPRESSION_NAMES.values():
+                game.save_game(filename, compression=compression)
+                with open(filename, 'rb') as save_file:
+                    self.assertEqual(save_file.read(6), b'LABv30')
+
+                uncompressed = compression == saveformat.COMPRESSION_NONE
+                loads = [{'workers': 1}, {'workers': None}] + ([{'lazy': True}] * uncompressed)
+                for options in loads:
+                    loaded = Game()
+                    loaded.load_game(filename, **options)
+                    self.assertEqual(loaded.get_field().get_cells(), game.get_field().get_cells())
+                    self.assertEqual(loaded.get_player().get_position(),
+                                     game.get_player().get_position())
+                    self.assertEqual(loaded.get_player().get_moves(),
+                                     game.get_player().get_moves())
+                    self.assertEqual(loaded.get_elapsed_time(), 42)
+
+                for z in range(4):
+                    self.assertEqual(saveformat.read_floor(filename, z),
+                                     game.get_field().get_cells()[z * floor_size:
+                                                                  (z + 1) * floor_size])
+                if not uncompressed:
+                    self.assertRaises(ValueError, Game().load_game, filename, True)
+
+            game.new_game(Coordinate(300, 2, 1))
+            self.assertRaises(ValueError, game.save_game, filename, True)
+            game.save_game(filename)
+            loaded = Game()
+            loaded.load_game(filename)
+            self.assertEqual(loaded.get_field().get_cells(), game.get_field().get_cells())
+            self.assertRaises(ValueError, loaded.load_game, filename, True)
+
+            with open(filename, 'r+b') as save_file:
+                save_file.truncate(os.path.getsize(filename) - 1)
+            self.assertRaises(ValueError, loaded.load_game, filename)
+
+    def test_tiled_maze(self):
+        """Tests that a tiled maze is a perfect maze with walls on both sides of every wall, that
+        it is the same after chunks have been dropped from the cache and that changed chunks are
+        kept"""
+
+        size = Coordinate(70, 66, 2)
+        field = tiledmaze.TiledMaze(size, seed=3, cache_size=2)
+        offsets = field.get_offsets()
+        values = [field.get_cell_value(index) for index in range(70 * 66 * 2)]
+        self.assertEqual(field.get_loaded_chunks(), 2)
+        self.assertTrue(field.get_cell(Coordinate(0, 0, 0)).is_entrance())
+        self.assertTrue(field.get_cell(Coordinate(69, 65, 1)).is_goal())
+
+        passages = 0
+        for index in range(len(values)):
+            for direction in field.open_directions(index):
+                neighbor = index + offsets[direction]
+                self.assertTrue(0 <= neighbor < len(values))
+                self.assertFalse(values[neighbor] & 1 << OPPOSITE[direction])
+                passages += 1
+        self.assertEqual(passages // 2, len(values) - 1)
+
+        #Floors are only linked by a single ladder where a chunk links to the chunk below it
+        ladders = {}
+        for index in range(70 * 66):
+            if not values[index] & 1 << Cell.TOP:
+                position = field.get_coordinate(index)
+                chunk = (position.x // tiledmaze.CHUNK_SIZE, position.y // tiledmaze.CHUNK_SIZE)
+                ladders[chunk] = ladders.get(chunk, 0) + 1
+        self.assertEqual(ladders[(0, 0)], 1)
+        self.assertTrue(all(count == 1 for count in ladders.values()))
+
+        same_field = tiledmaze.TiledMaze(size, seed=3)
+        self.assertEqual([same_field.get_cell_value(index) for index in range(len(values))],
+                         values)
+
+        self.assertTrue(solvers.solve_distance_field(same_field, Coordinate(5, 60, 0),
+                                                     same_field.get_goal()))
+        player = Player(Coordinate(5, 60, 0))
+        while player.get_position() != same_field.get_goal():
+            self.assertTrue(player.move_player(same_field, same_field.get_cell(
+                player.get_position()).get_solution()))
+
+        field.get_cell(Coordinate(1, 1, 0)).set_as_goal()
+        field.get_cell_value(field.index((69, 0, 0)))
+        field.get_cell_value(field.index((0, 65, 1)))
+        self.assertTrue(field.get_cell(Coordinate(1, 1, 0)).is_goal())
+        field.close()
+
+        #Games close replaced tiled mazes, which keeps changes in a given store
+        with tempfile.TemporaryDirectory() as directory:
+            game = Game()
+            game.new_tiled_game(size, seed=3, store=directory)
+            game.get_field().get_cell(Coordinate(1, 1, 0)).set_as_goal()
+            self.assertRaises(ValueError, game.save_game, os.path.join(directory, 'test.sav'))
+            game.new_game(Coordinate(3, 3, 1))
+            self.assertEqual(os.listdir(directory), ['0_0_0.chunk'])
+            self.assertTrue(tiledmaze.TiledMaze(size, seed=3, store=directory).get_cell(
+                Coordinate(1, 1, 0)).is_goal())
+
+    def test_tiled_maze_threads(self):
+        """Tests that a tiled maze can be read while a worker thread solves it with a cache too
+        small for the path and that changed chunks are not lost"""
+
+        size = Coordinate(200, 70, 1)
+        field = tiledmaze.TiledMaze(size, seed=8, cache_size=2)
+        indices = range(0, 200 * 70, 1999)
+        values = [tiledmaze.TiledMaze(size, seed=8).get_cell_value(index) for index in indices]
+        field.set_cell_value(0, values[0] | 1 << Cell.GOAL)
+        errors = []
+
+        def solve():
+            """Solves the maze a few times, keeping any error"""
+            try:
+                for _ in range(3):
+                    field.solve_from(Coordinate(0, 0, 0))
+            except Exception as error: # pylint: disable=broad-except
+                errors.append(error)
+
+        worker = threading.Thread(target=solve)
+        worker.start()
+        while worker.is_alive():
+            self.assertEqual([field.get_cell_value(index) for index in indices[1:]], values[1:])
+        worker.join()
+        self.assertEqual(errors, [])
+        self.assertLessEqual(field.get_loaded_chunks(), 2)
+        self.assertTrue(field.get_cell(Coordinate(0, 0, 0)).is_goal())
+        field.close()
+
+    def test_goals(self):
+        """Tests that goals and entrances are found after carving, loading and changing cells and
+        that the game is won at any goal"""
+
+        game = Game()
+        game.new_game(Coordinate(6, 5, 2))
+        field = game.get_field()
+        self.assertEqual(field.get_goals(), [Coordinate(5, 4, 1)])
+        self.assertEqual(field.get_entrances(), [Coordinate(0, 0, 0)])
+        self.assertTrue(field.is_goal(Coordinate(5, 4, 1)))
+        self.assertFalse(field.is_goal(Coordinate(0, 0, 0)))
+
+        field.get_cell(Coordinate(2, 1, 0)).set_as_goal()
+        self.assertEqual(field.get_goals(), [Coordinate(2, 1, 0), Coordinate(5, 4, 1)])
+        self.assertEqual(field.get_distance_to_goal(Coordinate(2, 1, 0)), 0)
+
+        cells = bytearray(field.get_cells())
+        cells[-1] &= ~(1 << Cell.GOAL)
+        field.set_cells(cells)
+        self.assertEqual(field.get_goal(), Coordinate(2, 1, 0))
+
+        Game.decode_cell(field, Coordinate(4, 4, 0), 1 << Cell.ENTRANCE | 1 << Cell.GOAL)
+        self.assertEqual(field.get_entrances(), [Coordinate(0, 0, 0), Coordinate(4, 4, 0)])
+        self.assertEqual(field.get_goals(), [Coordinate(2, 1, 0), Coordinate(4, 4, 0)])
+
+        game.set_player(Player(Coordinate(4, 4, 0)))
+        self.assertTrue(game.check_victory())
+        self.assertFalse(game.check_victory())
+
+    def test_cli(self):
+        """Tests that the command line tool saves solvable mazes without importing PyQt5"""
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'maze{}.sav')
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertEqual(cli.main(['8', '7', '2', '-n', '2', '-s', '5', '-o', filename,
+                                           '--compression', 'none']), 0)
+                self.assertEqual(cli.main(['150', '100', '2', '-s', '3', '--tiled']), 0)
+                #Every solver finds the goal when the player starts on it
+                for solver in solvers.SOLVERS:
+                    self.assertEqual(cli.main(['1', '1', '1', '--solver', solver]), 0)
+
+            game = Game()
+            game.load_game(filename.format(2), lazy=True)
+            self.assertEqual(game.get_field().get_dimensions(True), Coordinate(8, 7, 2))
+            self.assertTrue(game.get_field().solve_from(Coordinate(0, 0, 0)))
+            self.assertNotIn('PyQt5', sys.modules)
+
+    def test_batch(self):
+        """Tests that batch generated mazes depend only on their seeds and that they decode into
+        mazes with the returned solution"""
+
+        size = Coordinate(7, 5, 2)
+        single = list(batch.generate_mazes(size, range(6), solver='bfs', workers=1))
+        parallel = list(batch.generate_mazes(size, range(6), solver='bfs', workers=2,
+                                             mazes_per_task=2))
+        self.assertEqual(single, parallel)
+        self.assertEqual([seed for seed, _, _ in parallel], list(range(6)))
+
+        field = Maze(size, seed=4)
+        field.carve_maze()
+        cells, path = parallel[4][1:]
+        self.assertEqual(cells, field.get_cells())
+
+        field = batch.decode_maze(size, cells)
+        self.assertEqual(len(path), field.get_distance_to_goal(Coordinate(0, 0, 0)))
+
+    def test_text_export(self):
+        """Tests that the ascii export matches the maze drawing and that the unicode export has
+        the same shape"""
+
+        field = Maze(Coordinate(6, 4, 2), seed=900)
+        field.carve_maze()
+        output = io.StringIO()
+        textexport.write_text(field, output)
+        self.assertEqual(output.getvalue(), str(field))
+
+        lines = list(textexport.iter_unicode(field))
+        self.assertEqual(len(lines), len(str(field).splitlines()))
+        self.assertEqual(lines[1][0] + lines[1][-2], '┌┐')
+        self.assertEqual(lines[-1][0] + lines[-1][-2], '└┘')
+        self.assertTrue(all(len(line) == 14 for line in lines if not line.startswith('Floor')))
+        self.assertRaises(ValueError, textexport.write_text, field, output, 'braille')
+
+    def test_benchmark(self):
+        """Tests that benchmarks are timed for every size and that slower operations are
+        reported as regressions"""
+
+        operations = ('carve', 'solve', 'load', 'str')
+        results = benchmark.run_benchmarks(('4x3x2', '5X5X1'), operations, repeat=1)
+        self.assertEqual(sorted(results['results']), ['4x3x2', '5x5x1'])
+        self.assertEqual(sorted(results['results']['4x3x2']), sorted(operations))
+        self.assertRaises(ValueError, benchmark.parse_size, '4x3')
+
+        baseline = {'results': {'4x3x2': {'carve': {'best': 0.5}, 'solve': {'best': 1.0}}}}
+        results = {'results': {'4x3x2': {'carve': {'best': 1.0}, 'solve': {'best': 1.05}},
+                               '5x5x1': {'carve': {'best': 1.0}}}}
+        self.assertEqual(benchmark.compare(results, baseline), [('4x3x2', 'carve', 0.5, 1.0)])
+
+        #Baseline times of zero are reported without a relative change
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'baseline.json')
+            with open(filename, 'w', encoding='utf-8') as baseline_file:
+                baseline_file.write('{"results": {"100x100x1": {"carve": {"best": 0.0}}}}')
+            errors = io.StringIO()
+            with contextlib.redirect_stderr(errors):
+                self.assertEqual(benchmark.main(['--sizes', '100x100x1', '--operations', 'carve',
+                                                 '-r', '1', '-b', filename,
+                                                 '-o', os.path.join(directory, 'out.json')]), 1)
+            self.assertIn('baseline 0.0000 s\n', errors.getvalue())
+
+    def test_stats(self):
+        """Tests that instrumented mazes and games count and time their operations and are the
+        same as without instrumentation"""
+
+        reported = []
+        stats = EngineStats(lambda operation, _: reported.append(operation))
+        field = Maze(Coordinate(5, 5, 5), seed=900, stats=stats)
+        field.carve_maze()
+        plain = Maze(Coordinate(5, 5, 5), seed=900)
+        plain.carve_maze()
+        self.assertEqual(field.get_cells(), plain.get_cells())
+
+        counters = stats.get_counters()
+        self.assertEqual(counters['carve_cells_visited'], 125)
+        self.assertEqual(counters['carve_backtracks'], 124)
+        self.assertTrue(0 < counters['carve_stack_high_water'] <= 125)
+        self.assertGreaterEqual(counters['carve_rng_draws'], 124)
+        self.assertEqual(counters['get_cell'], 2)
+        self.assertTrue({'allocate', 'carve', 'unvisit'} <= set(stats.get_timings()))
+
+        self.assertTrue(field.solve_maze(Coordinate(0, 0, 0), field.get_goal()))
+        self.assertTrue(plain.solve_maze(Coordinate(0, 0, 0), plain.get_goal()))
+        self.assertEqual([field.get_cell_solution(i) for i in range(125)],
+                         [plain.get_cell_solution(i) for i in range(125)])
+        self.assertEqual(reported, ['carve_maze', 'solve_maze'])
+
+        game = Game()
+        game.set_stats(stats)
+        game.new_game(Coordinate(4, 4, 2), seed=1)
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'stats.sav')
+            game.save_game(filename)
+            game.load_game(filename)
+        self.assertIs(game.get_field().get_stats(), stats)
+        self.assertEqual(reported[2:], ['carve_maze', 'new_game', 'save_game', 'load_game'])
+        self.assertTrue({'encode', 'write', 'read', 'decode'} <= set(stats.get_timings()))
+
+        stats.reset()
+        self.assertEqual(stats.as_dict(), {'counters': {}, 'timings': {}})
+
+    def test_steps(self):
+        """Tests that carving and solving step by step report progress, give the same result as
+        running at once and can be cancelled"""
+
+        size = Coordinate(100, 60, 2)
+        cells = size.x * size.y * size.z
+        game = Game()
+        field, progress = run_recorded(game.carve_steps(size, seed=900))
+        self.assertEqual(progress, list(range(steps.PROGRESS_STEP, cells, steps.PROGRESS_STEP)))
+        plain = Maze(size, seed=900)
+        plain.carve_maze()
+        self.assertEqual(field.get_cells(), plain.get_cells())
+        game.start_game(field)
+        self.assertIs(game.get_field(), field)
+
+        #A cancelled solve leaves no visited cells or partial solution behind
+        solving = field.solve_steps(Coordinate(0, 0, 0), field.get_goal())
+        next(solving)
+        self.assertIsNotNone(field.get_cell(Coordinate(0, 0, 0)).get_solution())
+        solving.close()
+        self.assertFalse(field.is_solved())
+        self.assertFalse(any(field.is_cell_visited(index) for index in range(cells)))
+        self.assertFalse(any(field.get_cell(index).get_solution() is not None
+                             for index in range(cells)))
+        self.assertTrue(steps.run_steps(
+            solvers.get_solver_steps('dfs')(field, Coordinate(0, 0, 0), field.get_goal())))
+
+        reached = list(field.distance_field_steps())
+        self.assertEqual(reached[-1], cells)
+        self.assertEqual(list(field.distance_field_steps()), [])
+
+        #Every Python generator and solver reports progress and matches its plain version
+        for name in ('eller', 'kruskal', 'sidewinder', 'binary-tree'):
+            field = Maze(size, seed=900)
+            result, progress = run_recorded(
+                generators.get_generator_steps(name)(field, Coordinate(0, 0, 0)))
+            self.assertIsNone(result)
+            self.assertTrue(field.is_carved())
+            self.assertTrue(progress)
+            self.assertTrue(all(0 < done < cells for done in progress))
+            plain = Maze(size, seed=900)
+            generators.get_generator(name)(plain, Coordinate(0, 0, 0))
+            self.assertEqual(field.get_cells(), plain.get_cells())
+
+            for solver in ('bfs', 'astar', 'bidirectional'):
+                found, progress = run_recorded(solvers.get_solver_steps(solver)(
+                    field, Coordinate(0, 0, 0), field.get_goal()))
+                self.assertTrue(found)
+                self.assertEqual(progress, sorted(progress))
+
+    def test_maze_pool(self):
+        """Tests that new games take ready mazes from the pool, which is refilled and evicts the
+        least recently used sizes"""
+
+        pool = MazePool(max_keys=2, max_cells=1000)
+        game = Game()
+        game.set_maze_pool(pool)
+        try:
+            game.new_game(Coordinate(6, 5, 2))
+            self.assertEqual((pool.get_hits(), pool.get_misses()), (0, 1))
+            self.assertTrue(pool.wait_ready(10))
+
+            game.new_game(Coordinate(6, 5, 2))
+            self.assertEqual((pool.get_hits(), pool.get_misses()), (1, 1))
+            self.assertTrue(game.get_field().is_carved())
+            self.assertEqual(game.get_field().get_dimensions(True), Coordinate(6, 5, 2))
+            self.assertTrue(pool.wait_ready(10))
+            self.assertEqual(pool.get_ready_count(), 1)
+
+            #Seeded games never use the pool and large mazes are never pooled
+            game.new_game(Coordinate(6, 5, 2), seed=900)
+            game.new_game(Coordinate(50, 50, 1))
+            self.assertEqual(pool.get_hits(), 1)
+
+            pool.prefetch(Coordinate(3, 3, 1), 'kruskal')
+            pool.prefetch(Coordinate(4, 4, 1), 'kruskal')
+            self.assertTrue(pool.wait_ready(10))
+            self.assertEqual(pool.get_ready_count(), 2)
+
+            #After a miss nothing is carved until the caller has carved its maze
+            self.assertIsNone(pool.take(Coordinate(6, 5, 2), 'kruskal'))
+            pool.prefetch(Coordinate(3, 3, 2), 'kruskal')
+            self.assertFalse(pool.wait_ready(0.2))
+            self.assertEqual(pool.get_ready_count(), 1)
+            pool.refill(Coordinate(6, 5, 2), 'kruskal')
+            self.assertTrue(pool.wait_ready(10))
+            self.assertIsNotNone(pool.take(Coordinate(6, 5, 2), 'kruskal'))
+            self.assertRaises(ValueError, pool.prefetch, Coordinate(3, 3, 1), 'unknown')
+            self.assertRaises(ValueError, pool.take, Coordinate(3, 3, 1), 'unknown')
+        finally:
+            pool.close()
+        self.assertIsNone(pool.take(Coordinate(3, 3, 1), 'kruskal'))
+
+    def test_maze_cache(self):
+        """Tests that cached mazes are the same as freshly carved ones, that damaged entries are
+        dropped and that the least recently used entries are evicted"""
+
+        size = Coordinate(8, 6, 3)
+        with tempfile.TemporaryDirectory() as directory:
+            cache = MazeCache(directory)
+            carved = cache.get_or_carve(size, 900)
+            cached = cache.get_or_carve(size, 900)
+            self.assertEqual((cache.get_hits(), cache.get_misses()), (1, 1))
+            self.assertEqual(cached.get_cells(), carved.get_cells())
+            self.assertTrue(cached.is_carved())
+            self.assertIsNone(cache.get(size, 901))
+            self.assertIsNone(cache.get(size, 900, 'kruskal'))
+
+            #The random state is cached too, so solving gives the same path
+            start = Coordinate(0, 0, 0)
+            self.assertTrue(carved.solve_maze(start, carved.get_goal()))
+            self.assertTrue(cached.solve_maze(start, cached.get_goal()))
+            self.assertEqual([carved.get_cell_solution(i) for i in range(len(carved.get_cells()))],
+                             [cached.get_cell_solution(i) for i in range(len(cached.get_cells()))])
+
+            game = Game()
+            game.set_maze_cache(cache)
+            game.new_game(size, seed=900)
+            self.assertEqual(game.get_field().get_cells(), carved.get_cells())
+            self.assertEqual(cache.get_hits(), 2)
+
+            #Damaged entries are misses and removed
+            entries = [name for name in os.listdir(directory) if name.endswith('.maze')]
+            self.assertEqual(len(entries), 1)
+            with open(os.path.join(directory, entries[0]), 'r+b') as cache_file:
+                cache_file.truncate(100)
+            self.assertIsNone(cache.get(size, 900))
+            self.assertEqual(os.listdir(directory), ['.lock'])
+
+            #Only the most recently used entry fits
+            cache = MazeCache(directory, max_bytes=3000)
+            for seed in (1, 2, 3):
+                cache.get_or_carve(size, seed)
+            self.assertEqual(len([name for name in os.listdir(directory)
+                                  if name.endswith('.maze')]), 1)
+            self.assertIsNone(cache.get(size, 1))
+            self.assertIsNotNone(cache.get(size, 3))
+
+            #Failed writes are counted and the maze is still returned
+            removed = os.path.join(directory, 'removed')
+            cache = MazeCache(removed)
+            os.rmdir(removed)
+            game = Game()
+            game.set_maze_cache(cache)
+            game.new_game(size, seed=4)
+            self.assertTrue(game.get_field().is_carved())
+            self.assertEqual(cache.get_write_failures(), 1)
+            self.assertFalse(os.path.exists(removed))
 
 if __name__ == '__main__':
     unittest.main()
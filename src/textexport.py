@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Streaming text export of mazes. The exporters are generators which yield the drawing one line
+at a time, floor by floor, so mazes of any size can be written to a file or the terminal in
+linear time while only a couple of rows are kept in memory.
+
+Two styles are available. The ascii style is the same drawing Maze.__str__ returns, where walls
+are drawn with # and ladders up, down and both ways with /, \\ and X. The unicode style draws the
+walls with box-drawing characters and ladders with arrows."""
+
+import sys
+from cell import Cell
+
+#Text of a cell on the wall line and the cell line of the ascii style for every packed value
+ASCII_WALLS = tuple('##' if value & 1 << Cell.BACK else '# ' for value in range(256))
+ASCII_CELLS = tuple(('#' if value & 1 << Cell.LEFT else ' ') +
+                    ('X' if not value & 1 << Cell.TOP and not value & 1 << Cell.BOTTOM else
+                     '/' if not value & 1 << Cell.TOP else
+                     '\\' if not value & 1 << Cell.BOTTOM else ' ')
+                    for value in range(256))
+
+#Box-drawing characters for wall corners, indexed by the walls leaving the corner upwards (1),
+#downwards (2), to the left (4) and to the right (8)
+BOX_CORNERS = ' ╵╷│╴┘┐┤╶└┌├─┴┬┼'
+UNICODE_LADDERS = tuple('↕' if not value & 1 << Cell.TOP and not value & 1 << Cell.BOTTOM else
+                        '↑' if not value & 1 << Cell.TOP else
+                        '↓' if not value & 1 << Cell.BOTTOM else ' '
+                        for value in range(256))
+
+def _rows(maze, z):
+    """Yields the packed values of every row of floor z as lists"""
+    width = maze.get_width()
+    for y in range(maze.get_height()):
+        first = maze.index((0, y, z))
+        yield [maze.get_cell_value(index) for index in range(first, first + width)]
+
+def iter_ascii(maze):
+    """Yields the lines of the ascii drawing of maze"""
+    for z in range(maze.get_floors()):
+        yield 'Floor ' + str(z + 1) + '\n'
+        for row in _rows(maze, z):
+            yield ''.join([ASCII_WALLS[value] for value in row]) + '#\n'
+            yield ''.join([ASCII_CELLS[value] for value in row]) + '#\n'
+        yield '##' * maze.get_width() + '#\n'
+
+def _unicode_wall_line(above, below):
+    """Returns the line of corners and horizontal walls between the rows above and below, either
+    of which is None on the edges of the floor"""
+    back = 1 << Cell.BACK
+    front = 1 << Cell.FRONT
+    left = 1 << Cell.LEFT
+    right = 1 << Cell.RIGHT
+    width = len(above if below is None else below)
+    line = []
+    for x in range(width + 1):
+        #Walls leaving the corner at the top left of cell x in every direction
+        corner = 0
+        if above is not None:
+            if x < width and above[x] & left or x and above[x - 1] & right:
+                corner |= 1
+        if below is not None:
+            if x < width and below[x] & left or x and below[x - 1] & right:
+                corner |= 2
+        if x and (below[x - 1] & back if below is not None else above[x - 1] & front):
+            corner |= 4
+        wall = x < width and (below[x] & back if below is not None else above[x] & front)
+        if wall:
+            corner |= 8
+        line.append(BOX_CORNERS[corner])
+        if x < width:
+            line.append('─' if wall else ' ')
+    line.append('\n')
+    return ''.join(line)
+
+def iter_unicode(maze):
+    """Yields the lines of the box-drawing drawing of maze"""
+    left = 1 << Cell.LEFT
+    right = 1 << Cell.RIGHT
+    for z in range(maze.get_floors()):
+        yield 'Floor ' + str(z + 1) + '\n'
+        above = None
+        for row in _rows(maze, z):
+            yield _unicode_wall_line(above, row)
+            yield ''.join([('│' if value & left else ' ') + UNICODE_LADDERS[value]
+                           for value in row]) + ('│' if row[-1] & right else ' ') + '\n'
+            above = row
+        yield _unicode_wall_line(above, None)
+
+STYLES = {
+    'ascii': iter_ascii,
+    'unicode': iter_unicode,
+}
+
+def write_text(maze, output=None, style='ascii'):
+    """Writes the drawing of maze in the given style to the text file output, which defaults to
+    the standard output"""
+    if output is None:
+        output = sys.stdout
+    if style not in STYLES:
+        raise ValueError('Unknown text style: %s' % style)
+    output.writelines(STYLES[style](maze))
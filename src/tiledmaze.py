@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""The TiledMaze class for mazes that are too large to keep in memory.
+
+A tiled maze is split into chunks of CHUNK_SIZE x CHUNK_SIZE cells on a single floor. Every chunk
+is carved on its own by the default carver the first time it is needed, from a seed derived from
+the maze seed and the chunk position, so the same chunk always comes out the same. Chunks are
+linked into a tree just like the cells of a binary tree maze: every chunk except the first one has
+a single opening to its LEFT, BACK or BOTTOM neighbor chunk. The openings are also derived from
+the seed, so both chunks agree on them without the other chunk being loaded and the whole maze is
+a perfect maze.
+
+Since chunks are a single floor high and linked by a single opening, floors are only connected
+where a chunk links to the chunk below it, so there is at most one ladder per chunk instead of
+ladders spread all over each floor as in Maze. Tiled mazes are therefore mostly flat, and paths
+between floors often have to cross several chunks to reach the next ladder.
+
+Only the most recently used chunks are kept in memory. Chunks that have been changed are written
+to a store directory when they are dropped from the cache and read back from there when they are
+needed again, other chunks are simply carved again.
+
+TiledMaze has the same cell access interface as Maze, so players can move in it and it can be
+drawn and solved with the distance field solver, but the cells are not available as a single
+buffer. The chunk cache is guarded by a lock, so a worker thread can solve the maze while the
+GUI thread draws it.
+"""
+
+import os
+import random
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict, deque
+from coordinate import Coordinate
+from cell import Cell, WALL_BITS
+from grid import CellGrid
+from maze import Maze, BIAS, OPPOSITE, OPEN_DIRECTIONS
+
+#Width and height of a chunk in cells
+CHUNK_SIZE = 64
+#Default number of chunks kept in memory
+CACHE_SIZE = 256
+
+#Translation table which clears the entrance and goal markers of packed cell values
+CLEAR_MARKERS = bytes(value & WALL_BITS for value in range(256))
+
+class TiledMaze(CellGrid):
+    """A maze of the given size whose cells are carved and loaded one chunk at a time. Seed
+    decides the maze, a random maze is created if it is not given. At most cache_size chunks are
+    kept in memory. Changed chunks are kept in the store directory, a temporary directory is used
+    if it is not given."""
+
+    def __init__(self, size, seed=None, cache_size=CACHE_SIZE, store=None, bias=BIAS):
+        super().__init__(size)
+        self.__size = size
+        self.__floor_size = size.x * size.y
+        self.__seed = random.getrandbits(64) if seed is None else seed
+        self.__bias = bias
+
+        #Number of chunks along x and y
+        self.__chunks_x = (size.x + CHUNK_SIZE - 1) // CHUNK_SIZE
+        self.__chunks_y = (size.y + CHUNK_SIZE - 1) // CHUNK_SIZE
+
+        self.__offsets = self.get_offsets()
+
+        #Packed cells of the loaded chunks, in least recently used order. The lock is held while
+        #chunks are loaded, evicted or changed.
+        self.__chunks = OrderedDict()
+        self.__lock = threading.RLock()
+        self.__cache_size = cache_size
+        self.__dirty = set()
+        self.__store = store
+        self.__temporary_store = store is None
+
+        #Visited flags and solution directions are only kept for the cells that have them
+        self.__visited = set()
+        self.__solution = {}
+        self.__solved = False
+
+    def get_cell_value(self, index):
+        """Returns the packed value of the cell at the given linear index"""
+        key, local = self.__locate(index)
+        with self.__lock:
+            return self.__get_chunk(key)[local]
+
+    def set_cell_value(self, index, value):
+        """Replaces the packed value of the cell at the given linear index"""
+        key, local = self.__locate(index)
+        #The chunk must not be evicted between changing it and marking it as changed
+        with self.__lock:
+            self.__get_chunk(key)[local] = value
+            self.__dirty.add(key)
+
+    def is_cell_visited(self, index):
+        """Returns the visited flag of the cell at the given linear index"""
+        return index in self.__visited
+
+    def set_cell_visited(self, index, flag):
+        """Sets the visited flag of the cell at the given linear index"""
+        if flag:
+            self.__visited.add(index)
+        else:
+            self.__visited.discard(index)
+
+    def get_cell_solution(self, index):
+        """Returns the solution direction of the cell at the given linear index or None"""
+        return self.__solution.get(index)
+
+    def set_cell_solution(self, index, direction):
+        """Sets the solution direction of the cell at the given linear index, None clears it"""
+        if direction is None:
+            self.__solution.pop(index, None)
+        else:
+            self.__solution[index] = direction
+
+    def make_cells_unvisited(self):
+        """Makes all cells unvisited"""
+        self.__visited.clear()
+
+    def get_goal(self):
+        """Returns the coordinates for the goal in the maze, which is always the 'max' coordinates
+        of the maze"""
+        return self.__size - 1
+
+    def get_goals(self):
+        """Returns the coordinates of all goals in the maze, tiled mazes have a single goal"""
+        return [self.get_goal()]
+
+    def get_entrances(self):
+        """Returns the coordinates of all entrances in the maze, tiled mazes have a single
+        entrance"""
+        return [Coordinate(0, 0, 0)]
+
+    def get_seed(self):
+        """Returns the seed the maze is carved from"""
+        return self.__seed
+
+    def set_carved(self):
+        """Tiled mazes are carved as they are loaded, so this does nothing"""
+
+    def is_carved(self):
+        """Returns whether the maze is carved, which tiled mazes always are"""
+        return True
+
+    def set_solved(self):
+        """Sets the maze as solved"""
+        self.__solved = True
+
+    def is_solved(self):
+        """Returns whether the maze is solved"""
+        return self.__solved
+
+    def get_loaded_chunks(self):
+        """Returns the number of chunks currently kept in memory"""
+        return len(self.__chunks)
+
+    def flush(self):
+        """Writes all changed chunks to the store"""
+        with self.__lock:
+            for key in self.__dirty:
+                self.__write_chunk(key, self.__chunks[key])
+            self.__dirty.clear()
+
+    def close(self):
+        """Drops all loaded chunks and removes the store if it is a temporary directory. Changed
+        chunks are written to a given store first."""
+        with self.__lock:
+            if not self.__temporary_store:
+                self.flush()
+            self.__chunks.clear()
+            self.__dirty.clear()
+            if self.__temporary_store and self.__store is not None:
+                shutil.rmtree(self.__store, ignore_errors=True)
+                self.__store = None
+
+    @staticmethod
+    def distance_field_steps():
+        """Tiled mazes are solved through the links between chunks without a distance field, so
+        there is nothing to build. Empty step generator for compatibility with Maze."""
+        yield from ()
+
+    def solve_from(self, start):
+        """Stores the path from start to the goal as solution directions. The path through the
+        chunks is found from the links between them, so only the chunks on the path are loaded.
+        Always returns True since every cell of a tiled maze can reach the goal."""
+        goal = self.get_goal()
+        start_key = self.__locate(self.index(start))[0]
+        goal_key = self.__locate(self.index(goal))[0]
+
+        #Chunks from start and goal up to their first common chunk in the chunk tree
+        up_path = self.__chunk_path(start_key)
+        down_path = self.__chunk_path(goal_key)
+        common = set(down_path).intersection(up_path)
+        up_path = up_path[:len(up_path) - len(common)]
+        down_path = down_path[:len(down_path) - len(common)]
+
+        index = self.index(start)
+        for key in up_path:
+            direction, opening = self.__link(key)
+            self.__solve_chunk(index, opening)
+            self.__solution[opening] = direction
+            index = opening + self.__offsets[direction]
+
+        for key in reversed(down_path):
+            direction, opening = self.__link(key)
+            parent_opening = opening + self.__offsets[direction]
+            self.__solve_chunk(index, parent_opening)
+            self.__solution[parent_opening] = OPPOSITE[direction]
+            index = opening
+
+        self.__solve_chunk(index, self.index(goal))
+        self.__solved = True
+        return True
+
+    def __locate(self, index):
+        """Returns the chunk key and the index inside the chunk of the cell at index"""
+        z, rest = divmod(index, self.__floor_size)
+        y, x = divmod(rest, self.__size.x)
+        chunk_y, local_y = divmod(y, CHUNK_SIZE)
+        chunk_x, local_x = divmod(x, CHUNK_SIZE)
+        return (chunk_x, chunk_y, z), local_y * self.__chunk_width(chunk_x) + local_x
+
+    def __chunk_width(self, chunk_x):
+        """Returns the width of the chunks in column chunk_x, the last ones can be narrower"""
+        return min(CHUNK_SIZE, self.__size.x - chunk_x * CHUNK_SIZE)
+
+    def __chunk_height(self, chunk_y):
+        """Returns the height of the chunks in row chunk_y, the last ones can be shorter"""
+        return min(CHUNK_SIZE, self.__size.y - chunk_y * CHUNK_SIZE)
+
+    def __chunk_index(self, key, local_x, local_y):
+        """Returns the linear index of a cell inside chunk key"""
+        chunk_x, chunk_y, z = key
+        return self.index((chunk_x * CHUNK_SIZE + local_x, chunk_y * CHUNK_SIZE + local_y, z))
+
+    def __link(self, key):
+        """Returns the direction from chunk key to its parent chunk and the linear index of the
+        cell with the opening, None for the first chunk. The parent is chosen like in a binary
+        tree maze, bias times more likely on the same floor."""
+        chunk_x, chunk_y, z = key
+        link_random = random.Random('link/%d/%d/%d/%d' % (self.__seed, chunk_x, chunk_y, z))
+        left_weight = self.__bias if chunk_x else 0
+        back_weight = self.__bias if chunk_y else 0
+        bottom_weight = 1 if z else 0
+        total = left_weight + back_weight + bottom_weight
+        if not total:
+            return None
+
+        width = self.__chunk_width(chunk_x)
+        height = self.__chunk_height(chunk_y)
+        choice = link_random.randrange(0, total)
+        if choice < left_weight:
+            return Cell.LEFT, self.__chunk_index(key, 0, link_random.randrange(0, height))
+        if choice < left_weight + back_weight:
+            return Cell.BACK, self.__chunk_index(key, link_random.randrange(0, width), 0)
+        return Cell.BOTTOM, self.__chunk_index(key, link_random.randrange(0, width),
+                                               link_random.randrange(0, height))
+
+    def __chunk_path(self, key):
+        """Returns the chunks from key up to the first chunk following the links"""
+        path = [key]
+        link = self.__link(key)
+        while link is not None:
+            key = self.__locate(link[1] + self.__offsets[link[0]])[0]
+            path.append(key)
+            link = self.__link(key)
+        return path
+
+    def __get_chunk(self, key):
+        """Returns the packed cells of chunk key, loading or carving it if needed. Must be called
+        with the lock held."""
+        chunk = self.__chunks.get(key)
+        if chunk is not None:
+            self.__chunks.move_to_end(key)
+            return chunk
+
+        chunk = self.__read_chunk(key)
+        if chunk is None:
+            chunk = self.__carve_chunk(key)
+        self.__chunks[key] = chunk
+
+        while len(self.__chunks) > self.__cache_size:
+            old_key, old_chunk = self.__chunks.popitem(last=False)
+            if old_key in self.__dirty:
+                self.__write_chunk(old_key, old_chunk)
+                self.__dirty.discard(old_key)
+        return chunk
+
+    def __carve_chunk(self, key):
+        """Carves chunk key and opens the links to its parent and child chunks"""
+        chunk_x, chunk_y, z = key
+        width = self.__chunk_width(chunk_x)
+        height = self.__chunk_height(chunk_y)
+
+        chunk_random = random.Random('cells/%d/%d/%d/%d' % (self.__seed, chunk_x, chunk_y, z))
+        chunk_maze = Maze(Coordinate(width, height, 1), chunk_random.getrandbits(64))
+        chunk_maze.carve_maze(Coordinate(0, 0, 0), self.__bias)
+        chunk = chunk_maze.get_cells().translate(CLEAR_MARKERS)
+
+        link = self.__link(key)
+        if link is not None:
+            chunk[self.__locate(link[1])[1]] &= ~(1 << link[0])
+
+        #Children link to this chunk from the RIGHT, FRONT and TOP
+        children = []
+        if chunk_x + 1 < self.__chunks_x:
+            children.append((chunk_x + 1, chunk_y, z))
+        if chunk_y + 1 < self.__chunks_y:
+            children.append((chunk_x, chunk_y + 1, z))
+        if z + 1 < self.__size.z:
+            children.append((chunk_x, chunk_y, z + 1))
+        for child in children:
+            direction, opening = self.__link(child)
+            parent_opening = opening + self.__offsets[direction]
+            parent_key, local = self.__locate(parent_opening)
+            if parent_key == key:
+                chunk[local] &= ~(1 << OPPOSITE[direction])
+
+        if key == (0, 0, 0):
+            chunk[0] |= 1 << Cell.ENTRANCE
+        goal_key, local = self.__locate(self.index(self.get_goal()))
+        if goal_key == key:
+            chunk[local] |= 1 << Cell.GOAL
+        return chunk
+
+    def __solve_chunk(self, start, goal):
+        """Stores the path between two cells of the same chunk as solution directions. Chunks are
+        perfect mazes on their own, so the path never leaves the chunk."""
+        key = self.__locate(start)[0]
+        #The chunk stays readable here even if another thread evicts it from the cache
+        with self.__lock:
+            chunk = self.__get_chunk(key)
+        width = self.__chunk_width(key[0])
+        height = self.__chunk_height(key[1])
+        start_local = self.__locate(start)[1]
+        goal_local = self.__locate(goal)[1]
+        local_offsets = {Cell.LEFT: -1, Cell.RIGHT: 1, Cell.BACK: -width, Cell.FRONT: width}
+
+        came_from = {start_local: None}
+        queue = deque([start_local])
+        while queue:
+            local = queue.popleft()
+            if local == goal_local:
+                break
+            local_y, local_x = divmod(local, width)
+            for direction in OPEN_DIRECTIONS[chunk[local] & WALL_BITS]:
+                #Openings to other chunks and ladders are not followed
+                if (direction not in local_offsets or
+                        (direction == Cell.LEFT and not local_x) or
+                        (direction == Cell.RIGHT and local_x == width - 1) or
+                        (direction == Cell.BACK and not local_y) or
+                        (direction == Cell.FRONT and local_y == height - 1)):
+                    continue
+                neighbor = local + local_offsets[direction]
+                if neighbor not in came_from:
+                    came_from[neighbor] = direction
+                    queue.append(neighbor)
+
+        local = goal_local
+        while local != start_local:
+            direction = came_from[local]
+            local -= local_offsets[direction]
+            local_y, local_x = divmod(local, width)
+            self.__solution[self.__chunk_index(key, local_x, local_y)] = direction
+
+    def __chunk_filename(self, key):
+        """Returns the name of the file of chunk key in the store"""
+        return os.path.join(self.__store, '%d_%d_%d.chunk' % key)
+
+    def __read_chunk(self, key):
+        """Returns the packed cells of chunk key from the store or None if it is not stored"""
+        if self.__store is None:
+            return None
+        try:
+            with open(self.__chunk_filename(key), 'rb') as chunk_file:
+                return bytearray(chunk_file.read())
+        except FileNotFoundError:
+            return None
+
+    def __write_chunk(self, key, chunk):
+        """Writes the packed cells of chunk key to the store"""
+        if self.__store is None:
+            self.__store = tempfile.mkdtemp(prefix='labyrinth')
+        os.makedirs(self.__store, exist_ok=True)
+        with open(self.__chunk_filename(key), 'wb') as chunk_file:
+            chunk_file.write(chunk)